@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Benchmark: handler overhead end to end, offline (no GPU, no RunPod)
+===================================================================
+Runs the real handler.handler() against fake_comfyui on 127.0.0.1:8188:
+- a throwaway COMFY_DIR / NETWORK_VOLUME under a temp dir; ComfyUI's
+  main.py is a stub that prints the ready line, so the real supervisor /
+  boot path runs while the fake server answers in-process
+- every volume path (cache, catalog, timelines, profiles) points into the
+  temp dir; result cache, preflight, warmup and prefetch are off
+- N jobs run one after another; the fake's own execution time is taken
+  out so the report is handler time only
+
+Reported per stage (median / p95 / max, ms):
+    boot (first job), load, inject, submit, execute, of which completion
+    lag (fake finished -> handler noticed), encode, serialize (json.dumps
+    of the response, what RunPod sends back) and total handler overhead.
+
+Usage:
+    python bench_handler.py --jobs 20 --output-bytes 8000000
+    python bench_handler.py --class-delay FSamplerAdvanced=0.5 --json bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+from fake_comfyui import FakeComfyUI, parse_class_delays
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MAIN_STUB = """import sys, time
+port = sys.argv[sys.argv.index("--port") + 1] if "--port" in sys.argv else "8188"
+print(f"To see the GUI go to: http://127.0.0.1:{port}", flush=True)
+while True:
+    time.sleep(3600)
+"""
+
+STAGES = ("load", "inject", "submit", "execute", "completion_lag", "encode", "serialize", "overhead")
+
+
+def prepare_tree(root, workflow_path, port):
+    """Temp ComfyUI dir + volume, and the environment the handler modules read at import"""
+    volume = os.path.join(root, "volume")
+    comfy_dir = os.path.join(root, "ComfyUI")
+    os.makedirs(os.path.join(volume, "workflow"), exist_ok=True)
+    os.makedirs(comfy_dir, exist_ok=True)
+    shutil.copy(workflow_path, os.path.join(volume, "workflow", os.path.basename(workflow_path)))
+    with open(os.path.join(comfy_dir, "main.py"), "w") as f:
+        f.write(MAIN_STUB)
+
+    os.environ.update({
+        "NETWORK_VOLUME": volume,
+        "COMFY_DIR": comfy_dir,
+        "COMFY_URL": f"http://127.0.0.1:{port}",
+        "RESULT_CACHE": "0",
+        "RESULT_CACHE_DIR": os.path.join(volume, "result_cache"),
+        "MODEL_PREFLIGHT": "0",
+        "MODEL_CATALOG_FILE": os.path.join(volume, "model_catalog.json"),
+        "MODEL_CATALOG_HASH": "0",
+        "BOOT_TIMELINE_DIR": os.path.join(volume, "boot_timelines"),
+        "NODE_PROFILE_FILE": os.path.join(volume, "node_profiles.jsonl"),
+        "TIERS_FILE": os.path.join(volume, "workflow", "tiers.json"),
+        "WARMUP": "0",
+        "PREFETCH_MODE": "off",
+    })
+    return volume, comfy_dir
+
+
+def run_job(handler, fake, workflow_name, index):
+    event = {
+        "id": f"bench-{index}",
+        "input": {"workflow_name": workflow_name, "prompt": f"benchmark prompt {index}", "seed": index, "cache": False},
+    }
+    started = time.perf_counter()
+    result = handler.handler(event)
+    handler_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    body = json.dumps(result)
+    serialize_seconds = time.perf_counter() - started
+
+    if result.get("status") != "completed":
+        raise RuntimeError(f"Job {index} failed: {result.get('error')}")
+
+    # Jobs run one at a time: the newest prompt is this job's
+    with fake.lock:
+        timing = max(fake.timings.values(), key=lambda t: t["queued"])
+    comfy_seconds = timing["finished"] - timing["started"]
+    stages = result["metrics"]["stages"]
+    execute = stages.get("execute_seconds", 0)
+    boot = stages.get("comfy_boot_seconds", 0)
+    return {
+        "boot": boot,
+        "load": stages.get("load_seconds", 0),
+        "inject": stages.get("inject_seconds", 0),
+        "submit": stages.get("submit_seconds", 0),
+        "execute": execute,
+        # execute starts once /prompt answered, so queue wait counts as lag too
+        "completion_lag": max(0.0, execute - comfy_seconds),
+        "encode": stages.get("encode_seconds", 0),
+        "serialize": serialize_seconds,
+        "overhead": handler_seconds + serialize_seconds - comfy_seconds - boot,
+        "comfy": comfy_seconds,
+        "outputs": len(result.get("outputs", [])),
+        "response_bytes": len(body),
+    }
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(samples):
+    return {
+        stage: {
+            "median_ms": round(statistics.median(s[stage] for s in samples) * 1000, 2),
+            "p95_ms": round(percentile([s[stage] for s in samples], 0.95) * 1000, 2),
+            "max_ms": round(max(s[stage] for s in samples) * 1000, 2),
+        }
+        for stage in STAGES
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline handler overhead benchmark (fake ComfyUI)")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--workflow", default=os.path.join(REPO_DIR, "wan-2.2.json"))
+    parser.add_argument("--node-delay", type=float, default=0.01, help="fake seconds per node")
+    parser.add_argument("--class-delay", action="append", default=[], metavar="CLASS=SECONDS")
+    parser.add_argument("--progress-steps", type=int, default=10)
+    parser.add_argument("--output-bytes", type=int, default=4 * 1024 * 1024, help="size of each output file")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the temp tree")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_handler_")
+    volume, comfy_dir = prepare_tree(root, args.workflow, args.port)
+    workflow_name = os.path.splitext(os.path.basename(args.workflow))[0]
+
+    fake = FakeComfyUI(port=args.port, node_delay=args.node_delay,
+                       output_dir=os.path.join(volume, "ComfyUI", "output"),
+                       output_bytes=args.output_bytes,
+                       class_delays=parse_class_delays(args.class_delay),
+                       progress_steps=args.progress_steps).start()
+    try:
+        sys.path.insert(0, REPO_DIR)
+        import handler  # after prepare_tree: modules read their paths at import
+
+        print(f"⏱️  {args.jobs} job(s) of {workflow_name}, {args.output_bytes / 1024 / 1024:.1f} MB per output...")
+        samples = [run_job(handler, fake, workflow_name, i) for i in range(args.jobs)]
+    finally:
+        if "handler" in sys.modules:
+            sys.modules["handler"].supervisor.stop()
+        fake.stop()
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    summary = summarize(samples)
+    print(f"\n🥶 boot (first job): {samples[0]['boot'] * 1000:.1f} ms")
+    print(f"📦 outputs per job: {samples[0]['outputs']}, response {samples[0]['response_bytes'] / 1024 / 1024:.2f} MB")
+    print(f"🧪 fake ComfyUI execution: {statistics.median(s['comfy'] for s in samples) * 1000:.1f} ms (median, excluded)\n")
+    print(f"{'stage':>15} | {'median ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    print("-" * 52)
+    for stage, row in summary.items():
+        print(f"{stage:>15} | {row['median_ms']:>10} {row['p95_ms']:>10} {row['max_ms']:>10}")
+    if not samples[0]["outputs"]:
+        print("\n⚠️ The handler returned no outputs: encode/serialize timings are empty")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"args": vars(args), "summary": summary, "samples": samples}, f, indent=2)
+        print(f"📝 Results written to {args.json_path}")
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-poll cost of ComfyUI /history over a worker's lifetime
+=====================================================================
+Runs N synthetic jobs against fake_comfyui and measures one completion
+poll per job with two strategies:
+- full:  GET /history, entries never deleted (old handler.py behaviour)
+- by-id: GET /history/{id}, then POST /history {"delete": [id]}
+
+With "full" the poll cost grows with every job; with "by-id" it stays flat.
+
+Usage:
+    python bench_history.py --jobs 1000
+"""
+
+import json
+import time
+import uuid
+import argparse
+import statistics
+
+import requests
+
+from fake_comfyui import FakeComfyUI
+
+
+def synthetic_entry(workflow, prompt_id):
+    """History entry shaped like ComfyUI's (the prompt graph is stored too)"""
+    return {
+        "prompt": [0, prompt_id, workflow, {"client_id": "bench"}, ["80"]],
+        "outputs": {"80": {"gifs": [{"filename": f"v-02-{prompt_id[:8]}_00001.mp4", "subfolder": "NV/eni1025/t2k2dd/test", "type": "output"}]}},
+        "status": {"status_str": "success", "completed": True, "messages": []},
+    }
+
+
+def run_strategy(fake, workflow, strategy, jobs):
+    with fake.lock:
+        fake.history.clear()
+
+    samples = []
+    for _ in range(jobs):
+        prompt_id = str(uuid.uuid4())
+        with fake.lock:
+            fake.history[prompt_id] = synthetic_entry(workflow, prompt_id)
+
+        start = time.perf_counter()
+        if strategy == "full":
+            resp = requests.get(f"{fake.url}/history", timeout=30)
+            entry = resp.json().get(prompt_id)
+        else:
+            resp = requests.get(f"{fake.url}/history/{prompt_id}", timeout=30)
+            entry = resp.json().get(prompt_id)
+        elapsed = time.perf_counter() - start
+
+        assert entry is not None, "entry missing"
+        if strategy == "by-id":
+            requests.post(f"{fake.url}/history", json={"delete": [prompt_id]}, timeout=30)
+
+        samples.append({"ms": elapsed * 1000, "bytes": len(resp.content)})
+
+    return samples
+
+
+def summarize(samples, checkpoints):
+    rows = []
+    for n in checkpoints:
+        window = samples[max(0, n - 10):n]
+        rows.append({
+            "job": n,
+            "poll_ms": round(statistics.median(s["ms"] for s in window), 3),
+            "poll_kb": round(window[-1]["bytes"] / 1024, 1),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ComfyUI /history poll cost")
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--workflow", default="wan-2.2.json")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    with open(args.workflow, "r") as f:
+        workflow = json.load(f)
+
+    checkpoints = sorted({n for n in (10, 100, 250, 500, 750, args.jobs) if n <= args.jobs})
+    results = {}
+
+    with FakeComfyUI(port=0) as fake:
+        for strategy in ("full", "by-id"):
+            print(f"⏱️  {strategy}: {args.jobs} jobs...")
+            results[strategy] = summarize(run_strategy(fake, workflow, strategy, args.jobs), checkpoints)
+
+    print(f"\n{'job':>6} | {'full ms':>9} {'full KB':>9} | {'by-id ms':>9} {'by-id KB':>9}")
+    print("-" * 52)
+    for full, by_id in zip(results["full"], results["by-id"]):
+        print(f"{full['job']:>6} | {full['poll_ms']:>9} {full['poll_kb']:>9} | {by_id['poll_ms']:>9} {by_id['poll_kb']:>9}")
+
+    for strategy, rows in results.items():
+        growth = rows[-1]["poll_ms"] / max(rows[0]["poll_ms"], 1e-6)
+        print(f"📈 {strategy}: poll time x{growth:.1f} from job {rows[0]['job']} to job {rows[-1]['job']}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📝 Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
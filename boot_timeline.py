@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Boot Timeline - cold-start profiler
+===================================
+- Monotonic marks for each boot phase (imports, symlinks, diagnostics,
+  ComfyUI spawn, HTTP ready, warmup, handler ready, first job), relative
+  to the process start time read from /proc (so interpreter startup and
+  module imports before the first mark are included)
+- Attached once, to the first job's metrics, with the fields the test
+  client reads: cold_start_seconds, processing_seconds, cost_estimate_usd
+- Written as JSON to the volume per image version, to track cold-start
+  regressions: <BOOT_TIMELINE_DIR>/<IMAGE_VERSION>/<time>-<pod>.json
+
+Environment:
+    BOOT_TIMELINE_DIR (default: /runpod-volume/boot_timelines),
+    IMAGE_VERSION (default: unknown), GPU_COST_PER_HOUR (default: 2.72,
+    RunPod A100 80GB serverless flex price; set it for your GPU)
+"""
+
+import os
+import json
+import time
+import logging
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+BOOT_TIMELINE_DIR = os.environ.get("BOOT_TIMELINE_DIR", "/runpod-volume/boot_timelines")
+IMAGE_VERSION = os.environ.get("IMAGE_VERSION", "unknown")
+GPU_COST_PER_HOUR = float(os.environ.get("GPU_COST_PER_HOUR", "2.72"))
+
+# The worker can process jobs once all of these are marked
+READY_PHASES = ("comfy_ready", "handler_ready")
+
+
+def process_age():
+    """Seconds since this process was started (0 if /proc is unavailable)"""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # comm may contain spaces: fields after the closing paren
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def cost_estimate(seconds, cost_per_hour=GPU_COST_PER_HOUR):
+    return round(seconds / 3600 * cost_per_hour, 6)
+
+
+class BootTimeline:
+    """Phase marks since process start; one report for the first job"""
+
+    def __init__(self):
+        self.origin = time.monotonic() - process_age()
+        self.wall_origin = time.time() - (time.monotonic() - self.origin)
+        self.marks = [("interpreter_start", 0.0)]
+        self._reported = False
+        self._lock = Lock()
+
+    def elapsed(self):
+        return time.monotonic() - self.origin
+
+    def mark(self, phase):
+        """Record the end of a boot phase (first mark of a phase wins)"""
+        with self._lock:
+            if any(name == phase for name, _ in self.marks):
+                return
+            self.marks.append((phase, round(self.elapsed(), 3)))
+
+    def as_dict(self):
+        with self._lock:
+            marks = list(self.marks)
+        phases = {}
+        previous = 0.0
+        for name, at in marks[1:]:
+            phases[name] = round(at - previous, 3)
+            previous = at
+        return {
+            "image_version": IMAGE_VERSION,
+            "pod_id": os.environ.get("RUNPOD_POD_ID", "local"),
+            "gpu": os.environ.get("RUNPOD_GPU_TYPE", "unknown"),
+            "process_started_at": round(self.wall_origin, 3),
+            "marks": dict(marks),
+            "phases": phases,
+        }
+
+    def job_metrics(self, job_seconds, boot_wait_seconds=0.0):
+        """
+        cold_start_seconds / processing_seconds / cost_estimate_usd for a job,
+        plus the boot timeline on the first job of the worker (also saved to
+        the volume). Warm jobs report cold_start_seconds = 0.
+        """
+        processing = max(0.0, job_seconds - boot_wait_seconds)
+        with self._lock:
+            first = not self._reported
+            self._reported = True
+
+        if not first:
+            return {
+                "cold_start_seconds": 0,
+                "processing_seconds": round(processing, 2),
+                "cost_estimate_usd": cost_estimate(processing),
+            }
+
+        self.mark("first_job_done")
+        timeline = self.as_dict()
+        marks = timeline["marks"]
+        # Everything before processing is cold start, minus the time the
+        # ready worker sat idle before the first job arrived
+        ready = max(marks.get(phase, 0.0) for phase in READY_PHASES)
+        idle = max(0.0, marks.get("first_job_received", ready) - ready)
+        cold_start = max(0.0, marks["first_job_done"] - processing - idle)
+        timeline["cold_start_seconds"] = round(cold_start, 2)
+        self.save(timeline)
+        return {
+            "cold_start_seconds": round(cold_start, 2),
+            "processing_seconds": round(processing, 2),
+            "cost_estimate_usd": cost_estimate(cold_start + processing),
+            "boot_timeline": timeline,
+        }
+
+    def save(self, timeline):
+        folder = os.path.join(BOOT_TIMELINE_DIR, IMAGE_VERSION)
+        name = f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime(self.wall_origin))}-{timeline['pod_id']}.json"
+        try:
+            os.makedirs(folder, exist_ok=True)
+            tmp = os.path.join(folder, f".{name}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(timeline, f, indent=2)
+            os.replace(tmp, os.path.join(folder, name))
+            logger.info(f"⏱️ Boot timeline saved: {os.path.join(folder, name)}")
+        except OSError as e:
+            logger.warning(f"⚠️ Could not save boot timeline: {e}")
+
+
+_timeline = BootTimeline()
+
+
+def get_timeline():
+    """Per-process BootTimeline (origin = process start)"""
+    return _timeline
+
+
+def mark(phase):
+    _timeline.mark(phase)
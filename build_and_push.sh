@@ -24,7 +24,7 @@ fi
 
 # Build the image
 echo "🏗️  Building image: ${FULL_IMAGE}"
-docker build -t "${FULL_IMAGE}" . --no-cache
+docker build -t "${FULL_IMAGE}" --build-arg IMAGE_VERSION="${TAG}" . --no-cache
 
 if [ $? -eq 0 ]; then
     echo "✅ Build successful!"
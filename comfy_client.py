@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Shared ComfyUI HTTP Client
+==========================
+- One keep-alive connection pool per worker (requests.Session)
+- Per-endpoint timeouts (connect, read)
+- Retry with jittered exponential backoff (POST /prompt only retried
+  when the connection could not be opened, so a job is never queued twice)
+- Request latency counters per endpoint, exported in job metrics
+- Optional AsyncComfyClient (httpx or aiohttp, whichever is installed)
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+COMFY_URL = os.environ.get("COMFY_URL", "http://127.0.0.1:8188")
+
+# (connect, read) seconds per endpoint
+DEFAULT_TIMEOUTS = {
+    "root": (1, 2),
+    "prompt": (2, 30),
+    "history": (2, 10),
+    "history_delete": (2, 10),
+    "system_stats": (2, 5),
+    "object_info": (2, 60),
+    "queue": (2, 5),
+}
+
+_TRANSIENT = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+def _not_sent(error):
+    """True if the request never reached ComfyUI (connect timeout, refused, DNS)"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError) or not error.args:
+        return False
+    # requests wraps urllib3's MaxRetryError, whose reason is the connect-phase error
+    reason = getattr(error.args[0], "reason", error.args[0])
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+class LatencyStats:
+    """Thread-safe request counters, one bucket per endpoint"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._buckets = {}
+
+    def record(self, endpoint, seconds=None, error=False, retry=False):
+        with self._lock:
+            b = self._buckets.setdefault(endpoint, {
+                "count": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0,
+            })
+            if retry:
+                b["retries"] += 1
+            if error:
+                b["errors"] += 1
+            if seconds is not None:
+                ms = seconds * 1000
+                b["count"] += 1
+                b["total_ms"] += ms
+                b["max_ms"] = max(b["max_ms"], ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    "count": b["count"],
+                    "errors": b["errors"],
+                    "retries": b["retries"],
+                    "avg_ms": round(b["total_ms"] / b["count"], 2) if b["count"] else 0,
+                    "max_ms": round(b["max_ms"], 2),
+                }
+                for endpoint, b in self._buckets.items()
+            }
+
+
+def backoff_delay(attempt, base=0.25, cap=5.0):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class ComfyClient:
+    """Pooled ComfyUI API client shared by every handler variant"""
+
+    def __init__(self, base_url=COMFY_URL, timeouts=None, retries=3, backoff=0.25, pool_size=8):
+        self.base_url = base_url.rstrip("/")
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = LatencyStats()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def ws_url(self):
+        return self.base_url.replace("http", "ws", 1) + "/ws"
+
+    def request(self, endpoint, method, path, idempotent=True, retries=None, **kwargs):
+        """Send one request with the endpoint's timeout and retry policy"""
+        retries = self.retries if retries is None else retries
+        kwargs.setdefault("timeout", self.timeouts.get(endpoint, (2, 30)))
+        url = f"{self.base_url}{path}"
+
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except _TRANSIENT as e:
+                self.stats.record(endpoint, error=True)
+                retryable = idempotent or _not_sent(e)
+                if not retryable or attempt >= retries:
+                    raise
+                self.stats.record(endpoint, retry=True)
+                time.sleep(backoff_delay(attempt, self.backoff))
+                continue
+
+            self.stats.record(endpoint, time.perf_counter() - start)
+            if response.status_code >= 500 and idempotent and attempt < retries:
+                self.stats.record(endpoint, error=True, retry=True)
+                time.sleep(backoff_delay(attempt, self.backoff))
+                continue
+            return response
+
+    # -- endpoints ------------------------------------------------------------
+
+    def is_up(self):
+        """True if the ComfyUI HTTP server answers (no retry)"""
+        try:
+            return self.request("root", "GET", "/", retries=0).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def submit(self, workflow, client_id=None):
+        """POST /prompt; returns the raw response so callers can report errors"""
+        payload = {"prompt": workflow}
+        if client_id:
+            payload["client_id"] = client_id
+        return self.request("prompt", "POST", "/prompt", idempotent=False, json=payload)
+
+    def history(self, prompt_id):
+        """History entry for one prompt, or None if not finished yet"""
+        response = self.request("history", "GET", f"/history/{prompt_id}")
+        if response.status_code != 200:
+            return None
+        return response.json().get(prompt_id)
+
+    def delete_history(self, prompt_ids):
+        """Drop prompts from ComfyUI's history (best effort)"""
+        try:
+            self.request("history_delete", "POST", "/history", json={"delete": list(prompt_ids)})
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"⚠️ Could not delete history for {list(prompt_ids)}: {e}")
+
+    def system_stats(self):
+        response = self.request("system_stats", "GET", "/system_stats")
+        response.raise_for_status()
+        return response.json()
+
+    def object_info(self, node_class=None):
+        path = f"/object_info/{node_class}" if node_class else "/object_info"
+        response = self.request("object_info", "GET", path)
+        response.raise_for_status()
+        return response.json()
+
+    def queue(self):
+        response = self.request("queue", "GET", "/queue")
+        response.raise_for_status()
+        return response.json()
+
+
+class AsyncComfyClient:
+    """
+    Async variant with the same endpoints and counters.
+    Uses httpx if installed, else aiohttp.
+    """
+
+    def __init__(self, base_url=COMFY_URL, timeouts=None, retries=3, backoff=0.25, pool_size=8):
+        if httpx is None and aiohttp is None:
+            raise RuntimeError("AsyncComfyClient needs httpx or aiohttp installed")
+        self.base_url = base_url.rstrip("/")
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.stats = LatencyStats()
+        self._client = None
+
+    async def _session(self):
+        if self._client is None:
+            if httpx is not None:
+                limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+                self._client = httpx.AsyncClient(base_url=self.base_url, limits=limits)
+            else:
+                connector = aiohttp.TCPConnector(limit=self.pool_size)
+                self._client = aiohttp.ClientSession(base_url=self.base_url, connector=connector)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            if httpx is not None:
+                await self._client.aclose()
+            else:
+                await self._client.close()
+            self._client = None
+
+    async def request(self, endpoint, method, path, idempotent=True, retries=None, json=None):
+        """Returns (status_code, parsed JSON or None)"""
+        retries = self.retries if retries is None else retries
+        connect, read = self.timeouts.get(endpoint, (2, 30))
+        client = await self._session()
+
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                if httpx is not None:
+                    resp = await client.request(method, path, json=json, timeout=httpx.Timeout(read, connect=connect))
+                    status = resp.status_code
+                    body = resp.json() if "json" in resp.headers.get("content-type", "") else None
+                else:
+                    timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+                    async with client.request(method, path, json=json, timeout=timeout) as resp:
+                        status = resp.status
+                        body = await resp.json() if "json" in resp.headers.get("content-type", "") else None
+            except Exception as e:
+                self.stats.record(endpoint, error=True)
+                not_sent = (httpx is not None and isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))) or \
+                           (aiohttp is not None and isinstance(e, aiohttp.ClientConnectorError))
+                if not (idempotent or not_sent) or attempt >= retries:
+                    raise
+                self.stats.record(endpoint, retry=True)
+                await asyncio.sleep(backoff_delay(attempt, self.backoff))
+                continue
+
+            self.stats.record(endpoint, time.perf_counter() - start)
+            if status >= 500 and idempotent and attempt < retries:
+                self.stats.record(endpoint, error=True, retry=True)
+                await asyncio.sleep(backoff_delay(attempt, self.backoff))
+                continue
+            return status, body
+
+    async def submit(self, workflow, client_id=None):
+        payload = {"prompt": workflow}
+        if client_id:
+            payload["client_id"] = client_id
+        return await self.request("prompt", "POST", "/prompt", idempotent=False, json=payload)
+
+    async def history(self, prompt_id):
+        status, body = await self.request("history", "GET", f"/history/{prompt_id}")
+        return (body or {}).get(prompt_id) if status == 200 else None
+
+    async def delete_history(self, prompt_ids):
+        await self.request("history_delete", "POST", "/history", json={"delete": list(prompt_ids)})
+
+    async def system_stats(self):
+        status, body = await self.request("system_stats", "GET", "/system_stats")
+        return body if status == 200 else None
+
+
+_client = None
+_client_lock = Lock()
+
+
+def get_client():
+    """Per-worker shared ComfyClient"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ComfyClient()
+    return _client
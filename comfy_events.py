@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+ComfyUI WebSocket Event Stream
+==============================
+- One /ws?clientId= connection per worker, read on a background thread
+- Events (executing, executed, execution_*) dispatched per prompt_id
+- A job finishes the moment ComfyUI reports it, no /history poll interval
+- Falls back to polling only while the socket is down (or just reconnected)
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import logging
+from collections import OrderedDict
+from threading import Thread, Lock, Event
+
+try:
+    import websocket  # websocket-client
+except ImportError:
+    websocket = None
+
+from comfy_client import COMFY_URL
+
+logger = logging.getLogger(__name__)
+
+COMFY_WS_URL = os.environ.get("COMFY_WS_URL", COMFY_URL.replace("http", "ws", 1) + "/ws")
+
+# Events received before the handler calls watch() (submit/watch race)
+MAX_BUFFERED_PROMPTS = 64
+MAX_BUFFERED_EVENTS = 2000
+
+# Internal marker used to wake waiters when the socket state changes
+_WAKE = {"type": "_wake", "data": {}}
+
+
+def result_from_history(entry):
+    """Turn a /history entry into a tracker result (None if not finished)"""
+    if not entry:
+        return None
+
+    status = entry.get("status", {})
+    if status.get("status_str") == "error":
+        return {
+            "success": False,
+            "error": "Workflow execution error",
+            "details": status.get("messages", []),
+            "outputs": entry.get("outputs", {}),
+        }
+
+    if "outputs" in entry:
+        return {"success": True, "outputs": entry["outputs"]}
+
+    return None
+
+
+def progress_chunk(msg, workflow, last_sent, min_interval=0.5):
+    """
+    Stream chunk for a ComfyUI "progress" message, or None when throttled.
+    Chatty nodes (RIFE, video combine) are limited to one chunk per
+    min_interval; the final step of a node is always sent.
+    last_sent is a dict kept by the caller for the whole job.
+    """
+    if msg.get("type") != "progress":
+        return None
+    data = msg.get("data", {})
+    node = str(data.get("node"))
+    now = time.time()
+    if data.get("value") != data.get("max") and now - last_sent.get(node, 0) < min_interval:
+        return None
+    last_sent[node] = now
+    return {
+        "event": "progress",
+        "node": node,
+        "class_type": workflow.get(node, {}).get("class_type"),
+        "value": data.get("value"),
+        "max": data.get("max"),
+    }
+
+
+class PromptWatch:
+    """Completion state for one prompt, fed by ComfyEventStream"""
+
+    def __init__(self, stream, prompt_id):
+        self.stream = stream
+        self.prompt_id = prompt_id
+        self.outputs = {}
+        self.result = None
+        self._failure = None
+        self._queue = queue.Queue()
+
+    def feed(self, msg):
+        msg_type = msg.get("type")
+        data = msg.get("data", {})
+
+        if msg_type == "executed" and data.get("node") is not None:
+            self.outputs[str(data["node"])] = data.get("output") or {}
+        elif msg_type == "execution_error":
+            self._failure = {
+                "success": False,
+                "error": data.get("exception_message", "Workflow execution error"),
+                "details": [{
+                    "node_id": data.get("node_id"),
+                    "node_type": data.get("node_type"),
+                    "exception_type": data.get("exception_type"),
+                    "traceback": data.get("traceback"),
+                }],
+            }
+        elif msg_type == "execution_interrupted":
+            self._failure = {"success": False, "error": "Workflow interrupted"}
+        elif msg_type == "executing" and data.get("node") is None:
+            # Sent after ComfyUI has written the history entry, so the
+            # outputs can be read right away (execution_success comes earlier)
+            result = self._failure or {"success": True}
+            result["outputs"] = self.outputs
+            self.result = result
+
+        self._queue.put(msg)
+
+    def wake(self):
+        self._queue.put(_WAKE)
+
+    def fail(self, error):
+        """Finish the prompt with an error (ComfyUI died while running it)"""
+        if self.result is None:
+            self.result = {"success": False, "error": error, "outputs": self.outputs}
+        self.wake()
+
+    def events(self, timeout=600, poll=None, poll_interval=2.0):
+        """
+        Yield ComfyUI messages for this prompt until it finishes.
+
+        The last item is always {"type": "done", "data": result}.
+        poll(prompt_id) must return the /history entry or None; it is only
+        called while the socket is down or right after a reconnect, and once
+        on success to read the canonical outputs (cached nodes send no
+        "executed" message).
+        Raises TimeoutError after `timeout` seconds.
+        """
+        deadline = time.time() + timeout
+        seen_generation = self.stream.generation
+        next_poll = 0
+        source = "ws"
+
+        try:
+            while self.result is None or not self._queue.empty():
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError(f"Workflow did not complete within {timeout}s")
+
+                degraded = not self.stream.connected or self.stream.generation != seen_generation
+                if degraded and self.result is None and poll is not None and time.time() >= next_poll:
+                    next_poll = time.time() + poll_interval
+                    try:
+                        result = result_from_history(poll(self.prompt_id))
+                    except Exception as e:
+                        logger.warning(f"Poll error: {e}")
+                        result = None
+                    if result is not None:
+                        self.result = result
+                        source = "poll"
+                        break
+                    if self.stream.connected:
+                        # Caught up after a reconnect, trust the socket again
+                        seen_generation = self.stream.generation
+
+                wait = min(remaining, poll_interval if degraded else 1.0)
+                try:
+                    msg = self._queue.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                if msg is not _WAKE:
+                    yield msg
+
+            if source == "ws" and self.result.get("success") and poll is not None:
+                try:
+                    entry = poll(self.prompt_id)
+                    if entry and entry.get("outputs"):
+                        self.result["outputs"] = entry["outputs"]
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not read history, using WebSocket outputs: {e}")
+
+            self.result["source"] = source
+            yield {"type": "done", "data": self.result}
+        finally:
+            self.stream.unwatch(self.prompt_id)
+
+    def wait(self, timeout=600, poll=None, poll_interval=2.0):
+        """Block until the prompt finishes and return the result dict"""
+        for msg in self.events(timeout, poll=poll, poll_interval=poll_interval):
+            if msg["type"] == "done":
+                return msg["data"]
+
+
+class ComfyEventStream:
+    """Persistent ComfyUI WebSocket reader shared by every job of the worker"""
+
+    def __init__(self, url=COMFY_WS_URL, client_id=None):
+        self.url = url
+        self.client_id = client_id or uuid.uuid4().hex
+        self.connected = False
+        self.generation = 0
+
+        self._watches = {}
+        self._buffer = OrderedDict()
+        self._lock = Lock()
+        self._connected_event = Event()
+        self._stopped = Event()
+        self._ws = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        if websocket is None:
+            logger.warning("⚠️ websocket-client not installed - completion falls back to polling")
+            return self
+        self._thread = Thread(target=self._run, name="comfy-ws", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def wait_connected(self, timeout):
+        return self._connected_event.wait(timeout)
+
+    def watch(self, prompt_id):
+        """
+        Register a prompt and replay any events that arrived before. Both
+        happen under the lock _dispatch feeds under, so a live event can
+        never overtake the replayed ones
+        """
+        watch = PromptWatch(self, prompt_id)
+        with self._lock:
+            self._watches[prompt_id] = watch
+            for msg in self._buffer.pop(prompt_id, []):
+                watch.feed(msg)
+        return watch
+
+    def unwatch(self, prompt_id):
+        with self._lock:
+            self._watches.pop(prompt_id, None)
+
+    def fail_all(self, error):
+        """Fail every watched prompt at once (the ComfyUI process is gone)"""
+        with self._lock:
+            watches = list(self._watches.values())
+            self._buffer.clear()
+        for watch in watches:
+            watch.fail(error)
+
+    def _run(self):
+        backoff = 0.5
+        ws_url = f"{self.url}?clientId={self.client_id}"
+
+        while not self._stopped.is_set():
+            try:
+                self._ws = websocket.create_connection(ws_url, timeout=10)
+                self._ws.settimeout(None)
+                with self._lock:
+                    self.generation += 1
+                    self.connected = True
+                self._connected_event.set()
+                backoff = 0.5
+                logger.info(f"🔌 ComfyUI WebSocket connected ({self.client_id[:8]})")
+                self._wake_all()
+
+                while not self._stopped.is_set():
+                    frame = self._ws.recv()
+                    if isinstance(frame, bytes):
+                        continue  # binary preview images
+                    if not frame:
+                        raise ConnectionError("WebSocket closed by server")
+                    self._dispatch(json.loads(frame))
+
+            except Exception as e:
+                if self._stopped.is_set():
+                    break
+                if self.connected:
+                    logger.warning(f"⚠️ ComfyUI WebSocket dropped: {e} - polling until reconnected")
+            finally:
+                self.connected = False
+                self._connected_event.clear()
+                self._wake_all()
+                if self._ws is not None:
+                    try:
+                        self._ws.close()
+                    except Exception:
+                        pass
+                    self._ws = None
+
+            self._stopped.wait(backoff)
+            backoff = min(backoff * 2, 5.0)
+
+    def _dispatch(self, msg):
+        data = msg.get("data")
+        if not isinstance(data, dict):
+            return
+        prompt_id = data.get("prompt_id")
+        if not prompt_id:
+            return  # queue "status" broadcasts
+        msg["received_at"] = time.time()  # node profiling (ComfyUI sends few timestamps)
+
+        with self._lock:
+            watch = self._watches.get(prompt_id)
+            if watch is None:
+                events = self._buffer.setdefault(prompt_id, [])
+                if len(events) < MAX_BUFFERED_EVENTS:
+                    events.append(msg)
+                while len(self._buffer) > MAX_BUFFERED_PROMPTS:
+                    self._buffer.popitem(last=False)
+                return
+            watch.feed(msg)
+
+    def _wake_all(self):
+        with self._lock:
+            watches = list(self._watches.values())
+        for watch in watches:
+            watch.wake()
+
+
+_stream = None
+_stream_lock = Lock()
+
+
+def get_event_stream(connect_timeout=2.0):
+    """Shared per-worker event stream (started on first use)"""
+    global _stream
+    with _stream_lock:
+        if _stream is None:
+            _stream = ComfyEventStream().start()
+            _stream.wait_connected(connect_timeout)
+    return _stream
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Process - event-driven startup
+======================================
+Readiness is one future, resolved by whichever signal comes first:
+- stdout/stderr marker ("To see the GUI go to", printed once the server
+  is listening; "Starting server" comes before and is not enough)
+- TCP connect probe on the listen port, retried with <100 ms backoff
+- child exit: the future fails at once with the exit code and the
+  captured log tail (no more waiting out the full timeout)
+
+No HTTP polling loop: the handler blocks on ComfyProcess.wait().
+Both pipes are drained continuously by output_capture.OutputCapture
+(ring buffer of the last output, optional tee through on_line).
+"""
+
+import time
+import socket
+import logging
+import subprocess
+from threading import Thread, Lock
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from output_capture import OutputCapture
+
+logger = logging.getLogger(__name__)
+
+READY_MARKERS = ("To see the GUI go to",)
+PROBE_BACKOFF = (0.01, 0.08)  # first and max delay between connect probes
+
+
+class ComfyStartError(RuntimeError):
+    """ComfyUI exited (or could not be spawned) before it was ready"""
+
+    def __init__(self, message, tail=""):
+        super().__init__(message)
+        self.tail = tail
+
+
+class ComfyProcess:
+    """ComfyUI child process with a ready/failed future"""
+
+    def __init__(self, args, cwd, host="127.0.0.1", port=8188, on_line=None, env=None):
+        self.args = args
+        self.cwd = cwd
+        self.host = host
+        self.port = port
+        self.on_line = on_line
+        self.env = env
+        self.process = None
+        self.ready = Future()
+        self.ready_source = None
+        self.started_at = None
+        self.capture = OutputCapture(on_line=self._on_line)
+        self._signal_lock = Lock()
+
+    # -- signals --------------------------------------------------------------
+
+    def _resolve(self, source):
+        with self._signal_lock:
+            if not self.ready.done():
+                self.ready_source = source
+                self.ready.set_result(source)
+
+    def _fail(self, error):
+        with self._signal_lock:
+            if not self.ready.done():
+                self.ready.set_exception(error)
+
+    def _on_line(self, line, name):
+        if not self.ready.done() and any(marker in line for marker in READY_MARKERS):
+            self._resolve(f"{name}_marker")
+        if self.on_line:
+            self.on_line(line, name)
+
+    def _probe(self):
+        delay = PROBE_BACKOFF[0]
+        while not self.ready.done():
+            try:
+                with socket.create_connection((self.host, self.port), timeout=0.1):
+                    self._resolve("socket")
+                    return
+            except OSError:
+                pass
+            time.sleep(delay)
+            delay = min(delay * 2, PROBE_BACKOFF[1])
+
+    def _watch_exit(self):
+        code = self.process.wait()
+        if not self.ready.done():
+            # Let the readers drain what the child printed before dying
+            self.capture.join(timeout=1)
+            self._fail(ComfyStartError(f"ComfyUI exited with code {code} before it was ready", self.tail()))
+
+    # -- API ------------------------------------------------------------------
+
+    def start(self):
+        """Spawn ComfyUI and the reader/probe/exit threads"""
+        self.started_at = time.time()
+        try:
+            self.process = subprocess.Popen(
+                self.args,
+                cwd=self.cwd,
+                env=self.env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=0,
+            )
+        except OSError as e:
+            self._fail(ComfyStartError(f"Could not spawn ComfyUI: {e}"))
+            return self
+
+        self.capture.attach(self.process.stdout, "stdout")
+        self.capture.attach(self.process.stderr, "stderr")
+        Thread(target=self._probe, daemon=True, name="comfy-probe").start()
+        Thread(target=self._watch_exit, daemon=True, name="comfy-exit").start()
+        return self
+
+    def wait(self, timeout=600, log_every=30):
+        """
+        Block until ComfyUI is ready; returns the seconds since spawn.
+        Raises ComfyStartError (child died, with .tail) or TimeoutError.
+        """
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError(f"ComfyUI not ready within {timeout}s")
+            try:
+                self.ready.result(timeout=min(log_every, remaining))
+                break
+            except FutureTimeout:
+                logger.info(f"⏳ Waiting for ComfyUI... {int(time.time() - self.started_at)}s elapsed")
+        elapsed = time.time() - self.started_at
+        logger.info(f"✅ ComfyUI ready in {elapsed:.1f}s (signal: {self.ready_source})")
+        return elapsed
+
+    def tail(self, lines=50):
+        """Last captured output lines (stdout and stderr interleaved)"""
+        return self.capture.tail(lines)
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def poll(self):
+        return self.process.poll() if self.process else None
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Supervisor - crash restart + memory watchdog
+====================================================
+- Owns the ComfyUI child for the life of the worker: a crash (child exit)
+  or a hang (/system_stats unanswered for COMFY_HANG_SECONDS) kills it and
+  starts a new one, with exponential backoff between consecutive failures
+- Samples the child's RSS (/proc/<pid>/status) and the GPU memory in use
+  (/system_stats) every COMFY_WATCH_INTERVAL seconds; the latest sample
+  and the restart counters go in job metrics
+- Optional recycle between jobs: once RSS or VRAM has grown by more than
+  COMFY_RECYCLE_GROWTH_GB since the baseline, ComfyUI is restarted as soon
+  as no job is in flight. The baseline is the first sample after the first
+  job on each process, once the models are loaded (a sample taken at boot
+  would count the model load itself as growth and recycle after every job)
+- After COMFY_MAX_FAILURES boots in a row fail, the supervisor stops and
+  waiting jobs get the error; the next job starts a new round
+- Jobs that arrive during a (re)start block on wait_ready() instead of
+  failing; prompts running when ComfyUI dies are failed at once (on_down)
+
+Environment:
+    COMFY_WATCH_INTERVAL (default: 5), COMFY_HANG_SECONDS (default: 120),
+    COMFY_RESTART_BACKOFF_MAX (default: 60), COMFY_MAX_FAILURES (default: 5),
+    COMFY_RECYCLE_GROWTH_GB (default: 0 = never recycle)
+"""
+
+import os
+import time
+import logging
+import subprocess
+from contextlib import contextmanager
+from threading import Thread, Lock, Condition, Event
+
+import requests
+
+from comfy_client import get_client
+from comfy_process import ComfyStartError
+
+logger = logging.getLogger(__name__)
+
+COMFY_WATCH_INTERVAL = float(os.environ.get("COMFY_WATCH_INTERVAL", "5"))
+COMFY_HANG_SECONDS = float(os.environ.get("COMFY_HANG_SECONDS", "120"))
+COMFY_RESTART_BACKOFF_MAX = float(os.environ.get("COMFY_RESTART_BACKOFF_MAX", "60"))
+COMFY_MAX_FAILURES = int(os.environ.get("COMFY_MAX_FAILURES", "5"))
+COMFY_RECYCLE_GROWTH_GB = float(os.environ.get("COMFY_RECYCLE_GROWTH_GB", "0"))
+
+# Up this long without a restart: the next crash restarts without backoff
+STABLE_SECONDS = 300
+GB = 1024 ** 3
+
+
+def process_rss(pid):
+    """Resident memory of a process in bytes (None if unavailable)"""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def vram_used(stats):
+    """GPU memory in use on the first device of a /system_stats answer"""
+    devices = stats.get("devices") or []
+    if not devices:
+        return None
+    device = devices[0]
+    if "vram_total" not in device or "vram_free" not in device:
+        return None
+    return device["vram_total"] - device["vram_free"]
+
+
+class ComfySupervisor:
+    """
+    Keeps one ComfyUI process running.
+
+    spawn() must return a started ComfyProcess; it is called for every
+    (re)start. on_ready() runs after each successful boot, before jobs are
+    released (event stream, warmup). on_down(reason) is called when a
+    running ComfyUI is lost, to fail the prompts it was executing.
+    """
+
+    def __init__(self, spawn, on_ready=None, on_down=None, boot_timeout=600,
+                 interval=COMFY_WATCH_INTERVAL, hang_seconds=COMFY_HANG_SECONDS,
+                 backoff_max=COMFY_RESTART_BACKOFF_MAX, max_failures=COMFY_MAX_FAILURES,
+                 recycle_growth=COMFY_RECYCLE_GROWTH_GB * GB):
+        self.spawn = spawn
+        self.on_ready = on_ready
+        self.on_down = on_down
+        self.boot_timeout = boot_timeout
+        self.interval = interval
+        self.hang_seconds = hang_seconds
+        self.backoff_max = backoff_max
+        self.max_failures = max_failures
+        self.recycle_growth = recycle_growth
+
+        self.comfy = None
+        self.state = "stopped"  # starting / ready / restarting / failed
+        self.error = None
+        self.tail = ""
+        self.boot_seconds = None
+        self.restarts = {"crash": 0, "hang": 0, "recycle": 0}
+        self.last_restart = None
+        self.baseline = None
+        self.sample = {}
+        self._baseline_due = False
+
+        self._changed = Condition(Lock())
+        self._wake = Event()
+        self._thread = None
+        self._active_jobs = 0
+        self._failures = 0
+        self._stopping = False
+        self._up_since = None
+        self._last_answer = None
+
+    # -- state ----------------------------------------------------------------
+
+    def _set_state(self, state, error=None):
+        with self._changed:
+            self.state = state
+            self.error = error
+            self._changed.notify_all()
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def start(self):
+        """Start the supervisor thread (first boot), or retry after a failed boot"""
+        with self._changed:
+            if self.state == "failed":
+                self.state = "starting"
+                self._failures = 0
+            if self._thread is None:
+                self.state = "starting"
+                self._thread = Thread(target=self._run, daemon=True, name="comfy-supervisor")
+                self._thread.start()
+        self._wake.set()
+        return self
+
+    def stop(self):
+        """End supervision and kill ComfyUI (shutdown, benchmarks)"""
+        self._stopping = True
+        self._wake.set()
+        self._kill()
+        self._set_state("stopped")
+
+    def wait_ready(self, timeout):
+        """Block until ComfyUI is ready; False on timeout or failed boot"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.state in ("ready", "failed"), timeout)
+            return self.state == "ready"
+
+    @contextmanager
+    def job(self):
+        """Mark a job as using ComfyUI (no recycle while any is in flight)"""
+        with self._changed:
+            self._active_jobs += 1
+        try:
+            yield self
+        finally:
+            with self._changed:
+                self._active_jobs -= 1
+                # Models loaded by now: the next sample is this process's baseline
+                if self.baseline is None and not self._active_jobs:
+                    self._baseline_due = True
+            self._wake.set()  # recycle check right after the last job
+
+    # -- supervision loop -----------------------------------------------------
+
+    def _run(self):
+        while not self._stopping:
+            if self.state in ("starting", "restarting"):
+                self._boot()
+                continue
+            if self.state == "ready":
+                reason = self._check()
+                if reason is None and self._recycle_due():
+                    reason = "recycle"
+                if reason is not None and not self._stopping:
+                    self._restart(reason)
+                    continue
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _boot(self):
+        if self._failures > 1:
+            delay = min(self.backoff_max, 2 ** (self._failures - 2))
+            logger.info(f"⏳ Restarting ComfyUI in {delay:.0f}s (failure {self._failures})")
+            time.sleep(delay)
+
+        started = time.time()
+        try:
+            self.comfy = self.spawn()
+            self.comfy.wait(self.boot_timeout)
+            if self._stopping:
+                self._kill()
+                return
+            if self.on_ready:
+                self.on_ready()
+        except Exception as e:
+            self._failures += 1
+            self.tail = getattr(e, "tail", "")
+            logger.error(f"❌ ComfyUI boot failed: {e}")
+            if self.tail:
+                logger.error(f"ComfyUI output (last lines):\n{self.tail}")
+            self._kill()
+            message = str(e) if isinstance(e, (ComfyStartError, TimeoutError)) else f"Error starting ComfyUI: {e}"
+            # Give up (until the next job) rather than crash-looping forever
+            self._set_state("failed" if self._failures >= self.max_failures else "restarting", message)
+            return
+
+        self.boot_seconds = time.time() - started
+        Thread(target=self._watch_exit, args=(self.comfy,), daemon=True, name="comfy-exit-watch").start()
+        self._up_since = self._last_answer = time.time()
+        self.baseline = None
+        self._baseline_due = False
+        self._set_state("ready")
+        logger.info(f"✅ ComfyUI supervised (PID: {self.comfy.pid}, boot {self.boot_seconds:.1f}s)")
+
+    def _watch_exit(self, comfy):
+        """Wake the loop the moment the child exits (no wait for the next check)"""
+        comfy.process.wait()
+        self._wake.set()
+
+    def _check(self):
+        """Restart reason ("crash" / "hang") or None; refreshes the memory sample"""
+        comfy = self.comfy
+        if comfy is None or self._stopping:
+            return None
+        code = comfy.poll()
+        if code is not None:
+            logger.error(f"💥 ComfyUI exited with code {code}")
+            tail = comfy.tail(30)
+            if tail:
+                logger.error(f"ComfyUI output (last lines):\n{tail}")
+            return "crash"
+
+        now = time.time()
+        stats = None
+        try:
+            response = get_client().request("system_stats", "GET", "/system_stats", retries=0)
+            self._last_answer = now
+            if response.status_code == 200:
+                stats = response.json()
+        except ValueError:
+            pass
+        except requests.exceptions.RequestException:
+            if now - self._last_answer > self.hang_seconds:
+                logger.error(f"💥 ComfyUI has not answered /system_stats for {now - self._last_answer:.0f}s")
+                return "hang"
+
+        sample = {"rss": process_rss(comfy.pid)}
+        if stats is not None:
+            sample["vram"] = vram_used(stats)
+        elif "vram" in self.sample:
+            sample["vram"] = self.sample["vram"]
+        self.sample = sample
+        if self._baseline_due and stats is not None:
+            self.baseline = dict(sample)
+            self._baseline_due = False
+        return None
+
+    def growth(self):
+        """Largest RSS/VRAM growth since the post-first-job baseline, in bytes"""
+        if not self.baseline:
+            return 0
+        return max(
+            (self.sample.get(key) - self.baseline[key]
+             for key in ("rss", "vram")
+             if self.sample.get(key) is not None and self.baseline.get(key) is not None),
+            default=0,
+        )
+
+    def _recycle_due(self):
+        if not self.recycle_growth or self.growth() <= self.recycle_growth:
+            return False
+        with self._changed:
+            if self._active_jobs:
+                return False
+            # Claim the process before a new job can start on it
+            self.state = "restarting"
+            self._changed.notify_all()
+        return True
+
+    def _restart(self, reason):
+        self.restarts[reason] += 1
+        self.last_restart = {"reason": reason, "at": time.time(), "growth_gb": round(self.growth() / GB, 2)}
+        logger.warning(f"🔄 Restarting ComfyUI ({reason})")
+        self._set_state("restarting")
+
+        if reason != "recycle":
+            if self._up_since and time.time() - self._up_since > STABLE_SECONDS:
+                self._failures = 0
+            self._failures += 1
+            if self.on_down:
+                try:
+                    self.on_down(reason)
+                except Exception as e:
+                    logger.warning(f"⚠️ on_down hook failed: {e}")
+        # A hung process gets no grace period
+        self._kill(grace=10 if reason == "recycle" else 0)
+
+    def _kill(self, grace=10):
+        comfy, self.comfy = self.comfy, None
+        if comfy is None or comfy.process is None or comfy.poll() is not None:
+            return
+        if grace:
+            comfy.process.terminate()
+            try:
+                comfy.process.wait(grace)
+                return
+            except subprocess.TimeoutExpired:
+                pass
+        comfy.process.kill()
+        comfy.process.wait()
+
+    # -- metrics --------------------------------------------------------------
+
+    def metrics(self):
+        def gb(value):
+            return round(value / GB, 2) if value is not None else None
+
+        return {
+            "state": self.state,
+            "pid": self.comfy.pid if self.comfy else None,
+            "boot_seconds": round(self.boot_seconds, 2) if self.boot_seconds is not None else None,
+            "restarts": dict(self.restarts),
+            "last_restart": self.last_restart,
+            "rss_gb": gb(self.sample.get("rss")),
+            "vram_used_gb": gb(self.sample.get("vram")),
+            "growth_gb": gb(self.growth()),
+            "output": self.comfy.capture.metrics() if self.comfy else None,
+        }
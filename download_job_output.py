@@ -8,9 +8,23 @@ import sys
 import json
 import io
 import base64
+import time
+import hashlib
+import binascii
+import argparse
 from pathlib import Path
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeout
+from requests.adapters import HTTPAdapter
 import os
 
+from test_client import TERMINAL_STATUSES, add_webhook_arguments, start_webhook_receiver
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 # Fix Windows console
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
@@ -19,6 +33,7 @@ if sys.platform == 'win32':
 API_KEY = os.getenv("RUNPOD_API_KEY", "YOUR_API_KEY_HERE")
 ENDPOINT_ID = os.getenv("ENDPOINT_ID", "YOUR_ENDPOINT_ID")
 OUTPUT_DIR = Path(__file__).parent / "outputs"
+MB = 1024 * 1024
 
 def get_job_output(job_id):
     """Récupère l'output d'un job et sauvegarde la vidéo"""
@@ -107,11 +122,477 @@ def get_job_output(job_id):
         import traceback
         traceback.print_exc()
 
+
+# ==============================================================================
+# MODE BULK: plusieurs jobs en parallèle, base64 décodé en streaming
+# ==============================================================================
+#   python download_job_output.py --bulk ID1 ID2 ...
+#   python download_job_output.py --manifest jobs.jsonl --workers 8
+# - Une session HTTP partagée (pool de connexions), un thread par job
+# - Le corps de /status est lu par blocs: les chaînes base64 des outputs sont
+#   décodées au fil de l'eau vers un .part sur disque, seul le reste (petit)
+#   est gardé en mémoire -> mémoire stable quelle que soit la taille vidéo
+# - Outputs par URL (sink S3): téléchargés en streaming, reprise par Range
+# - sha256 (ou taille) vérifié avant de renommer le .part en fichier final
+# - Fichiers déjà présents et vérifiés: sautés; jobs déjà complets d'après
+#   OUTPUT_DIR/downloads.jsonl: sautés sans appel API
+# - --webhook: jobs pas encore terminés attendus par webhook (soumis avec
+#   --webhook-url vers ce récepteur, cf. test_client.py) au lieu d'être en
+#   échec; /status n'est relu qu'à la réception ou en secours
+#   (--webhook-fallback secondes sans nouvelles)
+
+API_BASE = os.getenv("RUNPOD_API_BASE", "https://api.runpod.ai")
+CHUNK_SIZE = 256 * 1024
+BLOB_KEYS = (b"base64", b"data")
+BLOB_MARKER = "@blob:"
+DOWNLOADS_MANIFEST = "downloads.jsonl"
+WHITESPACE = b" \t\r\n"
+
+
+class Base64FileWriter:
+    """Décode du base64 par blocs vers un fichier, sha256 au passage"""
+
+    def __init__(self, path):
+        self.path = path
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.error = None
+        self._pending = b""
+        # Toujours réécrit: /status est relu en entier de toute façon, et un
+        # .part resté d'un run précédent n'est pas vérifiable
+        self._file = open(path, "wb")
+
+    def write(self, text):
+        if self.error:
+            return
+        text = (self._pending + text).replace(b"\\/", b"/")
+        # "\/" coupé entre deux blocs: garder le "\" pour le bloc suivant
+        hold = b"\\" if text.endswith(b"\\") else b""
+        text = text[:len(text) - len(hold)]
+        usable = len(text) - len(text) % 4
+        self._pending = text[usable:] + hold
+        try:
+            self._write_decoded(binascii.a2b_base64(text[:usable]))
+        except binascii.Error as e:
+            self.error = e
+
+    def _write_decoded(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        if data:
+            self._file.write(data)
+
+    def close(self):
+        try:
+            if self._pending and not self.error:
+                self._write_decoded(binascii.a2b_base64(self._pending))
+        except binascii.Error as e:
+            self.error = e
+        finally:
+            self._file.close()
+
+
+class StatusStream:
+    """
+    Parse incrémental du JSON de /status: les chaînes sous une clé
+    "base64"/"data" partent vers open_blob(n) (writer avec write/close) et
+    sont remplacées par "@blob:n" dans le squelette, le reste est gardé.
+    """
+
+    def __init__(self, open_blob):
+        self.open_blob = open_blob
+        self.skeleton = bytearray()
+        self.blobs = []
+        self._state = "json"
+        self._string = bytearray()
+        self._blob = None
+        self._escape = False
+
+    def feed(self, chunk):
+        i, n = 0, len(chunk)
+        while i < n:
+            if self._state == "blob":
+                i = self._feed_blob(chunk, i)
+                continue
+            byte = chunk[i:i + 1]
+            state = self._state
+            if state == "json":
+                end = chunk.find(b'"', i)
+                end = n if end < 0 else end
+                self.skeleton += chunk[i:end]
+                if end < n:
+                    self.skeleton += b'"'
+                    self._string.clear()
+                    self._state = "string"
+                i = end + 1
+                continue
+            if state == "string":
+                self.skeleton += byte
+                if self._escape:
+                    self._escape = False
+                    self._string += byte
+                elif byte == b"\\":
+                    self._escape = True
+                elif byte == b'"':
+                    self._state = "key" if bytes(self._string) in BLOB_KEYS else "json"
+                else:
+                    self._string += byte
+            elif state == "key":
+                # Après la chaîne: ":" si c'est une clé
+                if byte in WHITESPACE:
+                    self.skeleton += byte
+                elif byte == b":":
+                    self.skeleton += byte
+                    self._state = "value"
+                else:
+                    self._state = "json"
+                    continue
+            elif state == "value":
+                if byte in WHITESPACE:
+                    self.skeleton += byte
+                elif byte == b'"':
+                    self.skeleton += f'"{BLOB_MARKER}{len(self.blobs)}'.encode()
+                    self._blob = self.open_blob(len(self.blobs))
+                    self.blobs.append(self._blob)
+                    self._state = "blob"
+                else:
+                    # "data": {...} ou un nombre: pas une chaîne à streamer
+                    self._state = "json"
+                    continue
+            i += 1
+
+    def _feed_blob(self, chunk, i):
+        end = chunk.find(b'"', i)
+        # Une fin de chaîne n'est jamais précédée de "\" en base64 (seul "\/" existe)
+        text = chunk[i:] if end < 0 else chunk[i:end]
+        if text:
+            self._blob.write(text)
+        if end < 0:
+            return len(chunk)
+        self._blob.close()
+        self._blob = None
+        self.skeleton += b'"'
+        self._state = "json"
+        return end + 1
+
+    def result(self):
+        if self._blob is not None:
+            self._blob.close()
+            raise ValueError("Réponse /status tronquée")
+        return json.loads(bytes(self.skeleton))
+
+
+class BulkDownloader:
+    """Téléchargement concurrent des outputs de plusieurs jobs"""
+
+    def __init__(self, endpoint_id=ENDPOINT_ID, api_key=API_KEY, api_base=API_BASE,
+                 output_dir=OUTPUT_DIR, workers=4, webhook=None, webhook_fallback=30.0, job_timeout=900):
+        self.status_url = f"{api_base.rstrip('/')}/v2/{endpoint_id}/status"
+        self.output_dir = Path(output_dir)
+        self.workers = workers
+        self.webhook = webhook  # WebhookReceiver (test_client.py) ou None
+        self.webhook_fallback = webhook_fallback
+        self.job_timeout = job_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(workers, 10))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
+        self.bytes = 0
+        self.files = 0
+        self.skipped = 0
+        self.failed = 0
+        self._lock = Lock()
+        self.done = self._load_done()
+
+    # -- manifeste des fichiers déjà téléchargés ------------------------------
+
+    def _load_done(self):
+        done = {}
+        path = self.output_dir / DOWNLOADS_MANIFEST
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        done.setdefault(record["job_id"], []).append(record)
+        return done
+
+    def _record_done(self, record):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            with open(self.output_dir / DOWNLOADS_MANIFEST, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def _already_done(self, job_id):
+        records = self.done.get(job_id)
+        return bool(records) and all(
+            (self.output_dir / job_id / r["filename"]).exists()
+            and (self.output_dir / job_id / r["filename"]).stat().st_size == r["size_bytes"]
+            for r in records
+        )
+
+    # -- un job ---------------------------------------------------------------
+
+    def download_job(self, job_id):
+        if self._already_done(job_id):
+            with self._lock:
+                self.skipped += 1
+            print(f"  ⏭️  {job_id}: déjà téléchargé")
+            return []
+
+        job_dir = self.output_dir / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        data, parts = self._fetch_status(job_id, job_dir)
+        if self.webhook is not None and data.get("status") not in TERMINAL_STATUSES:
+            data, parts = self._wait_webhook(job_id, job_dir)
+
+        status = data.get("status")
+        output = data.get("output") if isinstance(data.get("output"), dict) else {}
+        if status != "COMPLETED":
+            self._discard(parts)
+            raise RuntimeError(f"job {status}: {output.get('error') or data.get('error', '')}")
+
+        saved = []
+        for i, item in enumerate(output.get("outputs", []), 1):
+            filename = os.path.basename(item.get("filename") or f"output_{i}.bin")
+            blob = self._blob_of(item, parts)
+            if blob is not None:
+                path = self._save_blob(blob, job_dir / filename, item)
+            elif item.get("url"):
+                path = self._save_url(item["url"], job_dir / filename, item)
+            else:
+                print(f"  ⚠️  {job_id}/{filename}: pas de données")
+                continue
+            record = {"job_id": job_id, "filename": filename, "size_bytes": path.stat().st_size,
+                      "sha256": item.get("sha256")}
+            self._record_done(record)
+            saved.append(path)
+        self._discard(parts)
+        return saved
+
+    def _fetch_status(self, job_id, job_dir):
+        """/status lu en streaming: (squelette JSON, {n: Base64FileWriter})"""
+        parts = {}
+
+        def open_blob(n):
+            path = job_dir / f".blob{n}.part"
+            parts[n] = Base64FileWriter(path)
+            return parts[n]
+
+        stream = StatusStream(open_blob)
+        with self.session.get(f"{self.status_url}/{job_id}", stream=True, timeout=60) as resp:
+            resp.raise_for_status()
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                stream.feed(chunk)
+        return stream.result(), parts
+
+    def _wait_webhook(self, job_id, job_dir):
+        """
+        Job pas terminé: attend son webhook (simple signal, l'output est relu
+        en streaming sur /status), /status relu en secours toutes les
+        webhook_fallback secondes
+        """
+        print(f"  ⏳ {job_id}: en attente du webhook")
+        future = self.webhook.expect(job_id)
+        started = time.time()
+        try:
+            while True:
+                try:
+                    future.result(timeout=self.webhook_fallback)
+                    # Webhook reçu mais /status pas encore terminal: on réarme,
+                    # sinon le future résolu ferait boucler sans attente
+                    self.webhook.forget(job_id)
+                    future = self.webhook.expect(job_id)
+                except FutureTimeout:
+                    pass
+                data, parts = self._fetch_status(job_id, job_dir)
+                if data.get("status") in TERMINAL_STATUSES:
+                    return data, parts
+                self._discard(parts)
+                if time.time() - started > self.job_timeout:
+                    raise TimeoutError(f"job pas terminé après {self.job_timeout:.0f}s")
+        finally:
+            self.webhook.forget(job_id)
+
+    def _blob_of(self, item, parts):
+        for key in ("base64", "data"):
+            value = item.get(key)
+            if isinstance(value, str) and value.startswith(BLOB_MARKER):
+                return parts.pop(int(value[len(BLOB_MARKER):]))
+        return None
+
+    def _discard(self, parts):
+        for blob in parts.values():
+            try:
+                os.remove(blob.path)
+            except OSError:
+                pass
+
+    def _verify(self, path, item, sha256=None, size=None):
+        """Vérifie sha256 (sinon taille) d'un fichier; relit le disque si besoin"""
+        expected = item.get("sha256")
+        if expected:
+            if sha256 is None:
+                digest = hashlib.sha256()
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        digest.update(chunk)
+                sha256 = digest.hexdigest()
+            return sha256 == expected
+        expected_size = item.get("size_bytes")
+        return expected_size is None or (size if size is not None else path.stat().st_size) == expected_size
+
+    def _present(self, path, item):
+        if path.exists() and (item.get("sha256") or item.get("size_bytes")) and self._verify(path, item):
+            with self._lock:
+                self.skipped += 1
+            print(f"  ⏭️  {path.parent.name}/{path.name}: déjà présent")
+            return True
+        return False
+
+    def _save_blob(self, blob, path, item):
+        if blob.error:
+            raise ValueError(f"base64 invalide pour {path.name}: {blob.error}")
+        if self._present(path, item):
+            return path
+        if not self._verify(blob.path, item, blob.sha256.hexdigest(), blob.size):
+            raise ValueError(f"checksum invalide pour {path.name}")
+        os.replace(blob.path, path)
+        self._count(path)
+        return path
+
+    def _save_url(self, url, path, item):
+        if self._present(path, item):
+            return path
+        part = path.with_name(f".{path.name}.part")
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        # URL présignée: pas d'en-tête Authorization
+        with requests.get(url, headers=headers, stream=True, timeout=60) as resp:
+            # 416: le .part est déjà complet (interrompu avant le renommage)
+            complete = offset and resp.status_code == 416
+            if not complete:
+                resp.raise_for_status()
+                if resp.status_code != 206:
+                    offset = 0  # le serveur ignore Range: on repart de zéro
+                with open(part, "ab" if offset else "wb") as f:
+                    for chunk in resp.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+        if not self._verify(part, item):
+            os.remove(part)
+            if complete:
+                return self._save_url(url, path, item)  # .part invalide: on repart de zéro
+            raise ValueError(f"checksum invalide pour {path.name}")
+        os.replace(part, path)
+        self._count(path)
+        return path
+
+    def _count(self, path):
+        with self._lock:
+            self.bytes += path.stat().st_size
+            self.files += 1
+
+    # -- plusieurs jobs -------------------------------------------------------
+
+    def run(self, job_ids):
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.download_job, job_id): job_id for job_id in job_ids}
+            for future in as_completed(futures):
+                job_id = futures[future]
+                try:
+                    for path in future.result():
+                        print(f"  ✅ {job_id}/{path.name} ({path.stat().st_size / MB:.2f} MB)")
+                except Exception as e:
+                    with self._lock:
+                        self.failed += 1
+                    print(f"  ❌ {job_id}: {e}")
+        elapsed = time.time() - started
+        return {
+            "jobs": len(job_ids),
+            "files": self.files,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "mb": round(self.bytes / MB, 2),
+            "seconds": round(elapsed, 2),
+            "mb_per_second": round(self.bytes / MB / max(elapsed, 1e-9), 2),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def read_job_ids(path):
+    """IDs depuis un fichier: JSONL ({"id"} ou {"job_id"} par ligne), un ID par ligne, ou le JSON de test_client load"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        data = json.loads(text)
+        rows = data.get("jobs", []) if isinstance(data, dict) else data
+    else:
+        rows = [json.loads(line) if line.lstrip().startswith("{") else line.strip()
+                for line in text.splitlines() if line.strip() and not line.startswith("#")]
+    ids = []
+    for row in rows:
+        job_id = row if isinstance(row, str) else row.get("job_id") or row.get("id")
+        if job_id and job_id not in ids:
+            ids.append(job_id)
+    return ids
+
+
+def bulk_main(argv):
+    parser = argparse.ArgumentParser(prog="download_job_output.py", description="Téléchargement bulk des outputs")
+    parser.add_argument("job_ids", nargs="*")
+    parser.add_argument("--bulk", action="store_true", help="(mode bulk, implicite avec plusieurs IDs)")
+    parser.add_argument("--manifest", help="JSONL / liste d'IDs / JSON de test_client load")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--endpoint", default=ENDPOINT_ID)
+    parser.add_argument("--api-base", default=API_BASE)
+    parser.add_argument("--output-dir", default=str(OUTPUT_DIR))
+    add_webhook_arguments(parser)
+    parser.add_argument("--job-timeout", type=float, default=900, help="attente max d'un job (--webhook)")
+    args = parser.parse_args(argv)
+
+    job_ids = list(args.job_ids)
+    if args.manifest:
+        job_ids += [job_id for job_id in read_job_ids(args.manifest) if job_id not in job_ids]
+    if not job_ids:
+        parser.error("aucun job ID")
+
+    print("=" * 70)
+    print(f"📡 {len(job_ids)} job(s), {args.workers} en parallèle -> {args.output_dir}")
+    print("=" * 70)
+    webhook = start_webhook_receiver(args)
+    downloader = BulkDownloader(args.endpoint, API_KEY, args.api_base, args.output_dir, args.workers,
+                                webhook, args.webhook_fallback, args.job_timeout)
+    try:
+        report = downloader.run(job_ids)
+    finally:
+        if webhook is not None:
+            webhook.stop()
+    print(f"\n🎉 {report['files']} fichier(s), {report['mb']} MB en {report['seconds']}s "
+          f"({report['mb_per_second']} MB/s) - {report['skipped']} sauté(s), {report['failed']} échec(s)")
+    if report["peak_rss_mb"] is not None:
+        print(f"🧠 Pic mémoire: {report['peak_rss_mb']} MB")
+    return report
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 2 or (len(sys.argv) == 2 and sys.argv[1].startswith("-")):
+        bulk_main(sys.argv[1:])
+        sys.exit(0)
+
     if len(sys.argv) < 2:
         print("Usage: python download_job_output.py <job_id>")
         print("\nExemple:")
         print("  python download_job_output.py 94bfe8e4-80a2-406e-882d-bf0f27b303f2-e2")
+        print("  python download_job_output.py --bulk ID1 ID2 ... | --manifest jobs.jsonl [--workers 8]")
+        print("  python download_job_output.py ID --webhook --webhook-port 8765  (attend la fin du job)")
         print("\nLe fichier sera sauvegardé dans ./outputs/")
         sys.exit(1)
     
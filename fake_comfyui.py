@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Fake ComfyUI server for local testing (no GPU, stdlib only)
+===========================================================
+Implements the parts of the ComfyUI API the handlers use:
+- GET  /                     -> 200
+- POST /prompt               -> queues the workflow, returns prompt_id
+- GET  /history[/{id}]       -> finished prompts
+- POST /history              -> {"delete": [ids]} / {"clear": true}
+- GET  /ws?clientId=         -> WebSocket with executing/executed/execution_* events
+  (plus "progress" steps for sampler / interpolation nodes)
+- GET  /object_info[/{class}] -> node schemas (combo inputs for the samplers)
+- GET  /system_stats         -> one fake 80 GB GPU
+
+Each node "runs" for --node-delay seconds (or --class-delay CLASS=SECONDS);
+SaveImage / VHS_VideoCombine nodes write --output-bytes random bytes into
+--output-dir. Per-prompt timings (queued/started/finished) are kept in
+FakeComfyUI.timings for benchmarks (see bench_handler.py).
+
+Usage:
+    python fake_comfyui.py --port 8188 --node-delay 0.05 --class-delay FSamplerAdvanced=1.5
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import base64
+import socket
+import struct
+import hashlib
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread, Lock
+from urllib.parse import urlparse, parse_qs, unquote
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OUTPUT_NODES = {
+    "SaveImage": ("images", ".png"),
+    "VHS_VideoCombine": ("gifs", ".mp4"),
+}
+
+# Nodes that report "progress" steps while they run
+PROGRESS_NODES = {"KSampler", "KSamplerAdvanced", "FSamplerAdvanced", "RIFE VFI"}
+
+SAMPLERS = ["euler", "euler_ancestral", "dpmpp_2m", "dpmpp_sde", "uni_pc", "lcm"]
+SCHEDULERS = ["normal", "karras", "exponential", "simple", "sgm_uniform", "beta"]
+
+# Combo inputs of the nodes the tiers validate; other classes get an empty schema
+OBJECT_INFO = {
+    "KSampler": {"sampler_name": [SAMPLERS], "scheduler": [SCHEDULERS]},
+    "KSamplerAdvanced": {"sampler_name": [SAMPLERS], "scheduler": [SCHEDULERS]},
+    "FSamplerAdvanced": {"sampler_name": [SAMPLERS], "scheduler": [SCHEDULERS]},
+}
+
+
+def node_info(class_type):
+    return {
+        "input": {"required": dict(OBJECT_INFO.get(class_type, {})), "optional": {}},
+        "output": [],
+        "name": class_type,
+        "display_name": class_type,
+        "category": "fake",
+        "output_node": class_type in OUTPUT_NODES,
+    }
+
+
+class WebSocketPeer:
+    """Server side of one WebSocket connection (text frames only)"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.lock = Lock()
+        self.closed = False
+
+    def send_json(self, payload):
+        data = json.dumps(payload).encode("utf-8")
+        header = bytearray([0x81])
+        if len(data) < 126:
+            header.append(len(data))
+        elif len(data) < 65536:
+            header.append(126)
+            header += struct.pack(">H", len(data))
+        else:
+            header.append(127)
+            header += struct.pack(">Q", len(data))
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                self.sock.sendall(bytes(header) + data)
+            except OSError:
+                self.closed = True
+
+    def close(self):
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                try:
+                    self.sock.sendall(b"\x88\x00")
+                    self.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def read_until_closed(self):
+        """Consume client frames (ping/close); returns when the peer goes away"""
+        while not self.closed:
+            try:
+                head = self._recv_exact(2)
+                opcode = head[0] & 0x0F
+                length = head[1] & 0x7F
+                if length == 126:
+                    length = struct.unpack(">H", self._recv_exact(2))[0]
+                elif length == 127:
+                    length = struct.unpack(">Q", self._recv_exact(8))[0]
+                if head[1] & 0x80:
+                    self._recv_exact(4)  # client mask, payload is ignored
+                self._recv_exact(length)
+                if opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    with self.lock:
+                        self.sock.sendall(b"\x8a\x00")
+            except (OSError, ConnectionError):
+                break
+        self.closed = True
+
+    def _recv_exact(self, n):
+        buf = b""
+        while len(buf) < n:
+            chunk = self.sock.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("peer closed")
+            buf += chunk
+        return buf
+
+
+class FakeComfyUI:
+    """In-process fake ComfyUI; start()/stop() or use as a context manager"""
+
+    def __init__(self, host="127.0.0.1", port=8188, node_delay=0.05,
+                 output_dir="/tmp/fake_comfyui/output", output_bytes=1024,
+                 class_delays=None, progress_steps=10):
+        self.host = host
+        self.port = port
+        self.node_delay = node_delay
+        self.class_delays = dict(class_delays or {})
+        self.progress_steps = progress_steps
+        self.output_dir = output_dir
+        self.output_bytes = output_bytes
+
+        self.history = {}
+        self.timings = {}  # prompt_id -> {"queued", "started", "finished"}
+        self.seen_classes = set()
+        self.peers = {}
+        self.lock = Lock()
+        self.jobs = queue.Queue()
+        self.server = None
+
+    # -- lifecycle ------------------------------------------------------------
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        Thread(target=self._worker, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.drop_websockets()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def drop_websockets(self):
+        """Close every WebSocket (simulates a dropped connection)"""
+        with self.lock:
+            peers = list(self.peers.values())
+            self.peers.clear()
+        for peer in peers:
+            peer.close()
+
+    # -- execution ------------------------------------------------------------
+
+    def _send(self, client_id, msg_type, data):
+        with self.lock:
+            peer = self.peers.get(client_id)
+        if peer is not None:
+            peer.send_json({"type": msg_type, "data": data})
+
+    def _worker(self):
+        while True:
+            prompt_id, workflow, client_id = self.jobs.get()
+            started = time.time()
+            with self.lock:
+                self.timings[prompt_id]["started"] = started
+            outputs = {}
+            self._send(client_id, "execution_start", {"prompt_id": prompt_id, "timestamp": int(started * 1000)})
+
+            for node_id, node in workflow.items():
+                self._send(client_id, "executing", {"node": node_id, "display_node": node_id, "prompt_id": prompt_id})
+                class_type = node.get("class_type")
+                self._run_node(client_id, prompt_id, node_id, class_type)
+
+                if class_type in OUTPUT_NODES:
+                    key, ext = OUTPUT_NODES[class_type]
+                    output = {key: [self._write_output(node, prompt_id, ext)]}
+                    outputs[node_id] = output
+                    self._send(client_id, "executed", {"node": node_id, "display_node": node_id, "output": output, "prompt_id": prompt_id})
+
+            with self.lock:
+                self.history[prompt_id] = {
+                    "prompt": [0, prompt_id, workflow, {"client_id": client_id}, list(outputs)],
+                    "outputs": outputs,
+                    "status": {"status_str": "success", "completed": True, "messages": [
+                        ["execution_start", {"prompt_id": prompt_id, "timestamp": int(started * 1000)}],
+                        ["execution_success", {"prompt_id": prompt_id, "timestamp": int(time.time() * 1000)}],
+                    ]},
+                }
+                self.timings[prompt_id]["finished"] = time.time()
+            self._send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+            self._send(client_id, "execution_success", {"prompt_id": prompt_id, "timestamp": int(time.time() * 1000)})
+
+    def _run_node(self, client_id, prompt_id, node_id, class_type):
+        """Sleep for the node's delay, sending progress steps for sampler-like nodes"""
+        delay = self.class_delays.get(class_type, self.node_delay)
+        if class_type not in PROGRESS_NODES or not self.progress_steps:
+            time.sleep(delay)
+            return
+        for step in range(1, self.progress_steps + 1):
+            time.sleep(delay / self.progress_steps)
+            self._send(client_id, "progress", {"value": step, "max": self.progress_steps,
+                                               "prompt_id": prompt_id, "node": node_id})
+
+    def _write_output(self, node, prompt_id, ext):
+        prefix = node.get("inputs", {}).get("filename_prefix", "ComfyUI")
+        subfolder, _, stem = prefix.rpartition("/")
+        filename = f"{stem or 'ComfyUI'}_{prompt_id[:8]}_00001{ext}"
+        folder = os.path.join(self.output_dir, subfolder)
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, filename), "wb") as f:
+            f.write(os.urandom(self.output_bytes))
+        return {"filename": filename, "subfolder": subfolder, "type": "output"}
+
+    # -- HTTP -----------------------------------------------------------------
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length", 0))
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/ws":
+                    return self._websocket(parse_qs(url.query).get("clientId", [""])[0])
+                if url.path == "/":
+                    body = b"<html>fake ComfyUI</html>"
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    return self.wfile.write(body)
+                if url.path == "/history":
+                    with fake.lock:
+                        return self._json(dict(fake.history))
+                if url.path == "/system_stats":
+                    return self._json({
+                        "system": {"os": "posix", "python_version": sys.version, "comfyui_version": "fake",
+                                   "ram_total": 64 * 1024 ** 3, "ram_free": 48 * 1024 ** 3},
+                        "devices": [{"name": "cuda:0 Fake GPU", "type": "cuda", "index": 0,
+                                     "vram_total": 80 * 1024 ** 3, "vram_free": 60 * 1024 ** 3,
+                                     "torch_vram_total": 20 * 1024 ** 3, "torch_vram_free": 1024 ** 3}],
+                    })
+                if url.path == "/object_info":
+                    with fake.lock:
+                        classes = set(OBJECT_INFO) | set(OUTPUT_NODES) | fake.seen_classes
+                    return self._json({name: node_info(name) for name in sorted(classes)})
+                if url.path.startswith("/object_info/"):
+                    class_type = unquote(url.path[len("/object_info/"):])
+                    return self._json({class_type: node_info(class_type)})
+                if url.path.startswith("/history/"):
+                    prompt_id = url.path[len("/history/"):]
+                    with fake.lock:
+                        entry = fake.history.get(prompt_id)
+                    return self._json({prompt_id: entry} if entry else {})
+                self._json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path == "/prompt":
+                    payload = self._body()
+                    workflow = payload.get("prompt")
+                    if not isinstance(workflow, dict):
+                        return self._json({"error": "no prompt"}, 400)
+                    prompt_id = payload.get("prompt_id") or str(uuid.uuid4())
+                    with fake.lock:
+                        fake.timings[prompt_id] = {"queued": time.time(), "started": None, "finished": None}
+                        fake.seen_classes.update(node.get("class_type") for node in workflow.values()
+                                                 if isinstance(node, dict) and node.get("class_type"))
+                    fake.jobs.put((prompt_id, workflow, payload.get("client_id", "")))
+                    return self._json({"prompt_id": prompt_id, "number": fake.jobs.qsize(), "node_errors": {}})
+                if url.path == "/history":
+                    payload = self._body()
+                    with fake.lock:
+                        if payload.get("clear"):
+                            fake.history.clear()
+                        for prompt_id in payload.get("delete", []):
+                            fake.history.pop(prompt_id, None)
+                    return self._json({})
+                self._json({"error": "not found"}, 404)
+
+            def _websocket(self, client_id):
+                key = self.headers.get("Sec-WebSocket-Key", "")
+                accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+                self.send_response(101, "Switching Protocols")
+                self.send_header("Upgrade", "websocket")
+                self.send_header("Connection", "Upgrade")
+                self.send_header("Sec-WebSocket-Accept", accept)
+                self.end_headers()
+                self.wfile.flush()
+
+                peer = WebSocketPeer(self.connection)
+                with fake.lock:
+                    fake.peers[client_id] = peer
+                peer.send_json({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": 0}}, "sid": client_id}})
+                peer.read_until_closed()
+                with fake.lock:
+                    if fake.peers.get(client_id) is peer:
+                        del fake.peers[client_id]
+                self.close_connection = True
+
+        return Handler
+
+
+def parse_class_delays(items):
+    """["FSamplerAdvanced=1.5", ...] -> {"FSamplerAdvanced": 1.5}"""
+    delays = {}
+    for item in items:
+        class_type, _, seconds = item.rpartition("=")
+        if not class_type:
+            raise ValueError(f"Expected CLASS=SECONDS, got '{item}'")
+        delays[class_type] = float(seconds)
+    return delays
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake ComfyUI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--node-delay", type=float, default=0.05, help="seconds per node")
+    parser.add_argument("--output-dir", default="/tmp/fake_comfyui/output")
+    parser.add_argument("--output-bytes", type=int, default=1024)
+    parser.add_argument("--class-delay", action="append", default=[], metavar="CLASS=SECONDS",
+                        help="per node class delay, repeatable (e.g. FSamplerAdvanced=1.5)")
+    parser.add_argument("--progress-steps", type=int, default=10, help="progress events per sampler node")
+    args = parser.parse_args()
+
+    fake = FakeComfyUI(args.host, args.port, args.node_delay, args.output_dir, args.output_bytes,
+                       class_delays=parse_class_delays(args.class_delay),
+                       progress_steps=args.progress_steps).start()
+    print(f"🧪 Fake ComfyUI listening on {fake.url} (outputs: {args.output_dir})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -32,8 +32,8 @@ try:
     print(f"  ✅ torch {torch.__version__}, CUDA: {torch.cuda.is_available()}", flush=True)
     
     print("[4/8] Importing other deps...", flush=True)
-    import requests
     import subprocess
+    from comfy_client import ComfyClient
     import logging
     from threading import Thread
     print("  ✅ All imports OK", flush=True)
@@ -114,14 +114,12 @@ try:
         logger.info("Waiting for ComfyUI to be ready...")
         deadline = time.time() + timeout
         
+        client = ComfyClient(f"http://127.0.0.1:{port}")
+        
         while time.time() < deadline:
-            try:
-                resp = requests.get(f"http://127.0.0.1:{port}", timeout=2)
-                if resp.status_code == 200:
-                    logger.info(f"✅ ComfyUI ready! (took {int(time.time() - (deadline - timeout))}s)")
-                    return True
-            except:
-                pass
+            if client.is_up():
+                logger.info(f"✅ ComfyUI ready! (took {int(time.time() - (deadline - timeout))}s)")
+                return True
             time.sleep(2)
         
         raise RuntimeError(f"ComfyUI failed to start within {timeout}s")
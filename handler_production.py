@@ -20,11 +20,8 @@ print("=" * 70, flush=True)
 try:
     # Core imports
     print("[1/10] Importing standard libs...", flush=True)
-    import json
-    import base64
     import traceback
     from pathlib import Path
-    import subprocess
     from threading import Thread
     print("  ✅ Standard libs OK", flush=True)
     
@@ -36,22 +33,34 @@ try:
     import torch
     print(f"  ✅ torch {torch.__version__}, CUDA: {torch.cuda.is_available()}", flush=True)
     
-    print("[4/10] Importing requests...", flush=True)
-    import requests
+    print("[4/10] Importing worker modules...", flush=True)
     import logging
+    from comfy_client import get_client
+    from comfy_events import get_event_stream, progress_chunk
+    from output_encoder import get_encoder, EncodeReport
+    from output_sink import get_s3_sink, resolve_sink, UploadReport
+    from workflow_registry import get_registry
+    from tiers import apply_tier, check_tier
+    from job_concurrency import CONCURRENT_JOBS, isolate_outputs, serverless_config
+    from result_cache import get_result_cache, workflow_key
+    from warmup import WARMUP, get_warmup
+    from model_prefetch import PREFETCH_WORKFLOWS, get_prefetcher
+    from model_catalog import MODEL_PREFLIGHT, get_catalog, preflight_error
+    from boot_timeline import get_timeline, mark
+    from comfy_process import ComfyProcess
+    from comfy_supervisor import ComfySupervisor
+    from log_pipeline import COMFY_LOGGER, setup_logging, get_pipeline
+    from node_profiler import NODE_PROFILE, NodeProfile, get_model_loads
+    from output_resolver import resolve_outputs
+    mark("imports")
     print("  ✅ All imports OK", flush=True)
     
     # Setup logging
     print("[5/10] Setting up logging...", flush=True)
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s | %(levelname)s | %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler('/runpod-volume/handler_production.log')
-        ]
-    )
+    # Queue + background writer: no log call ever waits on the volume
+    setup_logging('/runpod-volume/handler_production.log')
     logger = logging.getLogger(__name__)
+    comfy_logger = logging.getLogger(COMFY_LOGGER)
     print("  ✅ Logging OK", flush=True)
     
     # Paths
@@ -65,7 +74,6 @@ try:
     
     # Global state
     comfy_process = None
-    comfy_ready = False
     
     print("[6/10] Setting up directories...", flush=True)
     
@@ -106,6 +114,10 @@ try:
     
     ensure_symlinks()
     ensure_temp_directory()
+    
+    # Index the models on the volume in the background (stat scan, then hashing)
+    Thread(target=get_catalog(COMFY_DIR).start, daemon=True).start()
+    mark("symlinks")
     print("  ✅ Directories OK", flush=True)
     
     print("[7/10] Checking system...", flush=True)
@@ -125,114 +137,99 @@ try:
     else:
         logger.warning("⚠️ CUDA not available - will use CPU")
     
+    mark("diagnostics")
     print("  ✅ System check OK", flush=True)
     
     print("[8/10] Starting ComfyUI...", flush=True)
     
+    def log_comfy_line(line, stream):
+        get_model_loads().observe(line)
+        # Progress bars are sampled by the pipeline
+        comfy_logger.info(f"[ComfyUI] {line}", extra={"stream": stream})
+    
     def start_comfyui():
-        """Start ComfyUI server in background"""
-        global comfy_process, comfy_ready
+        """Spawn ComfyUI (called by the supervisor on every (re)start)"""
+        global comfy_process
         
         logger.info("🚀 Starting ComfyUI server...")
         main_py = f"{COMFY_DIR}/main.py"
         
         if not os.path.exists(main_py):
-            logger.error(f"❌ ComfyUI not found at {main_py}")
-            return
+            raise FileNotFoundError(f"❌ ComfyUI not found at {main_py}")
         
-        try:
-            comfy_process = subprocess.Popen(
-                ["python", main_py, "--listen", "127.0.0.1", "--port", "8188"],
-                cwd=COMFY_DIR,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                bufsize=1,
-                universal_newlines=True
-            )
-            logger.info(f"✅ ComfyUI started (PID: {comfy_process.pid})")
-            
-            # Monitor output
-            for line in comfy_process.stdout:
-                line = line.strip()
-                if line:
-                    logger.info(f"[ComfyUI] {line}")
-                    if "To see the GUI go to" in line or "Starting server" in line:
-                        comfy_ready = True
-                        logger.info("✅ ComfyUI is READY!")
-                        
-        except Exception as e:
-            logger.error(f"❌ Failed to start ComfyUI: {e}")
-            traceback.print_exc()
-    
-    def wait_for_comfyui(timeout=300):
-        """Wait for ComfyUI to be ready"""
-        logger.info(f"⏳ Waiting for ComfyUI (timeout: {timeout}s)...")
-        deadline = time.time() + timeout
-        start = time.time()
+        # Read the workflow's models from the volume while ComfyUI boots
+        prefetcher = get_prefetcher().start(PREFETCH_WORKFLOWS, [WORKFLOWS_BASE, WORKFLOWS_FALLBACK], COMFY_DIR)
         
-        while time.time() < deadline:
-            try:
-                resp = requests.get("http://127.0.0.1:8188", timeout=2)
-                if resp.status_code == 200:
-                    elapsed = int(time.time() - start)
-                    logger.info(f"✅ ComfyUI ready! (took {elapsed}s)")
-                    return True
-            except:
-                pass
-            
-            time.sleep(2)
+        # Ready on the stdout marker or open port, whichever comes first;
+        # fails at once, with the output tail, if ComfyUI exits
+        comfy = ComfyProcess(
+            ["python", main_py, "--listen", "127.0.0.1", "--port", "8188", *prefetcher.comfy_args(COMFY_DIR)],
+            cwd=COMFY_DIR,
+            on_line=log_comfy_line
+        ).start()
+        comfy_process = comfy.process
+        mark("comfy_spawn")
+        logger.info(f"✅ ComfyUI started (PID: {comfy.pid})")
+        return comfy
+    
+    def on_comfyui_ready():
+        """After each ComfyUI boot, before jobs are released"""
+        mark("comfy_http_ready")
         
-        raise RuntimeError(f"❌ ComfyUI failed to start within {timeout}s")
-    
-    # Start ComfyUI in background thread
-    Thread(target=start_comfyui, daemon=True).start()
-    
-    # Wait for ComfyUI to be ready
-    wait_for_comfyui()
+        # Subscribe to ComfyUI events (job completion without /history polling)
+        get_event_stream()
+        
+        # Load every model now so the first job doesn't pay for it
+        if WARMUP:
+            print("  🔥 Warmup run...", flush=True)
+            get_warmup().reset()
+            warmup_report = get_warmup().run([WORKFLOWS_BASE, WORKFLOWS_FALLBACK], COMFY_DIR)
+            print(f"  {'✅' if warmup_report['status'] == 'done' else '⚠️'} Warmup {warmup_report['status']} "
+                  f"({warmup_report['seconds']}s)", flush=True)
+            mark("warmup")
+        mark("comfy_ready")
+    
+    def on_comfyui_down(reason):
+        """Fail the prompts a dead ComfyUI was running instead of waiting for the timeout"""
+        get_event_stream().fail_all(f"ComfyUI {reason} during execution (restarting)")
+    
+    # Restarts ComfyUI on crash/hang (with backoff) and recycles it on memory growth
+    supervisor = ComfySupervisor(start_comfyui, on_ready=on_comfyui_ready, on_down=on_comfyui_down, boot_timeout=300)
+    logger.info("⏳ Waiting for ComfyUI (timeout: 300s per attempt)...")
+    if not supervisor.start().wait_ready(supervisor.boot_timeout * supervisor.max_failures):
+        raise RuntimeError(f"❌ {supervisor.error or 'ComfyUI failed to start'}\n"
+                           f"--- ComfyUI output (last lines) ---\n{supervisor.tail}")
     
     print("  ✅ ComfyUI ready!", flush=True)
     
     print("[9/10] Defining handler...", flush=True)
     
     def load_workflow(workflow_name):
-        """Load workflow JSON from network volume or fallback to bundled"""
-        # Try network volume first
-        workflow_path = f"{WORKFLOWS_BASE}/{workflow_name}.json"
-        
-        if not os.path.exists(workflow_path):
-            # Fallback to bundled workflow in Docker image
-            workflow_path = f"{WORKFLOWS_FALLBACK}{workflow_name}.json"
-            logger.info(f"Using bundled workflow: {workflow_path}")
+        """
+        Compiled workflow from network volume or fallback to bundled.
+        Parsed once per worker (revalidated by mtime), see workflow_registry.
+        """
+        compiled = get_registry().get(workflow_name, [WORKFLOWS_BASE, WORKFLOWS_FALLBACK])
         
-        if not os.path.exists(workflow_path):
+        if compiled is None:
             raise FileNotFoundError(f"Workflow not found: {workflow_name}.json (tried {WORKFLOWS_BASE} and {WORKFLOWS_FALLBACK})")
         
-        with open(workflow_path, 'r') as f:
-            return json.load(f)
-    
-    def inject_prompt(workflow, prompt_text, seed=None):
-        """Inject prompt and seed into workflow"""
-        for node_id, node in workflow.items():
-            if node.get("class_type") == "CLIPTextEncode":
-                if "inputs" in node and "text" in node["inputs"]:
-                    node["inputs"]["text"] = prompt_text
-                    logger.info(f"✅ Injected prompt into node {node_id}")
-            
-            if seed is not None:
-                if node.get("class_type") == "KSampler":
-                    if "inputs" in node:
-                        node["inputs"]["seed"] = seed
-                        logger.info(f"✅ Injected seed {seed} into KSampler {node_id}")
-        
+        return compiled
+    
+    def inject_prompt(compiled, prompt_text, seed=None):
+        """Copy-on-write instance with prompt and seed in the precomputed slots"""
+        workflow = compiled.instantiate(prompt=prompt_text, seed=seed)
+        for name, value in (("prompt", prompt_text), ("seed", seed)):
+            if value is None:
+                continue
+            for node_id, field in workflow.slots[name]:
+                logger.info(f"✅ Injected {name} into node {node_id}.{field}")
         return workflow
     
     def queue_workflow(workflow):
         """Queue workflow to ComfyUI"""
-        url = "http://127.0.0.1:8188/prompt"
-        payload = {"prompt": workflow}
-        
         logger.info("📤 Sending workflow to ComfyUI...")
-        resp = requests.post(url, json=payload, timeout=30)
+        resp = get_client().submit(workflow, client_id=get_event_stream().client_id)
         resp.raise_for_status()
         
         data = resp.json()
@@ -241,155 +238,253 @@ try:
         
         return prompt_id
     
-    def wait_for_completion(prompt_id, timeout=600):
-        """Poll ComfyUI until workflow completes"""
+    def track_completion(prompt_id, timeout=600):
+        """
+        Yield ComfyUI messages until the prompt finishes; the last item is
+        {"type": "done", "data": {"outputs": ...}}.
+        Waits on WebSocket events (polls /history only if the socket drops).
+        """
         logger.info(f"⏳ Waiting for completion (timeout: {timeout}s)...")
-        deadline = time.time() + timeout
         start = time.time()
-        last_log = 0
         
-        while time.time() < deadline:
-            try:
-                # Check history
-                resp = requests.get(f"http://127.0.0.1:8188/history/{prompt_id}", timeout=5)
-                
-                if resp.status_code == 200:
-                    history = resp.json()
-                    
-                    if prompt_id in history:
-                        elapsed = int(time.time() - start)
-                        logger.info(f"✅ Workflow completed in {elapsed}s!")
-                        return history[prompt_id]
-                
-                # Log progress every 10s
-                elapsed = int(time.time() - start)
-                if elapsed - last_log >= 10:
-                    logger.info(f"⏳ Still processing... ({elapsed}s elapsed)")
-                    last_log = elapsed
-                
-            except Exception as e:
-                logger.warning(f"Poll error: {e}")
-            
-            time.sleep(2)
+        watch = get_event_stream().watch(prompt_id)
+        for msg in watch.events(timeout=timeout, poll=get_client().history, poll_interval=2):
+            if msg["type"] != "done":
+                yield msg
+                continue
+            result = msg["data"]
+        
+        elapsed = int(time.time() - start)
+        if not result["success"]:
+            raise RuntimeError(f"Workflow failed after {elapsed}s: {result.get('error')} {result.get('details') or ''}")
         
-        raise TimeoutError(f"Workflow did not complete within {timeout}s")
+        logger.info(f"✅ Workflow completed in {elapsed}s! (via {result['source']})")
+        yield {"type": "done", "data": {"outputs": result["outputs"]}}
+    
+    def wait_for_completion(prompt_id, timeout=600):
+        """Wait on ComfyUI WebSocket events (see track_completion)"""
+        for msg in track_completion(prompt_id, timeout=timeout):
+            if msg["type"] == "done":
+                return msg["data"]
     
     def get_output_files(history_entry):
-        """Extract output files from history"""
-        outputs = []
-        
+        """Output files of a history entry that exist on disk (images/videos/gifs, see output_resolver.py)"""
         if "outputs" not in history_entry:
             logger.warning("⚠️ No 'outputs' key in history entry")
-            return outputs
+            return []
         
-        for node_id, node_output in history_entry["outputs"].items():
-            logger.info(f"🔍 Checking node {node_id}: {list(node_output.keys())}")
-            
-            # Handle standard images output
-            if "images" in node_output:
-                for img in node_output["images"]:
-                    filename = img["filename"]
-                    subfolder = img.get("subfolder", "")
-                    
-                    if subfolder:
-                        file_path = f"{COMFY_OUTPUT}/{subfolder}/{filename}"
-                    else:
-                        file_path = f"{COMFY_OUTPUT}/{filename}"
-                    
-                    if os.path.exists(file_path):
-                        outputs.append({
-                            "type": "image" if filename.lower().endswith(('.png', '.jpg', '.jpeg')) else "video",
-                            "path": file_path,
-                            "filename": filename
-                        })
-                        logger.info(f"✅ Found image/video: {filename}")
-            
-            # Handle VHS_VideoCombine gifs output
-            if "gifs" in node_output:
-                for gif in node_output["gifs"]:
-                    filename = gif["filename"]
-                    subfolder = gif.get("subfolder", "")
-                    
-                    if subfolder:
-                        file_path = f"{COMFY_OUTPUT}/{subfolder}/{filename}"
-                    else:
-                        file_path = f"{COMFY_OUTPUT}/{filename}"
-                    
-                    if os.path.exists(file_path):
-                        outputs.append({
-                            "type": "video",
-                            "path": file_path,
-                            "filename": filename
-                        })
-                        logger.info(f"✅ Found gif: {filename}")
+        outputs = [f for f in resolve_outputs(history_entry["outputs"], COMFY_DIR) if "size_bytes" in f]
+        for output in outputs:
+            logger.info(f"✅ Found {output['type']}: {output['filename']}")
         
         if not outputs:
             logger.warning(f"⚠️ No output files found in history. Scanned {len(history_entry['outputs'])} nodes.")
         
         return outputs
     
-    def encode_file(file_path):
-        """Encode file to base64"""
-        with open(file_path, 'rb') as f:
-            return base64.b64encode(f.read()).decode('utf-8')
-    
-    def handler(event):
-        """Main RunPod handler"""
+    def stream_job(event):
+        """
+        Job pipeline as stream chunks ("event": stage / progress / output),
+        ending with a "result" or "error" chunk.
+        """
+        job_start = time.time()
+        mark("first_job_received")
         job_input = event.get("input", {})
         logger.info(f"📥 Job received: {list(job_input.keys())}")
+        stages = {}
+        
+        def stage(name, started):
+            stages[f"{name}_seconds"] = round(time.time() - started, 3)
+            return {"event": "stage", "stage": name, "seconds": stages[f"{name}_seconds"]}
         
         try:
             # Extract parameters
             workflow_name = job_input.get("workflow_name", "wan-2.2")
             prompt = job_input.get("prompt", "A beautiful sunset over mountains")
             seed = job_input.get("seed")
+            tier_name = job_input.get("tier")
+            sink = resolve_sink(job_input)
             
             logger.info(f"📝 Workflow: {workflow_name}")
             logger.info(f"📝 Prompt: {prompt}")
             logger.info(f"📝 Seed: {seed}")
             
             # Load and inject
+            started = time.time()
             workflow = load_workflow(workflow_name)
             workflow = inject_prompt(workflow, prompt, seed)
+            tier = apply_tier(workflow, tier_name) if tier_name else None
             
-            # Queue and wait
-            prompt_id = queue_workflow(workflow)
-            history = wait_for_completion(prompt_id, timeout=600)
+            # Same graph already rendered by any worker: skip ComfyUI
+            cache = get_result_cache() if job_input.get("cache", True) else None
+            cache_key = outputs = prompt_id = None
+            cache_metrics = {"enabled": cache is not None}
+            if cache:
+                lookup_started = time.time()
+                cache_key = workflow_key(workflow)
+                outputs = cache.lookup(cache_key)
+                cache_metrics.update(cache.metrics(cache_key, outputs is not None, time.time() - lookup_started))
             
-            # Get outputs
-            outputs = get_output_files(history)
-            logger.info(f"✅ Found {len(outputs)} output files")
+            if CONCURRENT_JOBS:
+                isolate_outputs(workflow, event.get("id"))
+            yield stage("load", started)
             
-            # Encode outputs
-            results = []
-            for output in outputs:
-                logger.info(f"📦 Encoding {output['filename']}...")
-                encoded = encode_file(output['path'])
+            preflight = nodes = None
+            if outputs is None and MODEL_PREFLIGHT:
+                # Fail fast when a referenced model is not on the volume
+                preflight = get_catalog(COMFY_DIR).preflight(workflow)
+                error = preflight_error(preflight)
+                if error:
+                    logger.error(f"❌ {error}")
+                    yield {"event": "error", "status": "error", "error": error, "missing": preflight["missing"]}
+                    return
+            
+            if outputs is None:
+                # ComfyUI is not recycled while the job is using it
+                with supervisor.job():
+                    if not supervisor.ready:
+                        # Restart in progress (crash, hang or recycle): wait for it
+                        started = time.time()
+                        if not supervisor.start().wait_ready(600):
+                            raise RuntimeError(supervisor.error or "ComfyUI not ready after 600s")
+                        yield stage("comfy_boot", started)
+                    
+                    # Tier values that could not be validated before ComfyUI was up
+                    check_tier(workflow, tier)
+                    
+                    # Queue and wait
+                    started = time.time()
+                    prompt_id = queue_workflow(workflow)
+                    yield stage("submit", started)
+                    
+                    started = time.time()
+                    last_progress = {}
+                    profile = NodeProfile(prompt_id, workflow) if NODE_PROFILE else None
+                    try:
+                        for msg in track_completion(prompt_id, timeout=600):
+                            if msg["type"] == "done":
+                                history = msg["data"]
+                                continue
+                            if profile:
+                                profile.feed(msg)
+                            chunk = progress_chunk(msg, workflow, last_progress)
+                            if chunk:
+                                yield chunk
+                    finally:
+                        # Per-node timings, also for failed prompts
+                        if profile:
+                            nodes = profile.as_metrics()
+                            profile.save(nodes, workflow_name=workflow_name, tier=tier_name)
+                    yield stage("execute", started)
                 
-                results.append({
+                # Get outputs
+                outputs = get_output_files(history)
+                get_client().delete_history([prompt_id])
+                logger.info(f"✅ Found {len(outputs)} output files")
+                # Not when check_tier changed the graph the key was computed from
+                if cache and not (tier and tier.get("skipped")):
+                    # Every file the prompt reported, so a partial set is not cached
+                    cache_metrics["stored"] = cache.store(cache_key, resolve_outputs(history.get("outputs", {}), COMFY_DIR))
+            
+            # Upload to S3 (output_sink="s3") or encode in parallel
+            # (chunked, memory-capped); one chunk per file as soon as it is ready
+            started = time.time()
+            encode_report = EncodeReport()
+            upload_report = UploadReport()
+            if sink == "s3":
+                logger.info(f"☁️ Uploading {len(outputs)} file(s)...")
+                for output, uploaded, error in get_s3_sink().upload_many(outputs, event.get("id"), upload_report):
+                    chunk = {"filename": output["filename"], "type": output["type"]}
+                    if error:
+                        logger.error(f"❌ Could not upload {output['filename']}: {error}")
+                        chunk["error"] = str(error)
+                    else:
+                        chunk.update(uploaded)
+                    yield {"event": "output", "output": chunk}
+                outputs = []
+            
+            if outputs:
+                logger.info(f"📦 Encoding {len(outputs)} file(s)...")
+            for output, encoded, sha256, error in get_encoder().encode_many(outputs, encode_report):
+                if error:
+                    logger.error(f"❌ Could not encode {output['filename']}: {error}")
+                    yield {"event": "output", "output": {
+                        "filename": output["filename"],
+                        "type": output["type"],
+                        "error": str(error)
+                    }}
+                    continue
+                
+                yield {"event": "output", "output": {
                     "filename": output["filename"],
                     "type": output["type"],
-                    "data": encoded
-                })
+                    "data": encoded,
+                    "sha256": sha256
+                }}
+            yield stage("encode", started)
             
-            return {
+            yield {
+                "event": "result",
                 "status": "success",
                 "prompt_id": prompt_id,
-                "outputs": results,
                 "workflow": workflow_name,
                 "prompt": prompt,
-                "seed": seed
+                "seed": seed,
+                "tier": tier,
+                "metrics": {
+                    **get_timeline().job_metrics(time.time() - job_start),
+                    "stages": stages,
+                    "nodes": nodes,
+                    "encode": encode_report.as_metrics(),
+                    "upload": upload_report.as_metrics(),
+                    "cache": cache_metrics,
+                    "preflight": preflight,
+                    "warmup": get_warmup().report(),
+                    "prefetch": get_prefetcher().report.as_metrics(),
+                    "comfy_http": get_client().stats.snapshot(),
+                    "supervisor": supervisor.metrics(),
+                    "logging": get_pipeline().metrics()
+                }
             }
             
         except Exception as e:
             logger.error(f"❌ Handler error: {e}")
             traceback.print_exc()
             
-            return {
+            yield {
+                "event": "error",
                 "status": "error",
                 "error": str(e),
                 "traceback": traceback.format_exc()
             }
+        finally:
+            # Models are loaded now: background catalog hashing may start
+            get_catalog(COMFY_DIR).allow_hashing()
+    
+    def handler(event):
+        """Main RunPod handler (single response with every output)"""
+        results = []
+        final = {"status": "error", "error": "Job produced no result"}
+        
+        for chunk in stream_job(event):
+            kind = chunk.pop("event")
+            if kind == "output":
+                results.append(chunk["output"])
+            elif kind in ("result", "error"):
+                final = chunk
+        
+        if final["status"] == "success":
+            final = {
+                "status": "success",
+                "prompt_id": final["prompt_id"],
+                "outputs": results,
+                **final
+            }
+        return final
+    
+    def handler_stream(event):
+        """Streaming RunPod handler (STREAM_OUTPUTS=1): progress + one chunk per output"""
+        yield from stream_job(event)
     
     print("  ✅ Handler defined", flush=True)
     
@@ -399,10 +494,10 @@ try:
     logger.info("=" * 70)
     
     # Start serverless (blocks forever)
-    runpod.serverless.start({
-        "handler": handler,
-        "return_aggregate_stream": False
-    })
+    mark("handler_ready")
+    streaming = os.environ.get("STREAM_OUTPUTS", "0") == "1"
+    logger.info(f"📡 Streaming outputs: {streaming}")
+    runpod.serverless.start(serverless_config(handler, handler_stream, streaming))
     
     # Should never reach here
     logger.error("⚠️ runpod.serverless.start() returned unexpectedly!")
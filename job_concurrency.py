@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Concurrent jobs per worker
+==========================
+With CONCURRENT_JOBS=1 a handler runs several RunPod jobs at once, so the
+next prompt is already queued in ComfyUI while the previous job's outputs
+are harvested, encoded and uploaded (GPU no longer idle during CPU work).
+
+- async wrappers around the sync handlers (RunPod only runs async
+  handlers concurrently); the blocking pipeline runs in a thread
+- concurrency_modifier: target concurrency from ComfyUI's free VRAM
+  (/system_stats), between MIN_CONCURRENCY and MAX_CONCURRENCY
+- isolate_outputs: every filename_prefix rewritten to jobs/<job_id>/...
+  so concurrent jobs never pick up each other's files
+
+Environment:
+    MAX_CONCURRENCY (default: 2), MIN_CONCURRENCY (default: 1),
+    VRAM_PER_JOB_GB (default: 12) - free VRAM required per extra queued job,
+    CONCURRENCY_REFRESH_SECONDS (default: 5)
+"""
+
+import os
+import time
+import asyncio
+import logging
+from threading import Thread, Lock
+
+from comfy_client import get_client
+
+logger = logging.getLogger(__name__)
+
+CONCURRENT_JOBS = os.environ.get("CONCURRENT_JOBS", "0") == "1"
+MAX_CONCURRENCY = int(os.environ.get("MAX_CONCURRENCY", "2"))
+MIN_CONCURRENCY = int(os.environ.get("MIN_CONCURRENCY", "1"))
+VRAM_PER_JOB = float(os.environ.get("VRAM_PER_JOB_GB", "12")) * 1024 ** 3
+REFRESH_SECONDS = float(os.environ.get("CONCURRENCY_REFRESH_SECONDS", "5"))
+
+JOBS_SUBFOLDER = "jobs"
+
+
+def isolate_outputs(workflow, job_id):
+    """
+    Prefix every output node's filename_prefix with jobs/<job_id>/.
+    workflow is a WorkflowInstance; returns the rewritten node ids.
+    """
+    if not job_id:
+        return []
+    rewritten = []
+    for node_id, node in workflow.items():
+        prefix = node.get("inputs", {}).get("filename_prefix")
+        if isinstance(prefix, str):
+            workflow.set(node_id, "filename_prefix", f"{JOBS_SUBFOLDER}/{job_id}/{prefix.lstrip('/')}")
+            rewritten.append(node_id)
+    return rewritten
+
+
+class ConcurrencyController:
+    """
+    Target job concurrency from free VRAM.
+    One job always runs; each extra job needs VRAM_PER_JOB free. Falls back
+    to the last value while ComfyUI is not answering.
+    """
+
+    def __init__(self, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY,
+                 vram_per_job=VRAM_PER_JOB, refresh_seconds=REFRESH_SECONDS):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.vram_per_job = vram_per_job
+        self.refresh_seconds = refresh_seconds
+        self.current = self.minimum
+        self.vram_free = None
+        self._lock = Lock()
+        self._thread = None
+
+    def target(self, vram_free):
+        if vram_free is None or self.vram_per_job <= 0:
+            return self.maximum
+        extra = int(vram_free // self.vram_per_job)
+        return max(self.minimum, min(self.maximum, 1 + extra))
+
+    def refresh(self):
+        """Re-read free VRAM from ComfyUI and update the target"""
+        try:
+            devices = get_client().request("system_stats", "GET", "/system_stats", retries=0).json().get("devices", [])
+            vram_free = min(d.get("vram_free", 0) for d in devices) if devices else None
+        except Exception:
+            return self.current
+
+        target = self.target(vram_free)
+        with self._lock:
+            if target != self.current:
+                free_gb = f"{vram_free / 1024 ** 3:.1f} GB" if vram_free is not None else "unknown"
+                logger.info(f"🔀 Concurrency {self.current} -> {target} (VRAM free: {free_gb})")
+            self.current = target
+            self.vram_free = vram_free
+        return target
+
+    def start(self):
+        """Refresh on a background thread (the modifier runs on RunPod's event loop)"""
+        if self._thread is None:
+            self._thread = Thread(target=self._run, daemon=True, name="concurrency")
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_seconds)
+
+    def modifier(self, current_concurrency):
+        """RunPod concurrency_modifier: never blocks, returns the last target"""
+        return self.current
+
+
+_controller = ConcurrencyController()
+
+
+def get_controller():
+    """Per-worker shared ConcurrencyController"""
+    return _controller
+
+
+def concurrency_modifier(current_concurrency):
+    return _controller.modifier(current_concurrency)
+
+
+def make_async(handler):
+    """Async RunPod handler running a blocking handler in a worker thread"""
+    async def run(event):
+        return await asyncio.to_thread(handler, event)
+    run.__name__ = f"{handler.__name__}_async"
+    return run
+
+
+def make_async_stream(handler_stream):
+    """
+    Async generator relaying a blocking generator handler's chunks.
+    When the consumer stops early (job cancelled, client gone) the handler
+    generator is closed too, so its finally blocks release the job
+    """
+    done = object()
+
+    async def run(event):
+        chunks = handler_stream(event)
+        # A cancelled await leaves next() running in its thread: close()
+        # waits for it, a generator cannot be closed while executing
+        lock = Lock()
+
+        def step():
+            with lock:
+                return next(chunks, done)
+
+        def close():
+            with lock:
+                chunks.close()
+
+        try:
+            while True:
+                chunk = await asyncio.to_thread(step)
+                if chunk is done:
+                    return
+                yield chunk
+        finally:
+            await asyncio.to_thread(close)
+    run.__name__ = f"{handler_stream.__name__}_async"
+    return run
+
+
+def serverless_config(handler, handler_stream, streaming):
+    """Arguments for runpod.serverless.start(), concurrent when CONCURRENT_JOBS=1"""
+    config = {
+        "handler": handler_stream if streaming else handler,
+        # /run callers still get every chunk, aggregated, when streaming
+        "return_aggregate_stream": streaming,
+    }
+    if CONCURRENT_JOBS:
+        config["handler"] = make_async_stream(handler_stream) if streaming else make_async(handler)
+        config["concurrency_modifier"] = concurrency_modifier
+        _controller.start()
+        logger.info(f"🔀 Concurrent jobs enabled ({MIN_CONCURRENCY}-{MAX_CONCURRENCY}, "
+                    f"{VRAM_PER_JOB / 1024 ** 3:.0f} GB VRAM per extra job)")
+    return config
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Log Pipeline - asynchronous, batched logging off the critical path
+==================================================================
+- Loggers only enqueue (QueueHandler, never blocks): when the bounded
+  queue is full the record is dropped and counted, the caller moves on
+- One writer thread formats and writes: console lines to stdout, JSON
+  records (one per line) to the log file on the volume, in batches of up
+  to LOG_BATCH_LINES lines or every LOG_FLUSH_SECONDS
+- Size-based rotation (LOG_MAX_MB, LOG_BACKUPS kept as .1, .2, ...); the
+  file is shared by every worker, so each batch is written under an flock
+  and the size re-read from the file, not counted per process
+- ComfyUI progress bars (one line per tqdm update) are sampled: at most
+  one line per bar every LOG_PROGRESS_INTERVAL seconds, 100% always kept
+- A volume write error is counted and the batch dropped, never raised
+
+Environment:
+    LOG_FILE (default: set by the handler), LOG_MAX_MB (default: 50),
+    LOG_BACKUPS (default: 3), LOG_BATCH_LINES (default: 200),
+    LOG_FLUSH_SECONDS (default: 2), LOG_QUEUE_SIZE (default: 10000),
+    LOG_PROGRESS_INTERVAL (default: 5)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import queue
+import fcntl
+import atexit
+import logging
+import logging.handlers
+from threading import Thread, Lock, Event
+
+LOG_FILE = os.environ.get("LOG_FILE")
+LOG_MAX_BYTES = int(float(os.environ.get("LOG_MAX_MB", "50")) * 1024 * 1024)
+LOG_BACKUPS = int(os.environ.get("LOG_BACKUPS", "3"))
+LOG_BATCH_LINES = int(os.environ.get("LOG_BATCH_LINES", "200"))
+LOG_FLUSH_SECONDS = float(os.environ.get("LOG_FLUSH_SECONDS", "2"))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_PROGRESS_INTERVAL = float(os.environ.get("LOG_PROGRESS_INTERVAL", "5"))
+
+CONSOLE_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+COMFY_LOGGER = "comfyui"
+
+# tqdm bar: " 45%|████▌     | 9/20 [00:03<00:04,  2.51it/s]"
+PROGRESS_RE = re.compile(r"(\d{1,3})%\|.*\|\s*\d+/\d+")
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_FIELDS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with extra= fields kept as keys"""
+
+    def __init__(self):
+        super().__init__()
+        self.pod_id = os.environ.get("RUNPOD_POD_ID", "local")
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "pod_id": self.pod_id,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ProgressSampler(logging.Filter):
+    """Keep one ComfyUI progress line per bar every `interval` seconds"""
+
+    def __init__(self, interval=LOG_PROGRESS_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self.suppressed = 0
+        self._last = {}
+        self._lock = Lock()
+
+    def filter(self, record):
+        if record.name != COMFY_LOGGER or not self.interval:
+            return True
+        message = record.getMessage()
+        match = PROGRESS_RE.search(message)
+        if not match:
+            return True
+        if match.group(1) == "100":
+            return True
+        # One bar = same text before the percentage (node / stage label)
+        bar = message[:match.start()]
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last.get(bar, 0) < self.interval:
+                self.suppressed += 1
+                return False
+            self._last[bar] = now
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Queue + writer thread: console lines and batched, rotated JSON file"""
+
+    def __init__(self, path=LOG_FILE, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS,
+                 batch_lines=LOG_BATCH_LINES, flush_seconds=LOG_FLUSH_SECONDS,
+                 queue_size=LOG_QUEUE_SIZE, console=sys.stdout):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_lines = batch_lines
+        self.flush_seconds = flush_seconds
+        self.console = console
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.sampler = ProgressSampler()
+        self.handler.addFilter(self.sampler)
+        self.console_formatter = logging.Formatter(CONSOLE_FORMAT)
+        self.json_formatter = JsonFormatter()
+
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.write_errors = 0
+        self._file = None
+        self._size = 0
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, daemon=True, name="log-writer")
+            self._thread.start()
+            atexit.register(self.flush)
+        return self
+
+    def flush(self, timeout=5):
+        """Write everything queued so far (blocks up to `timeout`)"""
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        done = Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    # -- writer thread --------------------------------------------------------
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, logging.LogRecord):
+                self._console(item)
+                if self.path:
+                    batch.append(self.json_formatter.format(item))
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_seconds
+
+            flush_now = isinstance(item, Event) or len(batch) >= self.batch_lines
+            if batch and (flush_now or time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+                deadline = None
+            if isinstance(item, Event):
+                item.set()
+
+    def _console(self, record):
+        if self.console is None:
+            return
+        try:
+            self.console.write(self.console_formatter.format(record) + "\n")
+            self.console.flush()
+        except (OSError, ValueError):
+            pass
+
+    def _write(self, lines):
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Every worker of the endpoint appends to the same file on the
+            # volume: size check, rotation and write happen under one flock
+            with open(f"{self.path}.lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._reopen_if_rotated()
+                self._size = os.fstat(self._file.fileno()).st_size
+                if self.max_bytes and self._size and self._size + len(data) > self.max_bytes:
+                    self._rotate()
+                self._file.write(data)
+                self._file.flush()
+            self._size += len(data)
+            self.written += len(lines)
+            self.batches += 1
+        except OSError:
+            self.write_errors += 1
+            self._close()
+
+    def _reopen_if_rotated(self):
+        """Reopen the path if another worker renamed our file away"""
+        if self._file is not None:
+            try:
+                current = os.stat(self.path)
+                mine = os.fstat(self._file.fileno())
+                if (current.st_dev, current.st_ino) == (mine.st_dev, mine.st_ino):
+                    return
+            except FileNotFoundError:
+                pass
+            self._close()
+        self._file = open(self.path, "ab")
+
+    def _rotate(self):
+        self._close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab")
+        self._size = 0
+        self.rotations += 1
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def metrics(self):
+        return {
+            "path": self.path,
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.handler.dropped,
+            "progress_suppressed": self.sampler.suppressed,
+            "rotations": self.rotations,
+            "write_errors": self.write_errors,
+        }
+
+
+_pipeline = None
+_pipeline_lock = Lock()
+
+
+def setup_logging(path=LOG_FILE, level=logging.INFO):
+    """
+    Route the root logger through the pipeline (replaces basicConfig).
+    LOG_FILE in the environment wins over `path`.
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = LogPipeline(path=LOG_FILE or path).start()
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            root.addHandler(_pipeline.handler)
+            root.setLevel(level)
+    return _pipeline
+
+
+def get_pipeline():
+    """Per-worker LogPipeline (None until setup_logging() is called)"""
+    return _pipeline
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Mock RunPod serverless endpoint for local load tests (stdlib only)
+=================================================================
+Implements the parts of the RunPod v2 API the load generator uses:
+- POST /v2/{endpoint}/run            -> {"id", "status": "IN_QUEUE"}
+- GET  /v2/{endpoint}/status/{id}    -> status, delayTime/executionTime (ms), output
+- GET  /v2/{endpoint}/health         -> queue and worker counts
+- GET  /outputs/{id}/{filename}      -> output file (--output-mode url, Range: bytes=N-)
+
+A "webhook" URL in the /run payload gets the final status payload
+POSTed to it when the job ends (--webhook-delay simulates delivery lag).
+
+Jobs are queued FIFO and picked up by simulated workers: an idle warm
+worker takes the next job at once, otherwise a new worker is started (up
+to --workers) and pays a cold start first. Workers stop after
+--idle-timeout seconds without a job. Job output has the handler's
+shape: outputs + metrics (cold_start_seconds, processing_seconds, ...).
+
+Usage:
+    python mock_endpoint.py --port 8900 --workers 3 --cold-start 5:15 --exec 20
+    python test_client.py load --api-base http://127.0.0.1:8900 --endpoint mock --rate 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import base64
+import hashlib
+import argparse
+import urllib.request
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread, Lock, Condition
+from urllib.parse import urlparse
+
+# Execution time multiplier per tier (handler tiers.py presets)
+TIER_SCALE = {"draft": 0.4, "standard": 1.0, "final": 2.0}
+
+
+def parse_range(value):
+    """"5" -> (5, 5), "5:15" -> (5, 15)"""
+    low, _, high = value.partition(":")
+    return float(low), float(high or low)
+
+
+class MockEndpoint:
+    """Queue + autoscaled simulated workers; start()/stop()"""
+
+    def __init__(self, host="127.0.0.1", port=8900, workers=3, idle_timeout=5.0,
+                 cold_start=(5.0, 15.0), execution=(15.0, 25.0), fail_rate=0.0,
+                 output_bytes=256 * 1024, output_mode="url", seed=None, webhook_delay=0.0):
+        self.host = host
+        self.port = port
+        self.max_workers = workers
+        self.idle_timeout = idle_timeout
+        self.cold_start = cold_start
+        self.execution = execution
+        self.fail_rate = fail_rate
+        self.output_bytes = output_bytes
+        self.output_mode = output_mode
+        self.random = random.Random(seed)
+        self.webhook_delay = webhook_delay
+        self.webhooks_sent = 0
+
+        self.jobs = {}
+        self.files = {}
+        self.queue = deque()
+        self.workers = 0
+        self.idle = 0
+        self.changed = Condition(Lock())
+        self.server = None
+
+    # -- lifecycle ------------------------------------------------------------
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    # -- scheduling -----------------------------------------------------------
+
+    def submit(self, job_input, webhook=None):
+        job_id = f"mock-{uuid.uuid4().hex[:12]}"
+        with self.changed:
+            self.jobs[job_id] = {"id": job_id, "status": "IN_QUEUE", "input": job_input,
+                                 "webhook": webhook, "submitted": time.time()}
+            self.queue.append(job_id)
+            # Scale up when no warm worker is waiting for this job
+            if self.idle < len(self.queue) and self.workers < self.max_workers:
+                self.workers += 1
+                Thread(target=self._worker, daemon=True).start()
+            self.changed.notify()
+        return job_id
+
+    def _worker(self):
+        cold_start = self.random.uniform(*self.cold_start)
+        time.sleep(cold_start)
+        first = True
+        while True:
+            with self.changed:
+                self.idle += 1
+                deadline = time.time() + self.idle_timeout
+                while not self.queue:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.idle -= 1
+                        self.workers -= 1
+                        return
+                    self.changed.wait(remaining)
+                self.idle -= 1
+                job = self.jobs[self.queue.popleft()]
+                job["status"] = "IN_PROGRESS"
+                job["started"] = time.time()
+            self._run(job, cold_start if first else 0.0)
+            first = False
+
+    def _run(self, job, cold_start):
+        tier = job["input"].get("tier") or "standard"
+        seconds = self.random.uniform(*self.execution) * TIER_SCALE.get(tier, 1.0)
+        time.sleep(seconds)
+        finished = time.time()
+
+        if self.random.random() < self.fail_rate:
+            output, status = {"status": "error", "error": "Simulated failure"}, "FAILED"
+        else:
+            output, status = self._output(job, cold_start, seconds), "COMPLETED"
+        with self.changed:
+            job.update(status=status, output=output, finished=finished)
+        if job.get("webhook"):
+            Thread(target=self._send_webhook, args=(job,), daemon=True).start()
+
+    def _send_webhook(self, job):
+        """POST the final status payload; RunPod-style retries on failure"""
+        time.sleep(self.webhook_delay)
+        body = json.dumps(self.status(job["id"])).encode("utf-8")
+        for attempt in range(3):
+            try:
+                request = urllib.request.Request(job["webhook"], data=body, method="POST",
+                                                 headers={"Content-Type": "application/json"})
+                urllib.request.urlopen(request, timeout=10).close()
+                with self.changed:
+                    self.webhooks_sent += 1
+                return
+            except OSError:
+                time.sleep(2 ** attempt)
+
+    def _output(self, job, cold_start, seconds):
+        filename = f"{job['id']}_00001.mp4"
+        data = os.urandom(self.output_bytes)
+        item = {"type": "video", "filename": filename, "size_bytes": len(data),
+                "sha256": hashlib.sha256(data).hexdigest()}
+        if self.output_mode == "url":
+            with self.changed:
+                self.files[(job["id"], filename)] = data
+            item["url"] = f"{self.url}/outputs/{job['id']}/{filename}"
+        else:
+            item["base64"] = base64.b64encode(data).decode("ascii")
+        return {
+            "status": "completed",
+            "outputs": [item],
+            "metrics": {
+                "cold_start_seconds": round(cold_start, 2),
+                "processing_seconds": round(seconds, 2),
+                "total_seconds": round(seconds, 2),
+                "cost_estimate_usd": round((cold_start + seconds) / 3600 * 2.72, 6),
+            },
+            "tier": job["input"].get("tier"),
+            "worker": {"gpu": "mock", "pod_id": "mock"},
+        }
+
+    def status(self, job_id):
+        with self.changed:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            now = time.time()
+            started = job.get("started")
+            response = {
+                "id": job_id,
+                "status": job["status"],
+                "delayTime": int(((started or now) - job["submitted"]) * 1000),
+            }
+            if started:
+                response["executionTime"] = int(((job.get("finished") or now) - started) * 1000)
+            if "output" in job:
+                response["output"] = job["output"]
+            return response
+
+    def health(self):
+        with self.changed:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return {
+                "jobs": {
+                    "inQueue": counts.get("IN_QUEUE", 0),
+                    "inProgress": counts.get("IN_PROGRESS", 0),
+                    "completed": counts.get("COMPLETED", 0),
+                    "failed": counts.get("FAILED", 0),
+                },
+                "workers": {"running": self.workers - self.idle, "idle": self.idle},
+                "webhooksSent": self.webhooks_sent,
+            }
+
+    # -- HTTP -----------------------------------------------------------------
+
+    def _make_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body, status=200, content_type="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, payload, status=200):
+                self._send(json.dumps(payload).encode("utf-8"), status)
+
+            def do_POST(self):
+                parts = urlparse(self.path).path.strip("/").split("/")
+                if len(parts) == 3 and parts[0] == "v2" and parts[2] == "run":
+                    length = int(self.headers.get("Content-Length", 0))
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                    job_id = mock.submit(payload.get("input", {}), payload.get("webhook"))
+                    return self._json({"id": job_id, "status": "IN_QUEUE"})
+                self._json({"error": "not found"}, 404)
+
+            def do_GET(self):
+                parts = urlparse(self.path).path.strip("/").split("/")
+                if len(parts) == 4 and parts[0] == "v2" and parts[2] == "status":
+                    status = mock.status(parts[3])
+                    return self._json(status) if status else self._json({"error": "job not found"}, 404)
+                if len(parts) == 3 and parts[0] == "v2" and parts[2] == "health":
+                    return self._json(mock.health())
+                if len(parts) == 3 and parts[0] == "outputs":
+                    with mock.changed:
+                        data = mock.files.get((parts[1], parts[2]))
+                    if data is None:
+                        return self._json({"error": "file not found"}, 404)
+                    # Range: bytes=N- (resumed downloads)
+                    offset = self.headers.get("Range", "").partition("bytes=")[2].partition("-")[0]
+                    if offset.isdigit() and 0 < int(offset) < len(data):
+                        return self._send(data[int(offset):], 206, "video/mp4")
+                    if offset.isdigit() and int(offset) >= len(data):
+                        return self._send(b"", 416, "video/mp4")  # like S3: range not satisfiable
+                    return self._send(data, content_type="video/mp4")
+                self._json({"error": "not found"}, 404)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock RunPod serverless endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--workers", type=int, default=3, help="max workers")
+    parser.add_argument("--idle-timeout", type=float, default=5.0, help="seconds before an idle worker stops")
+    parser.add_argument("--cold-start", default="5:15", help="seconds, or MIN:MAX")
+    parser.add_argument("--exec", dest="execution", default="15:25", help="seconds (standard tier), or MIN:MAX")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--output-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--output-mode", choices=("url", "base64"), default="url")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--webhook-delay", type=float, default=0.0, help="seconds before a webhook is sent")
+    args = parser.parse_args()
+
+    mock = MockEndpoint(args.host, args.port, args.workers, args.idle_timeout,
+                        parse_range(args.cold_start), parse_range(args.execution), args.fail_rate,
+                        args.output_bytes, args.output_mode, args.seed, args.webhook_delay).start()
+    print(f"🧪 Mock RunPod endpoint on {mock.url}/v2/<endpoint> "
+          f"({args.workers} workers, cold start {args.cold_start}s, exec {args.execution}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Model Catalog - persistent model index + fail-fast preflight
+============================================================
+- One JSON catalog on the network volume (MODEL_CATALOG_FILE) with, per
+  model file: size, mtime, sha256 and safetensors header metadata
+- Updated incrementally: a file whose (size, mtime) did not change keeps
+  its entry; only new/changed files are re-read and re-hashed
+- Hashing is opt-in (it reads every byte of tens of GB): a background
+  thread that waits for allow_hashing() (called once the first job is
+  done, so it never competes with ComfyUI loading the same files at boot)
+  and is throttled to MODEL_CATALOG_HASH_MBPS. The stat scan alone is
+  enough for preflight
+- Shared by every worker: save() re-reads the file under an flock and
+  merges in only this worker's new/changed/removed entries, so hashes
+  written by other workers are kept (and reused instead of re-hashed)
+- preflight(workflow): every model referenced by loader nodes is
+  resolved against the catalog before submission, so a job naming a
+  missing unet/lora/ckpt is rejected in milliseconds instead of failing
+  inside ComfyUI after minutes of model loading
+
+Environment:
+    MODEL_CATALOG_FILE (default: /runpod-volume/model_catalog.json),
+    MODEL_CATALOG_HASH (default: 0), MODEL_CATALOG_HASH_MBPS (default: 200),
+    MODEL_PREFLIGHT (default: 1)
+"""
+
+import os
+import json
+import time
+import fcntl
+import struct
+import hashlib
+import logging
+from threading import Thread, Lock, Event
+
+from model_prefetch import LOADER_FIELDS, workflow_model_refs
+
+logger = logging.getLogger(__name__)
+
+MODEL_CATALOG_FILE = os.environ.get("MODEL_CATALOG_FILE", "/runpod-volume/model_catalog.json")
+MODEL_CATALOG_HASH = os.environ.get("MODEL_CATALOG_HASH", "0") == "1"
+MODEL_CATALOG_HASH_MBPS = float(os.environ.get("MODEL_CATALOG_HASH_MBPS", "200"))
+MODEL_PREFLIGHT = os.environ.get("MODEL_PREFLIGHT", "1") == "1"
+
+CATALOG_VERSION = 1
+MODEL_EXTENSIONS = (".safetensors", ".sft", ".ckpt", ".pt", ".pth", ".bin", ".gguf")
+MAX_HEADER_BYTES = 100 * 1024 * 1024
+HASH_BLOCK = 16 * 1024 * 1024
+
+# Nodes that download their checkpoint on first use: never a preflight failure
+AUTO_DOWNLOAD_CLASSES = {"RIFE VFI"}
+
+# Every folder a loader node reads from (relative to the ComfyUI dir)
+MODEL_FOLDERS = sorted({folder for fields in LOADER_FIELDS.values() for _, folders in fields for folder in folders})
+
+
+def safetensors_header(path):
+    """{"metadata", "tensors", "dtypes"} from a safetensors header, or None"""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read(8)
+            if len(raw) != 8:
+                return None
+            (length,) = struct.unpack("<Q", raw)
+            if length > MAX_HEADER_BYTES:
+                return None
+            header = json.loads(f.read(length))
+    except (OSError, ValueError):
+        return None
+
+    metadata = header.pop("__metadata__", {}) or {}
+    dtypes = {}
+    for tensor in header.values():
+        if isinstance(tensor, dict):
+            dtype = tensor.get("dtype", "?")
+            dtypes[dtype] = dtypes.get(dtype, 0) + 1
+    return {"metadata": metadata, "tensors": len(header), "dtypes": dtypes}
+
+
+def file_sha256(path, max_mbps=None):
+    """sha256 of a file, read at most max_mbps MB/s (None/0: unthrottled)"""
+    digest = hashlib.sha256()
+    started = time.monotonic()
+    done = 0
+    with open(path, "rb", buffering=0) as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+            done += len(block)
+            if max_mbps:
+                ahead = done / (max_mbps * 1024 * 1024) - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+    return digest.hexdigest()
+
+
+def _same_file(a, b):
+    return a.get("size") == b.get("size") and a.get("mtime_ns") == b.get("mtime_ns")
+
+
+class ModelCatalog:
+    """Index of model files keyed by path relative to the ComfyUI dir"""
+
+    def __init__(self, comfy_dir, path=MODEL_CATALOG_FILE):
+        self.comfy_dir = comfy_dir
+        self.path = path
+        self.scanned_at = None
+        self._lock = Lock()
+        self._hasher = None
+        self._rescan = None
+        self._hash_allowed = Event()
+        # Keys this worker changed / removed since its last save
+        self._dirty = set()
+        self._removed = set()
+        self.models = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == CATALOG_VERSION:
+                return data.get("models", {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def save(self):
+        """
+        Merge this worker's changes into the shared file: under an flock,
+        re-read it, apply only the entries changed/removed here, write a
+        temp file and rename it into place. Hashes other workers wrote for
+        unchanged files are adopted in memory.
+        """
+        with self._lock:
+            dirty = {key: self.models[key] for key in self._dirty if key in self.models}
+            removed = set(self._removed)
+            self._dirty.clear()
+            self._removed.clear()
+
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(f"{self.path}.lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                models = self._read()
+                for key, entry in dirty.items():
+                    theirs = models.get(key)
+                    # Same file already hashed by another worker: keep its hash
+                    if theirs and theirs.get("sha256") and not entry.get("sha256") and _same_file(theirs, entry):
+                        continue
+                    models[key] = entry
+                for key in removed:
+                    models.pop(key, None)
+                with open(tmp, "w") as f:
+                    json.dump({"version": CATALOG_VERSION, "updated": time.time(), "models": models},
+                              f, indent=1, sort_keys=True)
+                os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not save model catalog {self.path}: {e}")
+            with self._lock:
+                self._dirty.update(key for key in dirty if key not in self._removed)
+                self._removed.update(removed)
+            return
+
+        with self._lock:
+            for key, theirs in models.items():
+                ours = self.models.get(key)
+                if ours and theirs.get("sha256") and not ours.get("sha256") and _same_file(ours, theirs):
+                    self.models[key] = theirs
+
+    def _entry(self, key, st, previous):
+        """Catalog entry for a stat result, reusing previous when unchanged"""
+        if previous and _same_file(previous, {"size": st.st_size, "mtime_ns": st.st_mtime_ns}):
+            return previous
+        path = os.path.join(self.comfy_dir, key)
+        return {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": None,
+            "header": safetensors_header(path) if path.endswith((".safetensors", ".sft")) else None,
+        }
+
+    def scan(self):
+        """Stat every model folder; returns (added/changed, removed) counts"""
+        started = time.time()
+        found = {}
+        for folder in MODEL_FOLDERS:
+            base = os.path.join(self.comfy_dir, folder)
+            for root, _, files in os.walk(base, followlinks=True):
+                for name in files:
+                    if not name.endswith(MODEL_EXTENSIONS):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    found[os.path.relpath(path, self.comfy_dir)] = st
+
+        with self._lock:
+            previous = self.models
+        models = {key: self._entry(key, st, previous.get(key)) for key, st in found.items()}
+        changed = [key for key, entry in models.items() if previous.get(key) is not entry]
+        removed = set(previous) - set(models)
+
+        with self._lock:
+            self.models = models
+            self.scanned_at = time.time()
+            self._dirty.update(changed)
+            self._dirty.difference_update(removed)
+            self._removed.update(removed)
+        if changed or removed:
+            self.save()
+        logger.info(f"📚 Model catalog: {len(models)} model(s), {len(changed)} new/changed, "
+                    f"{len(removed)} removed ({time.time() - started:.2f}s)")
+        return len(changed), len(removed)
+
+    def hash_pending(self, max_mbps=MODEL_CATALOG_HASH_MBPS):
+        """sha256 every entry that has none yet (throttled), saving after each file"""
+        with self._lock:
+            pending = [key for key, entry in self.models.items() if not entry.get("sha256")]
+        hashed = 0
+        for key in pending:
+            with self._lock:
+                entry = self.models.get(key)
+            # Removed, or hashed by another worker meanwhile (adopted by save)
+            if entry is None or entry.get("sha256"):
+                continue
+            started = time.time()
+            try:
+                digest = file_sha256(os.path.join(self.comfy_dir, key), max_mbps)
+            except OSError as e:
+                logger.warning(f"⚠️ Could not hash {key}: {e}")
+                continue
+            with self._lock:
+                entry = self.models.get(key)
+                if entry is None:
+                    continue
+                self.models[key] = dict(entry, sha256=digest)
+                self._dirty.add(key)
+                size = entry["size"]
+            self.save()
+            hashed += 1
+            elapsed = time.time() - started
+            logger.info(f"📚 Hashed {key} ({size / 1024 / 1024 / max(elapsed, 1e-6):.0f} MB/s)")
+        return hashed
+
+    def _hash_when_allowed(self):
+        self._hash_allowed.wait()
+        self.hash_pending()
+
+    def start(self, hash_models=MODEL_CATALOG_HASH):
+        """Scan now; with hash_models, hash new/changed files once allow_hashing() is called"""
+        self.scan()
+        if hash_models and self._hasher is None:
+            self._hasher = Thread(target=self._hash_when_allowed, daemon=True, name="catalog-hash")
+            self._hasher.start()
+        return self
+
+    def allow_hashing(self):
+        """Let the background hashing run (after the first job, once the models are loaded)"""
+        self._hash_allowed.set()
+
+    def lookup(self, ref):
+        """(key, entry) for a model reference, or (None, None)"""
+        with self._lock:
+            for folder in ref["folders"]:
+                key = os.path.join(folder, ref["name"])
+                if key in self.models:
+                    return key, self.models[key]
+        return None, None
+
+    def preflight(self, workflow):
+        """
+        Resolve every model a workflow loads.
+        Returns {"models", "missing": [{"node_id", "class_type", "name"}], "seconds"}.
+        Files added since the last scan are caught by a stat fallback.
+        """
+        started = time.time()
+        refs = workflow_model_refs(workflow)
+        missing = []
+        rescan = False
+        for ref in refs:
+            key, _ = self.lookup(ref)
+            if key is not None or ref["class_type"] in AUTO_DOWNLOAD_CLASSES:
+                continue
+            if any(os.path.isfile(os.path.join(self.comfy_dir, f, ref["name"])) for f in ref["folders"]):
+                rescan = True
+                continue
+            missing.append({"node_id": ref["node_id"], "class_type": ref["class_type"], "name": ref["name"]})
+
+        if rescan:
+            with self._lock:
+                if self._rescan is None or not self._rescan.is_alive():
+                    self._rescan = Thread(target=self.scan, daemon=True, name="catalog-rescan")
+                    self._rescan.start()
+        return {"models": len(refs), "missing": missing, "seconds": round(time.time() - started, 4)}
+
+
+_catalog = None
+_catalog_lock = Lock()
+
+
+def get_catalog(comfy_dir="/ComfyUI"):
+    """Per-worker shared ModelCatalog"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ModelCatalog(comfy_dir)
+    return _catalog
+
+
+def preflight_error(report):
+    """Job error message for a failed preflight, or None"""
+    if not report["missing"]:
+        return None
+    names = ", ".join(f"{m['name']} ({m['class_type']} {m['node_id']})" for m in report["missing"])
+    return f"Missing model(s): {names}"
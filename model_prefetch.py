@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Model Prefetch - read models ahead while ComfyUI boots
+======================================================
+/ComfyUI/models is a symlink to the network volume, so a cold worker
+streams tens of GB lazily, whenever ComfyUI first opens each file. The
+prefetcher parses the target workflows for loader nodes and reads those
+files up front with parallel large-block reads (several ranges per file
+in flight), while ComfyUI is still starting.
+
+Modes (PREFETCH_MODE):
+- pagecache: read every block once so the kernel page cache holds it
+- copy: copy to local disk (PREFETCH_LOCAL_DIR); ComfyUI is started with
+  an extra_model_paths config that puts the local copy first
+  (is_default), and a file only appears there once fully copied
+- off (default)
+
+Files are taken in workflow order until PREFETCH_BUDGET_GB is reached;
+the report (files, bytes, MB/s, skipped, missing) goes in job metrics.
+
+Environment:
+    PREFETCH_MODE, PREFETCH_WORKFLOWS (default: wan-2.2, comma separated),
+    PREFETCH_BUDGET_GB (default: 64), PREFETCH_WORKERS (default: 8),
+    PREFETCH_LOCAL_DIR (default: /models-local)
+"""
+
+import os
+import time
+import logging
+from threading import Thread, Lock, Event
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from workflow_registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_MODE = os.environ.get("PREFETCH_MODE", "off")
+PREFETCH_WORKFLOWS = [w for w in os.environ.get("PREFETCH_WORKFLOWS", "wan-2.2").split(",") if w]
+PREFETCH_BUDGET = int(float(os.environ.get("PREFETCH_BUDGET_GB", "64")) * 1024 ** 3)
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", "8"))
+PREFETCH_LOCAL_DIR = os.environ.get("PREFETCH_LOCAL_DIR", "/models-local")
+
+BLOCK_SIZE = 16 * 1024 * 1024
+RANGE_SIZE = 256 * 1024 * 1024
+MODES = ("off", "pagecache", "copy")
+
+# class_type -> [(input field, folders relative to the ComfyUI dir)]
+LOADER_FIELDS = {
+    "UNETLoader": [("unet_name", ("models/diffusion_models", "models/unet"))],
+    "CLIPLoader": [("clip_name", ("models/text_encoders", "models/clip"))],
+    "DualCLIPLoader": [
+        ("clip_name1", ("models/text_encoders", "models/clip")),
+        ("clip_name2", ("models/text_encoders", "models/clip")),
+    ],
+    "VAELoader": [("vae_name", ("models/vae",))],
+    "LoraLoader": [("lora_name", ("models/loras",))],
+    "LoraLoaderModelOnly": [("lora_name", ("models/loras",))],
+    "CheckpointLoaderSimple": [("ckpt_name", ("models/checkpoints",))],
+    "UpscaleModelLoader": [("model_name", ("models/upscale_models",))],
+    "RIFE VFI": [("ckpt_name", ("custom_nodes/ComfyUI-Frame-Interpolation/ckpts/rife",))],
+}
+
+# ComfyUI folder_paths name for each models/ folder (extra_model_paths keys)
+FOLDER_NAMES = {
+    "models/diffusion_models": "diffusion_models",
+    "models/unet": "diffusion_models",
+    "models/text_encoders": "text_encoders",
+    "models/clip": "text_encoders",
+    "models/vae": "vae",
+    "models/loras": "loras",
+    "models/checkpoints": "checkpoints",
+    "models/upscale_models": "upscale_models",
+}
+
+
+def workflow_model_refs(workflow):
+    """
+    Model files a workflow loads, in graph order:
+    [{"node_id", "class_type", "field", "name", "folders"}]
+    """
+    refs = []
+    for node_id, node in workflow.items():
+        for field, folders in LOADER_FIELDS.get(node.get("class_type"), ()):
+            name = node.get("inputs", {}).get(field)
+            if isinstance(name, str) and name:
+                refs.append({
+                    "node_id": node_id,
+                    "class_type": node["class_type"],
+                    "field": field,
+                    "name": name,
+                    "folders": folders,
+                })
+    return refs
+
+
+def resolve_model_path(ref, comfy_dir):
+    """First existing path for a model reference, or None"""
+    for folder in ref["folders"]:
+        path = os.path.join(comfy_dir, folder, ref["name"])
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def write_extra_model_paths(local_dir, config_path):
+    """extra_model_paths config putting local copies before the volume"""
+    lines = ["prefetch:", f"    base_path: {local_dir}", "    is_default: true"]
+    for name in sorted(set(FOLDER_NAMES.values())):
+        lines.append(f"    {name}: models/{name}")
+    os.makedirs(os.path.dirname(config_path), exist_ok=True)
+    with open(config_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return config_path
+
+
+class PrefetchReport:
+    """Prefetch counters (updated live, read by job metrics)"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.status = "pending"
+        self.files = 0
+        self.bytes = 0
+        self.planned_bytes = 0
+        self.seconds = 0.0
+        self.skipped = []
+        self.missing = []
+        self._lock = Lock()
+
+    def add_bytes(self, n):
+        with self._lock:
+            self.bytes += n
+
+    def as_metrics(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "status": self.status,
+                "files": self.files,
+                "bytes": self.bytes,
+                "planned_bytes": self.planned_bytes,
+                "seconds": round(self.seconds, 2),
+                "mb_per_s": round(self.bytes / 1024 / 1024 / self.seconds, 1) if self.seconds else 0,
+                "skipped": list(self.skipped),
+                "missing": list(self.missing),
+            }
+
+
+class ModelPrefetcher:
+    """Parallel range reader/copier for the models of a set of workflows"""
+
+    def __init__(self, mode=PREFETCH_MODE, budget=PREFETCH_BUDGET, workers=PREFETCH_WORKERS,
+                 local_dir=PREFETCH_LOCAL_DIR, block_size=BLOCK_SIZE, range_size=RANGE_SIZE):
+        if mode not in MODES:
+            raise ValueError(f"Unknown PREFETCH_MODE '{mode}' (expected one of {MODES})")
+        self.mode = mode
+        self.budget = budget
+        self.workers = workers
+        self.local_dir = local_dir
+        self.block_size = block_size
+        self.range_size = max(range_size, block_size)
+        self.report = PrefetchReport(mode)
+        self.done = Event()
+        self._thread = None
+
+    def plan(self, workflow_names, search_paths, comfy_dir):
+        """[(source path, size, folder, model name)] within budget, deduplicated"""
+        planned, seen, total = [], set(), 0
+        for name in workflow_names:
+            compiled = get_registry().get(name, search_paths)
+            if compiled is None:
+                logger.warning(f"⚠️ Prefetch: workflow {name} not found in {search_paths}")
+                continue
+            for ref in workflow_model_refs(compiled.template):
+                path = resolve_model_path(ref, comfy_dir)
+                if path is None:
+                    self.report.missing.append(ref["name"])
+                    continue
+                if path in seen:
+                    continue
+                seen.add(path)
+                size = os.path.getsize(path)
+                if total + size > self.budget:
+                    self.report.skipped.append(ref["name"])
+                    continue
+                total += size
+                folder = next(f for f in ref["folders"] if path == os.path.join(comfy_dir, f, ref["name"]))
+                planned.append((path, size, folder, ref["name"]))
+        self.report.planned_bytes = total
+        return planned
+
+    def _destination(self, folder, name):
+        """Local copy path, or None for folders ComfyUI can't redirect (custom node checkpoints)"""
+        if folder not in FOLDER_NAMES:
+            return None
+        return os.path.join(self.local_dir, "models", FOLDER_NAMES[folder], name)
+
+    def _read_range(self, path, start, end, dst_fd=None):
+        buf = bytearray(self.block_size)
+        view = memoryview(buf)
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, start, end - start, os.POSIX_FADV_SEQUENTIAL)
+            offset = start
+            while offset < end:
+                n = os.preadv(fd, [view[:min(self.block_size, end - offset)]], offset)
+                if not n:
+                    break
+                if dst_fd is not None:
+                    os.pwrite(dst_fd, view[:n], offset)
+                offset += n
+                self.report.add_bytes(n)
+        finally:
+            os.close(fd)
+
+    def run(self, workflow_names, search_paths, comfy_dir):
+        """Prefetch synchronously; returns the report metrics"""
+        started = time.time()
+        self.report.status = "running"
+        try:
+            planned = self.plan(workflow_names, search_paths, comfy_dir)
+            logger.info(f"📥 Prefetch ({self.mode}): {len(planned)} file(s), "
+                        f"{self.report.planned_bytes / 1024 ** 3:.1f} GB")
+
+            copies = {}     # path -> (fd, tmp path, final path)
+            remaining = {}  # path -> ranges still in flight
+            failed = set()
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch") as pool:
+                futures = {}
+                for path, size, folder, name in planned:
+                    dst = self._destination(folder, name) if self.mode == "copy" else None
+                    if dst and os.path.exists(dst) and os.path.getsize(dst) == size:
+                        self.report.files += 1
+                        continue
+                    dst_fd = None
+                    if dst:
+                        os.makedirs(os.path.dirname(dst), exist_ok=True)
+                        tmp = f"{dst}.prefetch"
+                        dst_fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                        os.ftruncate(dst_fd, size)
+                        copies[path] = (dst_fd, tmp, dst)
+                    starts = range(0, size, self.range_size) if size else [0]
+                    remaining[path] = len(starts)
+                    for start in starts:
+                        future = pool.submit(self._read_range, path, start, min(start + self.range_size, size), dst_fd)
+                        futures[future] = path
+
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        future.result()
+                    except OSError as e:
+                        if path not in failed:
+                            logger.warning(f"⚠️ Prefetch failed for {path}: {e}")
+                        failed.add(path)
+                    remaining[path] -= 1
+                    if remaining[path]:
+                        continue
+                    if path in copies:
+                        dst_fd, tmp, dst = copies[path]
+                        os.close(dst_fd)
+                        if path in failed:
+                            os.remove(tmp)
+                        else:
+                            os.rename(tmp, dst)  # visible to ComfyUI only once complete
+                    if path not in failed:
+                        self.report.files += 1
+
+            self.report.status = "done"
+        except Exception as e:
+            self.report.status = "failed"
+            logger.warning(f"⚠️ Prefetch failed: {e}")
+        self.report.seconds = time.time() - started
+        self.done.set()
+
+        metrics = self.report.as_metrics()
+        logger.info(f"📥 Prefetch {metrics['status']}: {metrics['files']} file(s), "
+                    f"{metrics['bytes'] / 1024 ** 3:.2f} GB in {metrics['seconds']}s ({metrics['mb_per_s']} MB/s)")
+        return metrics
+
+    def start(self, workflow_names, search_paths, comfy_dir):
+        """Prefetch on a background thread (no-op when mode is off)"""
+        if self.mode == "off" or self._thread is not None:
+            return self
+        self._thread = Thread(target=self.run, args=(workflow_names, search_paths, comfy_dir),
+                              daemon=True, name="prefetch")
+        self._thread.start()
+        return self
+
+    def comfy_args(self, comfy_dir):
+        """Extra ComfyUI command line arguments for this mode"""
+        if self.mode != "copy":
+            return []
+        config = write_extra_model_paths(self.local_dir, os.path.join(comfy_dir, "prefetch_model_paths.yaml"))
+        return ["--extra-model-paths-config", config]
+
+
+_prefetcher = None
+_prefetcher_lock = Lock()
+
+
+def get_prefetcher():
+    """Per-worker shared ModelPrefetcher"""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = ModelPrefetcher()
+    return _prefetcher
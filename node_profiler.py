@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Node Profiler - where the execution time goes, per node
+=======================================================
+- Built from the ComfyUI WebSocket messages of one prompt: a node starts
+  on its "executing" message and ends on the next one (the final
+  executing/None closes the last node); nodes in "execution_cached" are
+  reported as cache hits with 0 s
+- Messages are timestamped on receipt by the event stream, so events
+  that arrived before the job started watching keep their real time
+- Model loads come from ComfyUI's output ("Requested to load X" ...
+  "loaded completely/partially") and are attributed to the node that was
+  executing at the time (ModelLoadLog, fed by the ComfyProcess tee)
+- Per-node profile + per-class totals in job metrics ("nodes"), and one
+  JSON line per job appended to NODE_PROFILE_FILE on the volume (in the
+  background, under an flock) for aggregate analysis across workers
+
+Environment:
+    NODE_PROFILE (default: 1),
+    NODE_PROFILE_FILE (default: /runpod-volume/node_profiles.jsonl)
+"""
+
+import os
+import re
+import json
+import fcntl
+import time
+import logging
+from collections import deque
+from threading import Thread, Lock
+
+logger = logging.getLogger(__name__)
+
+NODE_PROFILE = os.environ.get("NODE_PROFILE", "1") == "1"
+NODE_PROFILE_FILE = os.environ.get("NODE_PROFILE_FILE", "/runpod-volume/node_profiles.jsonl")
+
+LOAD_REQUEST_RE = re.compile(r"Requested to load (\S+)")
+LOAD_DONE_RE = re.compile(r"loaded (completely|partially)")
+MAX_LOAD_EVENTS = 500
+
+
+class ModelLoadLog:
+    """Recent model load events parsed from ComfyUI's output (worker-wide)"""
+
+    def __init__(self):
+        self._events = deque(maxlen=MAX_LOAD_EVENTS)
+        self._pending = None
+        self._lock = Lock()
+
+    def observe(self, line, stream=None):
+        """ComfyProcess on_line hook; cheap for lines that are not model loads"""
+        if "load" not in line:
+            return
+        now = time.time()
+        match = LOAD_REQUEST_RE.search(line)
+        if match:
+            with self._lock:
+                self._pending = (match.group(1), now)
+            return
+        match = LOAD_DONE_RE.search(line)
+        if match:
+            with self._lock:
+                model, started = self._pending or (None, now)
+                self._pending = None
+                self._events.append({"model": model, "mode": match.group(1), "start": started, "end": now})
+
+    def between(self, start, end):
+        """Load events that finished within [start, end]"""
+        with self._lock:
+            return [e for e in self._events if start <= e["end"] <= end]
+
+
+class NodeProfile:
+    """Per-node timings of one prompt, fed with its ComfyUI messages"""
+
+    def __init__(self, prompt_id, workflow):
+        self.prompt_id = prompt_id
+        self.workflow = workflow
+        self.started = None
+        self.finished = None
+        self.nodes = {}   # node id -> {"start", "end", "steps"}
+        self.order = []
+        self.cached = []
+        self._current = None
+
+    def feed(self, msg):
+        msg_type = msg.get("type")
+        data = msg.get("data", {})
+        at = msg.get("received_at") or time.time()
+
+        if msg_type == "execution_start":
+            self.started = at
+        elif msg_type == "execution_cached":
+            self.cached = [str(node) for node in data.get("nodes") or []]
+        elif msg_type == "executing":
+            self._close(at)
+            node = data.get("node")
+            if node is None:
+                self.finished = at
+                return
+            node = str(node)
+            self._current = node
+            if node not in self.nodes:
+                self.order.append(node)
+                self.nodes[node] = {"start": at, "end": None, "steps": 0}
+            if self.started is None:
+                self.started = at
+        elif msg_type == "progress" and str(data.get("node")) in self.nodes:
+            self.nodes[str(data.get("node"))]["steps"] = data.get("max") or 0
+        elif msg_type in ("execution_error", "execution_interrupted"):
+            self._close(at)
+            self.finished = at
+
+    def _close(self, at):
+        if self._current is not None:
+            self.nodes[self._current]["end"] = at
+            self._current = None
+
+    def as_metrics(self, loads=None):
+        """{"nodes": [...], "by_class": {...}, "cached": [...], "total_seconds"}"""
+        end = self.finished or time.time()
+        loads = loads if loads is not None else get_model_loads()
+        nodes, by_class = [], {}
+        for node_id in self.order:
+            timing = self.nodes[node_id]
+            node_end = timing["end"] or end
+            class_type = self.workflow.get(node_id, {}).get("class_type")
+            entry = {
+                "node": node_id,
+                "class_type": class_type,
+                "title": self.workflow.get(node_id, {}).get("_meta", {}).get("title"),
+                "start": round(timing["start"] - (self.started or timing["start"]), 3),
+                "seconds": round(node_end - timing["start"], 3),
+            }
+            if timing["steps"]:
+                entry["steps"] = timing["steps"]
+            node_loads = loads.between(timing["start"], node_end)
+            if node_loads:
+                entry["model_loads"] = [
+                    {"model": load["model"], "mode": load["mode"], "seconds": round(load["end"] - load["start"], 3)}
+                    for load in node_loads
+                ]
+                entry["model_load_seconds"] = round(sum(load["seconds"] for load in entry["model_loads"]), 3)
+            nodes.append(entry)
+            by_class[class_type] = round(by_class.get(class_type, 0) + entry["seconds"], 3)
+        for node_id in self.cached:
+            nodes.append({
+                "node": node_id,
+                "class_type": self.workflow.get(node_id, {}).get("class_type"),
+                "cached": True,
+                "seconds": 0,
+            })
+        return {
+            "total_seconds": round(end - self.started, 3) if self.started else None,
+            "nodes": nodes,
+            "by_class": dict(sorted(by_class.items(), key=lambda item: -item[1])),
+            "cached": list(self.cached),
+        }
+
+    def save(self, metrics, path=NODE_PROFILE_FILE, **fields):
+        """Append one JSON line to the aggregate profile file (background thread)"""
+        record = {
+            "ts": round(time.time(), 3),
+            "pod_id": os.environ.get("RUNPOD_POD_ID", "local"),
+            "gpu": os.environ.get("RUNPOD_GPU_TYPE", "unknown"),
+            "image_version": os.environ.get("IMAGE_VERSION", "unknown"),
+            "prompt_id": self.prompt_id,
+            **fields,
+            **metrics,
+        }
+        Thread(target=append_jsonl, args=(path, record), daemon=True).start()
+
+
+def append_jsonl(path, record):
+    """
+    One record per line, written under an flock: O_APPEND alone is not
+    atomic on the network volume, so lines from several workers could interleave
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = (json.dumps(record, default=str) + "\n").encode("utf-8")
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not append node profile to {path}: {e}")
+
+
+_model_loads = ModelLoadLog()
+
+
+def get_model_loads():
+    """Per-worker ModelLoadLog"""
+    return _model_loads
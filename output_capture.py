@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Output Capture - drain a child's stdout/stderr into a ring buffer
+=================================================================
+- One reader thread per stream reads raw chunks as they arrive, so the
+  OS pipe buffer never fills and the child never blocks on write, however
+  chatty it is (progress bars, tracebacks, lines without a newline)
+- Lines split on \\n and \\r (tqdm redraws), overlong lines cut at
+  MAX_LINE_BYTES, decoded as UTF-8 with replacement
+- The last CAPTURE_TAIL_KB of output (both streams interleaved) is kept
+  in memory for error reports; older lines are dropped and counted
+- Optional on_line(line, stream_name) tee (e.g. to the log pipeline);
+  an exception in the tee is swallowed, draining never stops
+
+Environment:
+    CAPTURE_TAIL_KB (default: 256)
+"""
+
+import os
+import logging
+from collections import deque
+from threading import Thread, Lock
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_TAIL_BYTES = int(os.environ.get("CAPTURE_TAIL_KB", "256")) * 1024
+READ_SIZE = 64 * 1024
+MAX_LINE_BYTES = 16 * 1024
+
+
+class OutputCapture:
+    """Background readers + byte-bounded line ring buffer"""
+
+    def __init__(self, max_bytes=CAPTURE_TAIL_BYTES, on_line=None):
+        self.max_bytes = max_bytes
+        self.on_line = on_line
+        self.lines = 0
+        self.bytes = 0
+        self.dropped_lines = 0
+        self._ring = deque()
+        self._ring_bytes = 0
+        self._lock = Lock()
+        self._readers = []
+
+    def attach(self, stream, name):
+        """Drain a binary stream (Popen(..., stdout=PIPE)) on a daemon thread"""
+        reader = Thread(target=self._drain, args=(stream, name), daemon=True, name=f"capture-{name}")
+        self._readers.append(reader)
+        reader.start()
+        return reader
+
+    def _drain(self, stream, name):
+        pending = b""
+        try:
+            while True:
+                chunk = stream.read1(READ_SIZE) if hasattr(stream, "read1") else os.read(stream.fileno(), READ_SIZE)
+                if not chunk:
+                    break
+                with self._lock:
+                    self.bytes += len(chunk)
+                pending += chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+                *lines, pending = pending.split(b"\n")
+                if len(pending) > MAX_LINE_BYTES:
+                    lines.append(pending)
+                    pending = b""
+                for line in lines:
+                    self.feed(line[:MAX_LINE_BYTES].decode("utf-8", errors="replace"), name)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Capture of {name} stopped: {e}")
+        finally:
+            if pending:
+                self.feed(pending[:MAX_LINE_BYTES].decode("utf-8", errors="replace"), name)
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+    def feed(self, line, name):
+        """Add one line to the ring buffer and the tee"""
+        line = line.rstrip()
+        if not line:
+            return
+        size = len(line) + 1
+        with self._lock:
+            self.lines += 1
+            self._ring.append(line)
+            self._ring_bytes += size
+            while self._ring_bytes > self.max_bytes and len(self._ring) > 1:
+                self._ring_bytes -= len(self._ring.popleft()) + 1
+                self.dropped_lines += 1
+        if self.on_line:
+            try:
+                self.on_line(line, name)
+            except Exception:
+                pass
+
+    def join(self, timeout=1):
+        """Wait for the readers to reach end of stream"""
+        for reader in self._readers:
+            reader.join(timeout)
+
+    def tail(self, lines=50):
+        """Last captured lines (stdout and stderr interleaved)"""
+        with self._lock:
+            return "\n".join(list(self._ring)[-lines:] if lines else self._ring)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "lines": self.lines,
+                "bytes": self.bytes,
+                "buffered_bytes": self._ring_bytes,
+                "dropped_lines": self.dropped_lines,
+            }
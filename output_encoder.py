@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Output Encoder - memory-bounded, chunked, parallel base64
+=========================================================
+- Files are read in fixed 3 MB chunks (readinto a reused buffer) and
+  base64-encoded into one preallocated buffer: no whole-file bytes copy
+- SHA-256 computed in the same pass
+- A memory budget caps the bytes held by in-flight encodes; a file that
+  would not fit on its own is refused instead of blowing up the worker
+- Several outputs are encoded in parallel on a thread pool
+  (binascii releases the GIL on large buffers)
+- Per-job report: bytes/s and peak RSS, for the response metrics
+"""
+
+import os
+import time
+import hashlib
+import binascii
+import logging
+from threading import Thread, Lock, Condition, Event
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+# Multiple of 3 so chunk encodings concatenate without padding
+CHUNK_SIZE = 3 * 1024 * 1024
+ENCODE_WORKERS = int(os.environ.get("ENCODE_WORKERS", "4"))
+ENCODE_MEMORY_CAP = int(os.environ.get("ENCODE_MEMORY_CAP_MB", "512")) * 1024 * 1024
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def encoded_size(size):
+    return 4 * ((size + 2) // 3)
+
+
+def read_full(f, view):
+    """readinto until the buffer is full or EOF; a raw read may return short"""
+    n = 0
+    while n < len(view):
+        got = f.readinto(view[n:])
+        if not got:
+            break
+        n += got
+    return n
+
+
+def current_rss():
+    """Resident set size of this process in bytes (0 if unavailable)"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class MemoryBudget:
+    """Blocking byte budget shared by all encodes of the worker"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.used = 0
+        self._cond = Condition()
+
+    def fits(self, n):
+        return n <= self.capacity
+
+    def acquire(self, n):
+        with self._cond:
+            while self.used + n > self.capacity:
+                self._cond.wait()
+            self.used += n
+
+    def release(self, n):
+        with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+
+
+class RssSampler:
+    """Samples RSS on a background thread while active (context manager)"""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+
+class EncodeReport:
+    """Per-job encode counters"""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+        self.peak_rss = 0
+        self.refused = 0
+        self._lock = Lock()
+
+    def add(self, size_in, size_out):
+        with self._lock:
+            self.files += 1
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+
+    def as_metrics(self):
+        return {
+            "files": self.files,
+            "refused": self.refused,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "seconds": round(self.seconds, 3),
+            "mb_per_s": round(self.bytes_in / 1024 / 1024 / self.seconds, 1) if self.seconds else 0,
+            "peak_rss_mb": round(self.peak_rss / 1024 / 1024, 1),
+        }
+
+
+class OutputEncoder:
+    """Thread-pool base64 encoder with a hard memory budget"""
+
+    def __init__(self, workers=ENCODE_WORKERS, memory_cap=ENCODE_MEMORY_CAP, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size - chunk_size % 3
+        self.budget = MemoryBudget(memory_cap)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="encode")
+
+    def cost(self, size):
+        """Peak bytes one encode holds: read buffer + encoded buffer + str copy"""
+        return self.chunk_size + 2 * encoded_size(size)
+
+    def encode(self, path):
+        """Return (base64 str, sha256 hex) for a file, within the memory budget"""
+        size = os.path.getsize(path)
+        cost = self.cost(size)
+        if not self.budget.fits(cost):
+            raise MemoryError(f"{os.path.basename(path)} needs {cost // 1024 // 1024} MB to encode, "
+                              f"cap is {self.budget.capacity // 1024 // 1024} MB")
+
+        self.budget.acquire(cost)
+        try:
+            out = bytearray(encoded_size(size))
+            buf = bytearray(self.chunk_size)
+            view = memoryview(buf)
+            digest = hashlib.sha256()
+            pos = 0
+
+            with open(path, "rb", buffering=0) as f:
+                while True:
+                    # Only the last chunk may be short: a partial 3-byte group
+                    # mid-file would put padding inside the base64 stream
+                    n = read_full(f, view)
+                    if not n:
+                        break
+                    chunk = view[:n]
+                    digest.update(chunk)
+                    encoded = binascii.b2a_base64(chunk, newline=False)
+                    out[pos:pos + len(encoded)] = encoded
+                    pos += len(encoded)
+
+            del out[pos:]  # file shrank while reading
+            data = out.decode("ascii")
+            del out
+            return data, digest.hexdigest()
+        finally:
+            self.budget.release(cost)
+
+    def encode_many(self, items, report=None, path_key="path"):
+        """
+        Encode several files in parallel.
+        Yields (item, base64 or None, sha256 or None, error or None) in
+        completion order, so callers can emit each output as soon as it is ready.
+        """
+        report = report or EncodeReport()
+        started = time.time()
+
+        with RssSampler() as sampler:
+            futures = {self.pool.submit(self.encode, item[path_key]): item for item in items}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    data, sha256 = future.result()
+                except Exception as e:
+                    if isinstance(e, MemoryError):
+                        report.refused += 1
+                    yield item, None, None, e
+                    continue
+                report.add(os.path.getsize(item[path_key]), len(data))
+                yield item, data, sha256, None
+
+        report.seconds += time.time() - started
+        report.peak_rss = max(report.peak_rss, sampler.peak)
+
+
+_encoder = None
+_encoder_lock = Lock()
+
+
+def get_encoder():
+    """Per-worker shared OutputEncoder"""
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            _encoder = OutputEncoder()
+    return _encoder
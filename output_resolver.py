@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Output Resolver - ComfyUI outputs -> files on disk, picked up early
+===================================================================
+- resolve_outputs(outputs): one file list for every output node, whatever
+  the key ("images", "videos", "gifs" - VHS_VideoCombine reports its mp4
+  there), with "subfolder" and "type" mapped to ComfyUI's output / temp /
+  input directories; image or video decided by extension. Only
+  OUTPUT_TYPES are returned (temp = previews, not results)
+- OutputHarvest: early pickup while the prompt still runs. The job's
+  output directories (from the save nodes' filename_prefix) are watched
+  with inotify (ctypes, Linux): a file closed after writing that matches a
+  prefix is handed to prepare(file_info) on a thread pool right away; the
+  prompt's "executed" messages do the same for the files a node reports
+  (and are all there is where inotify is not available)
+- take(file_info) returns the prepared future only if the file is
+  unchanged since (size + mtime), so a file rewritten later is redone;
+  prepared files that are not in the final outputs are discarded
+
+Environment:
+    OUTPUT_TYPES (default: output), EARLY_HARVEST (default: 1),
+    HARVEST_WORKERS (default: 2)
+"""
+
+import os
+import errno
+import ctypes
+import select
+import struct
+import logging
+import ctypes.util
+from threading import Thread, Lock, Event
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_TYPES = [name for name in os.environ.get("OUTPUT_TYPES", "output").split(",") if name]
+EARLY_HARVEST = os.environ.get("EARLY_HARVEST", "1") == "1"
+HARVEST_WORKERS = int(os.environ.get("HARVEST_WORKERS", "2"))
+
+OUTPUT_KEYS = ("images", "videos", "gifs")
+VIDEO_EXTENSIONS = (".mp4", ".webm", ".mov", ".mkv", ".avi", ".m4v")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp", ".tiff")
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_inotify():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _load_inotify()
+
+
+def comfy_dirs(comfy_dir):
+    """ComfyUI directory per output "type" """
+    return {name: os.path.join(comfy_dir, name) for name in ("output", "temp", "input")}
+
+
+def file_type(filename, key=None):
+    """"video" or "image" ("videos" key, or by extension)"""
+    if key == "videos" or filename.lower().endswith(VIDEO_EXTENSIONS):
+        return "video"
+    return "image"
+
+
+def file_info_for(path, filename, file_kind, node_id=None, subfolder="", output_type="output"):
+    """Output dict used by the handlers (size fields only if the file exists)"""
+    file_info = {
+        "type": file_kind,
+        "filename": filename,
+        "subfolder": subfolder,
+        "output_type": output_type,
+        "node_id": node_id,
+        "path": path,
+    }
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return file_info
+    file_info["size_bytes"] = size
+    if file_kind == "video":
+        file_info["size_mb"] = round(size / 1024 / 1024, 2)
+    else:
+        file_info["size_kb"] = round(size / 1024, 2)
+    return file_info
+
+
+def resolve_node_outputs(node_id, node_outputs, comfy_dir, types=None):
+    """Files of one node's output dict ("executed" message or /history)"""
+    dirs = comfy_dirs(comfy_dir)
+    types = OUTPUT_TYPES if types is None else types
+    files = []
+    for key in OUTPUT_KEYS:
+        for item in node_outputs.get(key) or []:
+            filename = item.get("filename") if isinstance(item, dict) else None
+            output_type = (item.get("type") or "output") if filename else None
+            if not filename or output_type not in types or output_type not in dirs:
+                continue
+            subfolder = item.get("subfolder") or ""
+            path = os.path.normpath(os.path.join(dirs[output_type], subfolder, filename))
+            # Newer VHS also reports the absolute path
+            if not os.path.exists(path) and item.get("fullpath") and os.path.exists(item["fullpath"]):
+                path = item["fullpath"]
+            files.append(file_info_for(path, filename, file_type(filename, key), str(node_id), subfolder, output_type))
+    return files
+
+
+def resolve_outputs(outputs, comfy_dir, types=None):
+    """Every file of a prompt's outputs ({node_id: node_outputs}), once each"""
+    files, seen = [], set()
+    for node_id, node_outputs in outputs.items():
+        for file_info in resolve_node_outputs(node_id, node_outputs, comfy_dir, types):
+            if file_info["path"] in seen:
+                continue
+            seen.add(file_info["path"])
+            if "size_bytes" not in file_info:
+                logger.warning(f"⚠️ {file_info['type'].capitalize()} not found: {file_info['path']}")
+            files.append(file_info)
+    return files
+
+
+class DirectoryWatch:
+    """
+    inotify on a few directories that may not exist yet: the nearest
+    existing ancestor is watched and the watch follows the path down as
+    ComfyUI creates the folders. on_closed(path) for every file closed
+    after writing (or moved in) under a target directory.
+    """
+
+    def __init__(self, targets, root, on_closed):
+        self.targets = {os.path.normpath(t) for t in targets}
+        self.root = os.path.normpath(root)
+        self.on_closed = on_closed
+        self.fd = None
+        self.watches = {}
+        self.enabled = False
+        self.closed = 0
+        self.overflows = 0
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        if _libc is None:
+            return self
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.debug(f"inotify unavailable: {os.strerror(ctypes.get_errno())}")
+            return self
+        self.fd = fd
+        self.enabled = True
+        for target in self.targets:
+            self._watch_towards(target)
+        self._thread = Thread(target=self._run, daemon=True, name="output-watch")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Non-blocking: the watch thread closes the inotify fd on its way out"""
+        self._stop.set()
+        if self._thread is None and self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _on_path(self, path):
+        """path is a target or one of its ancestors"""
+        return any(t == path or t.startswith(path + os.sep) for t in self.targets)
+
+    def _add(self, path):
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(path), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err != errno.ENOENT:
+                logger.debug(f"inotify_add_watch {path}: {os.strerror(err)}")
+            return False
+        self.watches[wd] = path
+        return True
+
+    def _watch_towards(self, target):
+        """Watch the deepest existing directory on the way to target"""
+        path = target
+        while not os.path.isdir(path) and path.startswith(self.root + os.sep):
+            path = os.path.dirname(path)
+        if os.path.isdir(path) and self._add(path):
+            self._descend(path)
+
+    def _descend(self, path):
+        """Subfolders created before their parent's watch was in place"""
+        try:
+            entries = os.listdir(path)
+        except OSError:
+            return
+        for name in entries:
+            child = os.path.join(path, name)
+            if self._on_path(child) and os.path.isdir(child) and child not in self.watches.values():
+                if self._add(child):
+                    self._descend(child)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([self.fd], [], [], 0.2)
+                if not ready:
+                    continue
+                data = os.read(self.fd, 64 * 1024)
+                offset = 0
+                while offset + EVENT_HEADER.size <= len(data) and not self._stop.is_set():
+                    wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                    name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                    offset += EVENT_HEADER.size + length
+                    self._event(wd, mask, os.fsdecode(name))
+        except OSError as e:
+            logger.debug(f"Output watch stopped: {e}")
+        finally:
+            os.close(self.fd)
+            self.fd = None
+
+    def _event(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            self.overflows += 1  # the "executed" messages still cover these files
+            return
+        parent = self.watches.get(wd)
+        if parent is None or not name:
+            return
+        path = os.path.join(parent, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO) and self._on_path(path) and self._add(path):
+                self._descend(path)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and parent in self.targets:
+            self.closed += 1
+            try:
+                self.on_closed(path)
+            except Exception as e:
+                logger.debug(f"Early pickup of {path} failed: {e}")
+
+
+class OutputHarvest:
+    """Per-job early pickup of output files (see module docstring)"""
+
+    def __init__(self, workflow, prepare, comfy_dir, pool=None):
+        self.prepare = prepare
+        self.comfy_dir = comfy_dir
+        self.output_dir = comfy_dirs(comfy_dir)["output"]
+        self.pool = pool or get_harvest_pool()
+        self.prefixes = save_prefixes(workflow, self.output_dir)
+        self.watch = DirectoryWatch({os.path.dirname(p) for p in self.prefixes}, self.output_dir, self._on_closed)
+        self.prepared = 0
+        self.used = 0
+        self.discarded = 0
+        self._entries = {}  # path -> (future, (size, mtime_ns))
+        self._lock = Lock()
+
+    def start(self):
+        """Before the prompt is submitted, so no write is missed"""
+        if self.prefixes and "output" in OUTPUT_TYPES:
+            self.watch.start()
+        return self
+
+    def close(self):
+        self.watch.stop()
+        with self._lock:
+            self.discarded += len(self._entries)
+            self._entries.clear()
+
+    def _on_closed(self, path):
+        if not any(path.startswith(prefix + "_") for prefix in self.prefixes):
+            return
+        filename = os.path.basename(path)
+        if not filename.lower().endswith(VIDEO_EXTENSIONS + IMAGE_EXTENSIONS):
+            return
+        subfolder = os.path.relpath(os.path.dirname(path), self.output_dir)
+        self._submit(file_info_for(path, filename, file_type(filename), None, "" if subfolder == "." else subfolder))
+
+    def feed(self, msg):
+        """ComfyUI message of the prompt; "executed" outputs are picked up at once"""
+        data = msg.get("data", {})
+        if msg.get("type") == "executed" and data.get("node") is not None:
+            for file_info in resolve_node_outputs(data["node"], data.get("output") or {}, self.comfy_dir):
+                self._submit(file_info)
+
+    def _submit(self, file_info):
+        path = file_info["path"]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[1] == signature:
+                return
+            self._entries[path] = (self.pool.submit(self.prepare, file_info), signature)
+            self.prepared += 1
+        logger.info(f"⚡ Early pickup: {file_info['filename']} ({stat.st_size / 1024 / 1024:.2f} MB)")
+
+    def take(self, file_info):
+        """Prepared future for this file if it is unchanged since, else None"""
+        with self._lock:
+            entry = self._entries.pop(file_info.get("path"), None)
+        if entry is None:
+            return None
+        future, signature = entry
+        try:
+            stat = os.stat(file_info["path"])
+            unchanged = (stat.st_size, stat.st_mtime_ns) == signature
+        except OSError:
+            unchanged = False
+        with self._lock:
+            if unchanged:
+                self.used += 1
+            else:
+                self.discarded += 1
+        return future if unchanged else None
+
+    def metrics(self):
+        return {
+            "inotify": self.watch.enabled,
+            "watched_dirs": len(self.watch.watches),
+            "closed_files": self.watch.closed,
+            "prepared": self.prepared,
+            "used": self.used,
+            "discarded": self.discarded,
+        }
+
+
+def save_prefixes(workflow, output_dir):
+    """Absolute filename_prefix of every save node (where its files will appear)"""
+    prefixes = set()
+    for _, node in workflow.items():
+        prefix = node.get("inputs", {}).get("filename_prefix")
+        if isinstance(prefix, str) and prefix and "%" not in prefix:
+            path = os.path.normpath(os.path.join(output_dir, prefix))
+            if path.startswith(output_dir + os.sep):
+                prefixes.add(path)
+    return prefixes
+
+
+_pool = None
+_pool_lock = Lock()
+
+
+def get_harvest_pool():
+    """Per-worker thread pool for early output preparation"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=HARVEST_WORKERS, thread_name_prefix="harvest")
+    return _pool
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Output Sink - direct upload to S3-compatible object storage
+===========================================================
+- Outputs uploaded with parallel multipart transfers (boto3 TransferConfig)
+- Response carries a presigned URL + SHA-256 instead of base64 (no +33%,
+  no response-size ceiling, no unreachable worker paths)
+- Several outputs uploaded concurrently
+- Works with AWS S3, MinIO, R2... (path-style addressing, custom endpoint)
+
+Configuration (same variable names as RunPod's rp_upload):
+    BUCKET_ENDPOINT_URL, BUCKET_ACCESS_KEY_ID, BUCKET_SECRET_ACCESS_KEY,
+    BUCKET_NAME (default: comfyui-outputs), BUCKET_REGION,
+    BUCKET_PREFIX (default: outputs), PRESIGN_EXPIRES_SECONDS (default: 3600),
+    S3_UPLOAD_CONCURRENCY (default: 8), S3_PART_SIZE_MB (default: 16)
+
+Select per job with input "output_sink": "s3" | "base64" (default OUTPUT_SINK).
+"""
+
+import os
+import time
+import uuid
+import hashlib
+import logging
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config
+except ImportError:
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_SINK = os.environ.get("OUTPUT_SINK", "base64")
+SINKS = ("base64", "s3")
+
+MB = 1024 * 1024
+
+
+def file_sha256(path, block_size=4 * MB):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class UploadReport:
+    """Per-job upload counters"""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self._lock = Lock()
+
+    def add(self, size, seconds=0.0):
+        """One uploaded file; seconds only for uploads timed outside upload_many"""
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+            self.seconds += seconds
+
+    def as_metrics(self):
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 3),
+            "mb_per_s": round(self.bytes / MB / self.seconds, 1) if self.seconds else 0,
+        }
+
+
+class S3Sink:
+    """Uploads files to one bucket and returns presigned download URLs"""
+
+    def __init__(self, bucket=None, endpoint_url=None, access_key=None, secret_key=None,
+                 region=None, prefix=None, expires=None, concurrency=None, part_size_mb=None):
+        if boto3 is None:
+            raise RuntimeError("S3 output sink needs boto3 installed")
+
+        self.bucket = bucket or os.environ.get("BUCKET_NAME", "comfyui-outputs")
+        self.prefix = (prefix if prefix is not None else os.environ.get("BUCKET_PREFIX", "outputs")).strip("/")
+        self.expires = int(expires or os.environ.get("PRESIGN_EXPIRES_SECONDS", "3600"))
+        concurrency = int(concurrency or os.environ.get("S3_UPLOAD_CONCURRENCY", "8"))
+        part_size = int(part_size_mb or os.environ.get("S3_PART_SIZE_MB", "16")) * MB
+
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or os.environ.get("BUCKET_ENDPOINT_URL") or None,
+            aws_access_key_id=access_key or os.environ.get("BUCKET_ACCESS_KEY_ID"),
+            aws_secret_access_key=secret_key or os.environ.get("BUCKET_SECRET_ACCESS_KEY"),
+            region_name=region or os.environ.get("BUCKET_REGION", "us-east-1"),
+            config=Config(
+                s3={"addressing_style": "path"},
+                signature_version="s3v4",
+                max_pool_connections=concurrency * 2,
+                retries={"max_attempts": 5, "mode": "adaptive"},
+            ),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=concurrency,
+            use_threads=True,
+        )
+        self.pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="upload")
+
+    def key_for(self, job_id, filename, subfolder=""):
+        """
+        <prefix>/<job_id>/<subfolder>/<filename>, empty parts left out.
+        Without a job id a random one is used, so same-named outputs of
+        two local runs never overwrite each other
+        """
+        job_id = job_id or uuid.uuid4().hex
+        subfolder = (subfolder or "").replace(os.sep, "/").strip("/")
+        parts = [p for p in (self.prefix, job_id, subfolder, filename) if p]
+        return "/".join(parts)
+
+    def upload(self, path, key, content_type=None):
+        """Upload one file (multipart above the part size) and presign it"""
+        size = os.path.getsize(path)
+        sha256 = file_sha256(path)
+        extra = {"Metadata": {"sha256": sha256}}
+        if content_type:
+            extra["ContentType"] = content_type
+
+        started = time.time()
+        self.client.upload_file(path, self.bucket, key, ExtraArgs=extra, Config=self.transfer_config)
+        elapsed = time.time() - started
+
+        url = self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=self.expires,
+        )
+        logger.info(f"☁️ Uploaded {key} ({size / MB:.2f} MB in {elapsed:.1f}s)")
+        return {
+            "url": url,
+            "bucket": self.bucket,
+            "key": key,
+            "sha256": sha256,
+            "size_bytes": size,
+            "expires_in": self.expires,
+            "upload_seconds": round(elapsed, 3),
+        }
+
+    def upload_many(self, items, job_id=None, report=None, path_key="path"):
+        """
+        Upload several files concurrently.
+        Yields (item, result or None, error or None) in completion order.
+        """
+        report = report or UploadReport()
+        job_id = job_id or uuid.uuid4().hex  # one folder for all outputs of the call
+        started = time.time()
+
+        futures = {
+            self.pool.submit(
+                self.upload,
+                item[path_key],
+                self.key_for(job_id, item["filename"], item.get("subfolder")),
+                content_type_for(item["filename"]),
+            ): item
+            for item in items
+        }
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                yield item, None, e
+                continue
+            report.add(result["size_bytes"])
+            yield item, result, None
+
+        report.seconds += time.time() - started
+
+
+def content_type_for(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return {
+        ".mp4": "video/mp4",
+        ".webm": "video/webm",
+        ".gif": "image/gif",
+        ".webp": "image/webp",
+        ".png": "image/png",
+        ".jpg": "image/jpeg",
+        ".jpeg": "image/jpeg",
+    }.get(ext, "application/octet-stream")
+
+
+def s3_configured():
+    return boto3 is not None and bool(os.environ.get("BUCKET_ENDPOINT_URL") or os.environ.get("BUCKET_NAME"))
+
+
+_sink = None
+_sink_lock = Lock()
+
+
+def get_s3_sink():
+    """Per-worker shared S3Sink (created on first use)"""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = S3Sink()
+    return _sink
+
+
+def resolve_sink(job_input):
+    """Sink requested by the job: "s3" or "base64" (raises on unknown values)"""
+    sink = job_input.get("output_sink", OUTPUT_SINK)
+    if sink not in SINKS:
+        raise ValueError(f"Unknown output_sink '{sink}' (expected one of {SINKS})")
+    return sink
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Renditions - derived outputs (poster, preview, web proxy) rendered in parallel
+=============================================================================
+- Job parameter "renditions": a list of presets (or true for all of them):
+    poster   JPEG of the first frame (images: a JPEG thumbnail), <= 720p
+    preview  animated WebP, first PREVIEW_SECONDS at 10 fps, 240p
+    proxy    low-bitrate 480p H.264 (faststart), for web playback
+- Each rendition is one ffmpeg process; RENDITION_WORKERS of them run at a
+  time, started right after output harvest, so they render while the main
+  files are being encoded/uploaded
+- as_completed() yields each rendition as soon as it is written (file_info
+  with "rendition", "source" and its own "seconds"), to be encoded and
+  emitted like any other output
+- Renditions are written to a per-job temp directory (never next to the
+  outputs or into a result-cache entry), removed once they are emitted
+- A failed or timed-out rendition is logged and reported in metrics; the
+  job itself never fails because of one
+
+Environment:
+    RENDITIONS (default presets when the job does not ask, default: none),
+    RENDITION_WORKERS (default: 3), RENDITION_TIMEOUT (default: 120),
+    RENDITION_FFMPEG_THREADS (default: 2), FFMPEG_BIN (default: ffmpeg)
+"""
+
+import os
+import time
+import shutil
+import logging
+import tempfile
+import subprocess
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = [name for name in os.environ.get("RENDITIONS", "").split(",") if name]
+RENDITION_WORKERS = int(os.environ.get("RENDITION_WORKERS", "3"))
+RENDITION_TIMEOUT = float(os.environ.get("RENDITION_TIMEOUT", "120"))
+RENDITION_FFMPEG_THREADS = os.environ.get("RENDITION_FFMPEG_THREADS", "2")
+FFMPEG_BIN = os.environ.get("FFMPEG_BIN", "ffmpeg")
+PREVIEW_SECONDS = 4
+
+# name -> (output type, extension, source types, ffmpeg output arguments)
+PRESETS = {
+    "poster": ("image", "jpg", ("video", "image"), [
+        "-frames:v", "1", "-vf", "scale=-2:'min(720,ih)'", "-q:v", "3",
+    ]),
+    "preview": ("image", "webp", ("video",), [
+        "-t", str(PREVIEW_SECONDS), "-an", "-vf", "fps=10,scale=-2:240",
+        "-c:v", "libwebp", "-quality", "60", "-loop", "0",
+    ]),
+    "proxy": ("video", "mp4", ("video",), [
+        "-map", "0:v:0", "-map", "0:a?", "-vf", "scale=-2:'min(480,ih)'",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "30", "-maxrate", "800k", "-bufsize", "1600k",
+        "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", "64k", "-movflags", "+faststart",
+    ]),
+}
+
+
+def requested_renditions(job_input):
+    """Preset names asked by the job (raises on unknown names)"""
+    value = job_input.get("renditions", RENDITIONS)
+    if value is True:
+        return list(PRESETS)
+    if not value:
+        return []
+    names = [value] if isinstance(value, str) else list(value)
+    unknown = [name for name in names if name not in PRESETS]
+    if unknown:
+        raise ValueError(f"Unknown renditions {unknown} (expected some of {list(PRESETS)})")
+    return list(dict.fromkeys(names))
+
+
+def render(name, source, destination, timeout=RENDITION_TIMEOUT):
+    """Run ffmpeg for one preset; returns seconds, raises RuntimeError on failure"""
+    args = [FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y",
+            "-threads", RENDITION_FFMPEG_THREADS, "-i", source,
+            *PRESETS[name][3], destination]
+    started = time.time()
+    try:
+        result = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"ffmpeg timed out after {timeout:.0f}s")
+    if result.returncode != 0 or not os.path.exists(destination):
+        tail = result.stderr.decode("utf-8", errors="replace").strip().splitlines()[-3:]
+        raise RuntimeError(f"ffmpeg exited with {result.returncode}: {' | '.join(tail)}")
+    return time.time() - started
+
+
+class RenditionReport:
+    """Per-job rendition timings"""
+
+    def __init__(self, requested=()):
+        self.requested = list(requested)
+        self.items = []
+        self.started = time.time()
+        self.finished = None
+        self.workdir = None
+        self._lock = Lock()
+
+    def add(self, entry):
+        with self._lock:
+            self.items.append(entry)
+            self.finished = time.time()
+
+    def as_metrics(self):
+        return {
+            "requested": self.requested,
+            "items": list(self.items),
+            "seconds": round((self.finished or self.started) - self.started, 3),
+        }
+
+    def cleanup(self):
+        """Remove the job's rendition directory (idempotent)"""
+        with self._lock:
+            workdir, self.workdir = self.workdir, None
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+class RenditionRenderer:
+    """Bounded pool of ffmpeg runs shared by the jobs of the worker"""
+
+    def __init__(self, workers=RENDITION_WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rendition")
+        self.available = shutil.which(FFMPEG_BIN) is not None
+
+    def start(self, files, names, report=None):
+        """Submit every requested preset for every output it applies to; returns futures"""
+        report = report or RenditionReport(names)
+        futures = {}
+        if not names:
+            return futures, report
+        if not self.available:
+            logger.warning(f"⚠️ {FFMPEG_BIN} not found: renditions {names} skipped")
+            report.add({"error": f"{FFMPEG_BIN} not found"})
+            return futures, report
+
+        for file_info in files:
+            if file_info.get("size_bytes") is None:
+                continue
+            source = file_info["path"]
+            stem = os.path.splitext(os.path.basename(source))[0]
+            for name in names:
+                output_type, extension, source_types, _ = PRESETS[name]
+                if file_info["type"] not in source_types:
+                    continue
+                if report.workdir is None:
+                    report.workdir = tempfile.mkdtemp(prefix="renditions-")
+                # Outputs of several subfolders may share a stem
+                destination = os.path.join(report.workdir, f"{len(futures)}_{stem}_{name}.{extension}")
+                info = {
+                    "type": output_type,
+                    "filename": f"{stem}_{name}.{extension}",
+                    "rendition": name,
+                    "source": file_info["filename"],
+                    "subfolder": file_info.get("subfolder", ""),
+                    "node_id": file_info.get("node_id"),
+                    "path": destination,
+                }
+                futures[self.pool.submit(render, name, source, destination)] = info
+        return futures, report
+
+    def as_completed(self, futures, report):
+        """
+        Yield each rendition's file_info as soon as ffmpeg is done with it;
+        the caller consumes (encodes/uploads) it before asking for the next.
+        The job's rendition directory is removed when the iteration ends.
+        """
+        try:
+            for future in as_completed(futures):
+                info = dict(futures[future])
+                entry = {"name": info["rendition"], "source": info["source"]}
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    logger.warning(f"⚠️ Rendition {info['rendition']} of {info['source']} failed: {e}")
+                    report.add({**entry, "error": str(e)})
+                    continue
+                size = os.path.getsize(info["path"])
+                info.update(size_bytes=size, seconds=round(seconds, 3))
+                report.add({**entry, "seconds": round(seconds, 3), "size_bytes": size})
+                logger.info(f"🎞️ Rendition {info['filename']} ready in {seconds:.2f}s ({size / 1024:.0f} KB)")
+                yield info
+        finally:
+            for future in futures:
+                future.cancel()
+            report.cleanup()
+
+
+_renderer = None
+_renderer_lock = Lock()
+
+
+def get_renderer():
+    """Per-worker RenditionRenderer"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = RenditionRenderer()
+    return _renderer
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Result Cache - content-addressed outputs on the network volume
+==============================================================
+- Key: sha256 of the canonical JSON of the fully injected workflow
+  (prompt, seed, tier... are all in the graph), so identical requests
+  are served without touching ComfyUI
+- Shared by every worker mounting the volume:
+    <RESULT_CACHE_DIR>/entries/<k[:2]>/<key>/{manifest.json, files...}
+- Writes are atomic: entry built in tmp/, then renamed into place
+  (a concurrent writer of the same key simply loses the race)
+- Files are hard-linked from the output dir when on the same filesystem
+- LRU eviction by total size: hits touch the entry's mtime, the oldest
+  entries are removed (renamed away first) under an flock
+- Only complete output sets of prompts that finished without error are
+  stored (the handlers call store() on success only; store() refuses a
+  set with a missing file)
+- Per-worker hit/miss counters for the job metrics
+
+Opt-in: every cached job copies its outputs to the volume.
+
+Environment:
+    RESULT_CACHE (default: 0), RESULT_CACHE_DIR (default: /runpod-volume/result_cache),
+    RESULT_CACHE_MAX_GB (default: 20)
+Per job: "cache": false skips lookup and store.
+"""
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import hashlib
+import logging
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE = os.environ.get("RESULT_CACHE", "0") == "1"
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "/runpod-volume/result_cache")
+RESULT_CACHE_MAX_BYTES = int(float(os.environ.get("RESULT_CACHE_MAX_GB", "20")) * 1024 ** 3)
+
+# Bump when the entry layout or the key derivation changes
+CACHE_VERSION = 1
+MANIFEST = "manifest.json"
+
+
+def workflow_key(workflow):
+    """Canonical sha256 of a workflow graph"""
+    canonical = json.dumps([CACHE_VERSION, workflow], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class ResultCache:
+    """Content-addressed output store shared through the network volume"""
+
+    def __init__(self, root=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.entries_dir = os.path.join(root, "entries")
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def entry_path(self, key):
+        return os.path.join(self.entries_dir, key[:2], key)
+
+    def lookup(self, key):
+        """Cached file list (type, filename, path, size_bytes...) or None"""
+        entry = self.entry_path(key)
+        try:
+            with open(os.path.join(entry, MANIFEST), "r") as f:
+                manifest = json.load(f)
+            files = []
+            for item in manifest["files"]:
+                path = os.path.join(entry, item["stored_as"])
+                if not os.path.exists(path):
+                    raise FileNotFoundError(path)  # evicted under us
+                file_info = {k: v for k, v in item.items() if k != "stored_as"}
+                file_info["path"] = path
+                files.append(file_info)
+            os.utime(entry)  # LRU
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        logger.info(f"♻️ Result cache hit {key[:12]} ({len(files)} file(s))")
+        return files
+
+    def store(self, key, files):
+        """
+        Store the output files of a successful prompt under key. files: dicts
+        with "path" and "filename" (other keys are kept in the manifest).
+        Nothing is stored if a file is missing. Returns True if stored.
+        """
+        if not files:
+            return False
+        missing = [f.get("filename") for f in files if not (f.get("path") and os.path.exists(f["path"]))]
+        if missing:
+            logger.warning(f"⚠️ Result {key[:12]} not cached: incomplete output set (missing {missing})")
+            return False
+
+        entry = self.entry_path(key)
+        if os.path.exists(entry):
+            return False
+
+        tmp = os.path.join(self.tmp_dir, f"{key}.{uuid.uuid4().hex[:8]}")
+        try:
+            os.makedirs(tmp)
+            manifest = {"version": CACHE_VERSION, "created": time.time(), "size_bytes": 0, "files": []}
+            for i, file_info in enumerate(files):
+                stored_as = f"{i}_{os.path.basename(file_info['filename'])}"
+                _link_or_copy(file_info["path"], os.path.join(tmp, stored_as))
+                item = {k: v for k, v in file_info.items() if k not in ("path", "base64", "data")}
+                item["stored_as"] = stored_as
+                manifest["files"].append(item)
+                manifest["size_bytes"] += os.path.getsize(file_info["path"])
+            with open(os.path.join(tmp, MANIFEST), "w") as f:
+                json.dump(manifest, f)
+
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            os.rename(tmp, entry)
+        except OSError as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.exists(entry):
+                logger.warning(f"⚠️ Could not store result {key[:12]}: {e}")
+            return False
+
+        logger.info(f"💾 Result cached {key[:12]} ({manifest['size_bytes'] / 1024 / 1024:.2f} MB)")
+        self.evict()
+        return True
+
+    def _entries(self):
+        """[(mtime, size_bytes, path)] for every cache entry"""
+        entries = []
+        try:
+            shards = os.listdir(self.entries_dir)
+        except OSError:
+            return entries
+        for shard in shards:
+            shard_path = os.path.join(self.entries_dir, shard)
+            try:
+                keys = os.listdir(shard_path)
+            except OSError:
+                continue
+            for key in keys:
+                path = os.path.join(shard_path, key)
+                try:
+                    mtime = os.stat(path).st_mtime
+                    with open(os.path.join(path, MANIFEST), "r") as f:
+                        size = json.load(f).get("size_bytes", 0)
+                except (OSError, ValueError):
+                    continue
+                entries.append((mtime, size, path))
+        return entries
+
+    def evict(self):
+        """Drop least recently used entries until under max_bytes (one worker at a time)"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".evict.lock"), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return 0  # another worker is evicting
+
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                doomed = os.path.join(self.tmp_dir, f"evict.{uuid.uuid4().hex[:8]}")
+                try:
+                    os.rename(path, doomed)
+                except OSError:
+                    continue
+                shutil.rmtree(doomed, ignore_errors=True)
+                total -= size
+                evicted += 1
+
+        if evicted:
+            logger.info(f"🧹 Result cache evicted {evicted} entr{'y' if evicted == 1 else 'ies'} ({total / 1024 ** 3:.2f} GB kept)")
+        return evicted
+
+    def metrics(self, key=None, hit=None, lookup_seconds=None, stored=None):
+        """Job metrics: this job's lookup + the worker's counters"""
+        with self._lock:
+            metrics = {"hits": self.hits, "misses": self.misses}
+        if key is not None:
+            metrics.update({"key": key, "hit": hit})
+        if lookup_seconds is not None:
+            metrics["lookup_seconds"] = round(lookup_seconds, 4)
+        if stored is not None:
+            metrics["stored"] = stored
+        return metrics
+
+
+_cache = None
+_cache_lock = Lock()
+
+
+def get_result_cache():
+    """Per-worker shared ResultCache, or None unless RESULT_CACHE=1"""
+    global _cache
+    if not RESULT_CACHE:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+    return _cache
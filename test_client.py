@@ -2,18 +2,53 @@
 """
 RunPod Serverless Demo Client with Performance Metrics
 Pour impressionner les devs avec des résultats concrets
+
+Mode charge (load): jobs concurrents via l'API REST /run + /status
+- débit d'arrivée (--rate, --poisson) ou concurrence fixe (--concurrency),
+  open-loop en option (--open-loop: les arrivées n'attendent jamais)
+- montée en charge: --ramp none|linear|step sur --ramp-seconds
+- mix de prompts depuis un fichier (--mix: .json, .jsonl ou texte)
+- par job: submit, queue, cold start, exécution, download, end-to-end
+- p50/p95/p99, débit, distribution des cold starts; CSV/JSON (--csv, --json)
+- --api-base http://127.0.0.1:8900 (mock_endpoint.py) ou --mock pour un
+  endpoint simulé en process
+- --webhook: chaque job est soumis avec une URL de webhook, un petit
+  serveur HTTP local reçoit les complétions et débloque le job aussitôt;
+  /status n'est interrogé qu'en secours (--webhook-fallback secondes sans
+  nouvelles). --webhook-url pour l'adresse publique (tunnel) vue par RunPod
+
+Mode démo: les mêmes options --webhook* remplacent le polling de
+runpod.get_job toutes les 5 s (get_job seulement en secours)
 """
 
-import runpod
+import os
 import time
 import json
 import sys
+import csv
+import math
+import random
+import base64
+import argparse
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import runpod
+except ImportError:  # load mode only needs requests
+    runpod = None
 
 class RunPodDemoClient:
-    def __init__(self, api_key, endpoint_id):
+    def __init__(self, api_key, endpoint_id, webhook=None, webhook_fallback=30.0):
         self.api_key = api_key
         self.endpoint_id = endpoint_id
+        self.webhook = webhook
+        self.webhook_fallback = webhook_fallback
         runpod.api_key = api_key
         
         print("🚀 RunPod Serverless Demo Client")
@@ -34,10 +69,13 @@ class RunPodDemoClient:
             "seed": int(time.time())
         }
         
-        # Submit job
+        # Submit job (with the receiver's URL: completion pushed by webhook)
+        request = {"input": job_input}
+        if self.webhook is not None:
+            request["webhook"] = self.webhook.url
         submit_start = time.time()
         try:
-            job = runpod.run({"input": job_input}, endpoint_id=self.endpoint_id)
+            job = runpod.run(request, endpoint_id=self.endpoint_id)
             job_id = job['id']
             submit_time = time.time() - submit_start
             print(f"   ✅ Job submitted in {submit_time:.2f}s - ID: {job_id}")
@@ -48,10 +86,11 @@ class RunPodDemoClient:
         # Wait for completion
         total_start = time.time()
         last_status = ""
+        future = self.webhook.expect(job_id) if self.webhook is not None else None
         
         while True:
             try:
-                status = runpod.get_job(job_id, self.endpoint_id)
+                status = self.next_status(job_id, future)
                 current_status = status.get('status', 'UNKNOWN')
                 elapsed = time.time() - total_start
                 
@@ -73,12 +112,24 @@ class RunPodDemoClient:
                     print(f"   ⏰ Timeout after {elapsed:.0f}s")
                     return None
                 
-                time.sleep(5)
+                if future is None:
+                    time.sleep(5)
                 
             except Exception as e:
                 print(f"   ❌ Polling error: {e}")
                 time.sleep(10)
     
+    def next_status(self, job_id, future=None):
+        """Job status: the webhook payload if it arrives within webhook_fallback seconds, else runpod.get_job"""
+        if future is not None:
+            try:
+                status = future.result(timeout=self.webhook_fallback)
+                self.webhook.forget(job_id)
+                return status
+            except FutureTimeout:
+                pass
+        return runpod.get_job(job_id, self.endpoint_id)
+    
     def process_success(self, output, total_elapsed):
         """Process successful job output and extract metrics"""
         
@@ -221,16 +272,592 @@ class RunPodDemoClient:
         print(f"   • Auto-scaling handles traffic spikes")
         print(f"   • Pay-per-use eliminates idle costs")
 
+# ==============================================================================
+# LOAD GENERATOR
+# ==============================================================================
+
+DEFAULT_API_BASE = "https://api.runpod.ai"
+LOAD_STAGES = ("submit", "queue", "cold_start", "execution", "download", "e2e")
+COLD_START_BUCKETS = (5, 15, 30, 60, 120)
+TERMINAL_STATUSES = ("COMPLETED", "FAILED", "CANCELLED", "TIMED_OUT")
+
+DEFAULT_MIX = [
+    {"name": "basic", "weight": 1, "input": {"prompt": "Beautiful woman dancing sensually, high quality, 4K"}},
+    {"name": "action", "weight": 1, "input": {"prompt": "Dynamic woman in motion, NSFW content, professional quality"}},
+    {"name": "complex", "weight": 1, "input": {"prompt": "Multiple people, NSFW scene, cinematic lighting, ultra detailed"}},
+]
+
+
+def load_prompt_mix(path):
+    """
+    Prompt mix from a file, as [{"name", "weight", "input"}]:
+    - .json: a list of entries
+    - .jsonl: one entry per line
+    - anything else: one prompt per line ("#" comments)
+    An entry is {"name"?, "weight"?, "input": {...}}, a bare job input
+    ({"prompt": ..., "tier": ...}, optional "weight") or a prompt string.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        raw = json.loads(text)
+    elif path.endswith(".jsonl"):
+        raw = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        raw = [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+
+    mix = []
+    for i, entry in enumerate(raw):
+        if isinstance(entry, str):
+            entry = {"input": {"prompt": entry}}
+        elif "input" not in entry:
+            entry = dict(entry)
+            entry = {"weight": entry.pop("weight", 1), "name": entry.pop("name", None), "input": entry}
+        mix.append({
+            "name": entry.get("name") or f"prompt-{i + 1}",
+            "weight": float(entry.get("weight", 1)),
+            "input": entry["input"],
+        })
+    if not mix:
+        raise ValueError(f"Empty prompt mix: {path}")
+    return mix
+
+
+def ramp_factor(profile, elapsed, ramp_seconds, steps=4):
+    """Share of the target load (0..1] reached `elapsed` seconds into the run"""
+    if profile == "none" or ramp_seconds <= 0 or elapsed >= ramp_seconds:
+        return 1.0
+    if profile == "linear":
+        return max(elapsed / ramp_seconds, 0.01)
+    if profile == "step":
+        return (math.floor(elapsed / ramp_seconds * steps) + 1) / steps
+    raise ValueError(f"Unknown ramp profile: {profile}")
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class WebhookReceiver:
+    """
+    Local HTTP server for RunPod completion webhooks: every POST carries the
+    job's status payload ({"id", "status", "output", ...}) and resolves the
+    job's Future. A webhook that arrives before expect() is kept.
+    """
+
+    def __init__(self, host="0.0.0.0", port=0, public_url=None):
+        self.host = host
+        self.port = port
+        self.public_url = public_url
+        self.received = 0
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.server = None
+
+    def start(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    payload = {}
+                self.send_response(200 if payload.get("id") else 400)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                if payload.get("id"):
+                    receiver._resolve(payload)
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="webhook").start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    @property
+    def url(self):
+        if self.public_url:
+            return self.public_url
+        host = "127.0.0.1" if self.host in ("0.0.0.0", "") else self.host
+        return f"http://{host}:{self.port}/webhook"
+
+    def _future(self, job_id):
+        with self._lock:
+            return self._futures.setdefault(job_id, Future())
+
+    def _resolve(self, payload):
+        future = self._future(payload["id"])
+        with self._lock:
+            self.received += 1
+        if not future.done() and payload.get("status") in TERMINAL_STATUSES:
+            future.set_result(payload)
+
+    def expect(self, job_id):
+        """Future resolved with the job's webhook payload"""
+        return self._future(job_id)
+
+    def forget(self, job_id):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+
+class LoadGenerator:
+    """Concurrent jobs against a RunPod (or mock) endpoint, one record per job"""
+
+    def __init__(self, api_base, endpoint_id, api_key=None, mix=None, rate=None, concurrency=None,
+                 poisson=False, open_loop=False, max_in_flight=64, duration=None, jobs=None,
+                 ramp="none", ramp_seconds=0, ramp_steps=4, poll_interval=1.0, job_timeout=900,
+                 download=True, seed=None, webhook=None, webhook_fallback=30.0):
+        if (rate is None) == (concurrency is None):
+            raise ValueError("Set exactly one of rate or concurrency")
+        if duration is None and jobs is None:
+            raise ValueError("Set duration and/or jobs")
+        self.base = f"{api_base.rstrip('/')}/v2/{endpoint_id}"
+        self.mix = mix or DEFAULT_MIX
+        self.rate = rate
+        self.concurrency = concurrency
+        self.poisson = poisson
+        self.open_loop = open_loop
+        self.max_in_flight = max_in_flight
+        self.duration = duration
+        self.jobs = jobs
+        self.ramp = ramp
+        self.ramp_seconds = ramp_seconds
+        self.ramp_steps = ramp_steps
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        self.download = download
+        self.random = random.Random(seed)
+        self.webhook = webhook
+        self.webhook_fallback = webhook_fallback
+        self.fallback_polls = 0
+
+        self.session = requests.Session()
+        pool = max(max_in_flight, concurrency or 0, 10)
+        self.session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=pool))
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=pool))
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+        self.records = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._issued = 0
+        self._started = None
+
+    # -- scheduling -----------------------------------------------------------
+
+    def _elapsed(self):
+        return time.time() - self._started
+
+    def _next_index(self):
+        """Index of the next job, or None once the run is over (jobs/duration)"""
+        with self._lock:
+            if self.jobs is not None and self._issued >= self.jobs:
+                return None
+            if self.duration is not None and self._elapsed() >= self.duration:
+                return None
+            self._issued += 1
+            return self._issued - 1
+
+    def _pick(self):
+        with self._lock:
+            return self.random.choices(self.mix, weights=[m["weight"] for m in self.mix])[0]
+
+    def run(self):
+        self._started = time.time()
+        if self.concurrency:
+            self._run_closed()
+        else:
+            self._run_rate()
+        return self.records
+
+    def _run_closed(self):
+        """Fixed concurrency: each slot submits its next job when the last one is done"""
+        def slot(i):
+            while True:
+                # Ramp: slot i only starts once the target concurrency exceeds i
+                while i >= max(1, math.ceil(self.concurrency * self._factor())):
+                    time.sleep(0.1)
+                index = self._next_index()
+                if index is None:
+                    return
+                self._run_job(index, time.time())
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="load") as pool:
+            list(pool.map(slot, range(self.concurrency)))
+
+    def _run_rate(self):
+        """
+        Arrival rate: jobs arrive on schedule (fixed interval or Poisson).
+        Default: an arrival waits for a slot when max_in_flight jobs are out
+        (the wait shows in e2e). Open loop: arrivals never wait; beyond
+        max_in_flight they are dropped and counted.
+        """
+        in_flight = threading.Semaphore(self.max_in_flight)
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="load") as pool:
+            while True:
+                self._wait_arrival()
+                index = self._next_index()
+                if index is None:
+                    break
+                scheduled = time.time()
+                if not in_flight.acquire(blocking=not self.open_loop):
+                    with self._lock:
+                        self.dropped += 1
+                else:
+                    pool.submit(self._run_slot, index, scheduled, in_flight)
+
+    def _wait_arrival(self, tick=0.01):
+        """
+        Sleep until the next arrival. The rate is integrated over time, so a
+        ramp changes the gap as it goes (a slow start doesn't stall the run)
+        """
+        if self._issued == 0:
+            return
+        target = self.random.expovariate(1.0) if self.poisson else 1.0
+        accumulated = 0.0
+        last = time.time()
+        while accumulated < target:
+            if self.duration is not None and self._elapsed() >= self.duration:
+                return
+            time.sleep(tick)
+            now = time.time()
+            accumulated += self.rate * self._factor() * (now - last)
+            last = now
+
+    def _run_slot(self, index, scheduled, in_flight):
+        try:
+            self._run_job(index, scheduled)
+        finally:
+            in_flight.release()
+
+    def _factor(self):
+        return ramp_factor(self.ramp, self._elapsed(), self.ramp_seconds, self.ramp_steps)
+
+    # -- one job --------------------------------------------------------------
+
+    def _run_job(self, index, scheduled):
+        entry = self._pick()
+        job_input = dict(entry["input"])
+        job_input.setdefault("seed", self.random.randrange(2 ** 32))
+        record = {
+            "index": index, "name": entry["name"], "tier": job_input.get("tier"),
+            "job_id": None, "status": None, "error": None,
+            "arrival": round(scheduled - self._started, 3),
+            "cold": False, "outputs": 0, "bytes": 0, "completion": None,
+            **{f"{stage}_seconds": None for stage in LOAD_STAGES},
+        }
+        try:
+            self._submit_and_wait(job_input, record, scheduled)
+        except Exception as e:
+            record["status"] = record["status"] or "ERROR"
+            record["error"] = str(e)
+        with self._lock:
+            self.records.append(record)
+        icon = "✅" if record["status"] == "COMPLETED" else "❌"
+        print(f"   {icon} #{index} {record['name']} {record['status']} "
+              f"e2e={record['e2e_seconds'] or 0:.1f}s cold={record['cold_start_seconds'] or 0:.1f}s")
+
+    def _submit_and_wait(self, job_input, record, scheduled):
+        started = time.time()
+        payload = {"input": job_input}
+        if self.webhook is not None:
+            payload["webhook"] = self.webhook.url
+        resp = self.session.post(f"{self.base}/run", json=payload, timeout=30)
+        resp.raise_for_status()
+        record["job_id"] = resp.json()["id"]
+        record["submit_seconds"] = round(time.time() - started, 3)
+
+        if self.webhook is not None:
+            status, record["completion"] = self.wait_for_webhook(record["job_id"], started)
+        else:
+            status, record["completion"] = self.wait_for_completion(record["job_id"], started), "poll"
+        record["status"] = status.get("status")
+        output = status.get("output") if isinstance(status.get("output"), dict) else {}
+        metrics = output.get("metrics", {})
+
+        cold = float(metrics.get("cold_start_seconds") or 0)
+        delay = status.get("delayTime")
+        execution = status.get("executionTime")
+        record["cold"] = cold > 0
+        record["cold_start_seconds"] = round(cold, 3)
+        # delayTime (ms) covers the time in queue, worker boot included
+        if delay is not None:
+            record["queue_seconds"] = round(max(0.0, delay / 1000 - cold), 3)
+        if execution is not None:
+            record["execution_seconds"] = round(execution / 1000, 3)
+        elif "processing_seconds" in metrics:
+            record["execution_seconds"] = metrics["processing_seconds"]
+
+        if record["status"] != "COMPLETED":
+            record["error"] = status.get("error") or output.get("error") or record["status"]
+        elif self.download:
+            started = time.time()
+            for item in output.get("outputs", []):
+                record["bytes"] += self.fetch_output(item)
+                record["outputs"] += 1
+            record["download_seconds"] = round(time.time() - started, 3)
+        record["e2e_seconds"] = round(time.time() - scheduled, 3)
+
+    def wait_for_completion(self, job_id, submitted):
+        """Poll /status until the job reaches a terminal status"""
+        while True:
+            resp = self.session.get(f"{self.base}/status/{job_id}", timeout=30)
+            resp.raise_for_status()
+            status = resp.json()
+            if status.get("status") in TERMINAL_STATUSES:
+                return status
+            if time.time() - submitted > self.job_timeout:
+                raise TimeoutError(f"Job {job_id} not done after {self.job_timeout}s")
+            time.sleep(self.poll_interval)
+
+    def wait_for_webhook(self, job_id, submitted):
+        """
+        Wait for the job's webhook; every webhook_fallback seconds without it,
+        poll /status once (lost webhook, unreachable receiver)
+        """
+        future = self.webhook.expect(job_id)
+        try:
+            while True:
+                try:
+                    return future.result(timeout=self.webhook_fallback), "webhook"
+                except FutureTimeout:
+                    pass
+                with self._lock:
+                    self.fallback_polls += 1
+                resp = self.session.get(f"{self.base}/status/{job_id}", timeout=30)
+                resp.raise_for_status()
+                status = resp.json()
+                if status.get("status") in TERMINAL_STATUSES:
+                    return status, "poll"
+                if time.time() - submitted > self.job_timeout:
+                    raise TimeoutError(f"Job {job_id} not done after {self.job_timeout}s")
+        finally:
+            self.webhook.forget(job_id)
+
+    def fetch_output(self, item):
+        """Bytes of one output: streamed from its URL, or decoded inline base64"""
+        if item.get("url"):
+            size = 0
+            with self.session.get(item["url"], stream=True, timeout=60) as resp:
+                resp.raise_for_status()
+                for chunk in resp.iter_content(chunk_size=1024 * 1024):
+                    size += len(chunk)
+            return size
+        if item.get("base64"):
+            return len(base64.b64decode(item["base64"]))
+        return 0
+
+    # -- report ---------------------------------------------------------------
+
+    def summary(self):
+        done = [r for r in self.records if r["status"] == "COMPLETED"]
+        summary = {
+            "jobs": len(self.records),
+            "completed": len(done),
+            "failed": len(self.records) - len(done),
+            "dropped": self.dropped,
+            "completion": {
+                method: sum(1 for r in self.records if r["completion"] == method) for method in ("webhook", "poll")
+            },
+            "fallback_polls": self.fallback_polls,
+            "stages": {},
+            "cold_starts": {},
+        }
+        if done:
+            first = min(r["arrival"] for r in done)
+            last = max(r["arrival"] + r["e2e_seconds"] for r in done)
+            summary["throughput_jobs_per_min"] = round(len(done) / max(last - first, 1e-9) * 60, 2)
+        for stage in LOAD_STAGES:
+            # Cold start percentiles over cold jobs only (warm ones are 0)
+            values = [r[f"{stage}_seconds"] for r in done
+                      if r[f"{stage}_seconds"] is not None and (stage != "cold_start" or r["cold"])]
+            if values:
+                summary["stages"][stage] = {
+                    f"p{q}": round(percentile(values, q / 100), 3) for q in (50, 95, 99)
+                }
+                summary["stages"][stage]["max"] = round(max(values), 3)
+
+        colds = [r["cold_start_seconds"] for r in done if r["cold"]]
+        buckets, low = {}, 0
+        for high in COLD_START_BUCKETS:
+            buckets[f"{low}-{high}s"] = sum(1 for c in colds if low <= c < high)
+            low = high
+        buckets[f"{low}s+"] = sum(1 for c in colds if c >= low)
+        summary["cold_starts"] = {
+            "count": len(colds),
+            "share": round(len(colds) / len(done), 3) if done else 0,
+            "histogram": buckets,
+        }
+        return summary
+
+
+def print_load_report(summary):
+    print(f"\n{'=' * 60}")
+    print("📊 LOAD TEST SUMMARY")
+    print(f"{'=' * 60}")
+    print(f"✅ Completed: {summary['completed']}/{summary['jobs']}   "
+          f"❌ Failed: {summary['failed']}   🚫 Dropped: {summary['dropped']}")
+    completion = summary["completion"]
+    if completion["webhook"] or summary["fallback_polls"]:
+        print(f"🪝 Completions: {completion['webhook']} by webhook, {completion['poll']} by fallback poll "
+              f"({summary['fallback_polls']} fallback /status call(s))")
+    if "throughput_jobs_per_min" in summary:
+        print(f"⚡ Throughput: {summary['throughput_jobs_per_min']} jobs/min")
+    print(f"\n{'stage':>12} | {'p50 s':>9} {'p95 s':>9} {'p99 s':>9} {'max s':>9}")
+    print("-" * 55)
+    for stage, row in summary["stages"].items():
+        print(f"{stage:>12} | {row['p50']:>9} {row['p95']:>9} {row['p99']:>9} {row['max']:>9}")
+
+    cold = summary["cold_starts"]
+    print(f"\n🥶 Cold starts: {cold['count']} ({cold['share'] * 100:.0f}% of completed jobs)")
+    peak = max(cold["histogram"].values()) or 1
+    for bucket, count in cold["histogram"].items():
+        print(f"   {bucket:>8} | {'█' * round(count / peak * 30)} {count}")
+
+
+def write_load_results(records, summary, args, csv_path=None, json_path=None):
+    if csv_path:
+        fields = list(records[0].keys()) if records else []
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["label"] + fields)
+            writer.writeheader()
+            for record in sorted(records, key=lambda r: r["index"]):
+                writer.writerow({"label": args.get("label"), **record})
+        print(f"📝 Per-job results written to {csv_path}")
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"label": args.get("label"), "args": args, "summary": summary,
+                       "jobs": sorted(records, key=lambda r: r["index"])}, f, indent=2)
+        print(f"📝 Results written to {json_path}")
+
+
+def add_webhook_arguments(parser):
+    parser.add_argument("--webhook", action="store_true", help="completions by webhook, polling only as fallback")
+    parser.add_argument("--webhook-host", default="0.0.0.0")
+    parser.add_argument("--webhook-port", type=int, default=0)
+    parser.add_argument("--webhook-url", help="public URL of the receiver (tunnel), default http://127.0.0.1:<port>/webhook")
+    parser.add_argument("--webhook-fallback", type=float, default=30.0, help="seconds without webhook before polling /status")
+
+
+def start_webhook_receiver(args):
+    """WebhookReceiver started from the --webhook* arguments, or None"""
+    if not args.webhook:
+        return None
+    webhook = WebhookReceiver(args.webhook_host, args.webhook_port, args.webhook_url).start()
+    print(f"🪝 Webhook receiver on {webhook.url}")
+    return webhook
+
+
+def run_load(argv):
+    parser = argparse.ArgumentParser(prog="test_client.py load", description="Concurrent load test")
+    parser.add_argument("--endpoint", default=os.environ.get("ENDPOINT_ID", "mock"))
+    parser.add_argument("--api-key", default=os.environ.get("RUNPOD_API_KEY"))
+    parser.add_argument("--api-base", default=DEFAULT_API_BASE, help="e.g. http://127.0.0.1:8900 for mock_endpoint.py")
+    load = parser.add_mutually_exclusive_group(required=True)
+    load.add_argument("--rate", type=float, help="arrivals per second")
+    load.add_argument("--concurrency", type=int, help="jobs in flight (closed loop)")
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times (with --rate)")
+    parser.add_argument("--open-loop", action="store_true", help="arrivals never wait for a free slot (with --rate)")
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--duration", type=float, help="seconds of arrivals")
+    parser.add_argument("--jobs", type=int, help="number of jobs")
+    parser.add_argument("--ramp", choices=("none", "linear", "step"), default="none")
+    parser.add_argument("--ramp-seconds", type=float, default=0)
+    parser.add_argument("--ramp-steps", type=int, default=4)
+    parser.add_argument("--mix", help="prompt mix file (.json, .jsonl or one prompt per line)")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    add_webhook_arguments(parser)
+    parser.add_argument("--job-timeout", type=float, default=900)
+    parser.add_argument("--no-download", action="store_true")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--label", help="build / run label stored in the results")
+    parser.add_argument("--csv", dest="csv_path")
+    parser.add_argument("--json", dest="json_path")
+    parser.add_argument("--mock", action="store_true", help="run against an in-process mock_endpoint")
+    parser.add_argument("--mock-workers", type=int, default=3)
+    parser.add_argument("--mock-cold-start", default="2:4")
+    parser.add_argument("--mock-exec", default="3:6")
+    args = parser.parse_args(argv)
+    if args.duration is None and args.jobs is None:
+        args.jobs = 10
+
+    mock = None
+    if args.mock:
+        from mock_endpoint import MockEndpoint, parse_range
+        mock = MockEndpoint(port=0, workers=args.mock_workers, cold_start=parse_range(args.mock_cold_start),
+                            execution=parse_range(args.mock_exec), seed=args.seed).start()
+        args.api_base = mock.url
+        print(f"🧪 Mock endpoint on {mock.url}")
+
+    webhook = start_webhook_receiver(args)
+
+    mix = load_prompt_mix(args.mix) if args.mix else None
+    generator = LoadGenerator(
+        args.api_base, args.endpoint, args.api_key, mix, rate=args.rate, concurrency=args.concurrency,
+        poisson=args.poisson, open_loop=args.open_loop, max_in_flight=args.max_in_flight,
+        duration=args.duration, jobs=args.jobs, ramp=args.ramp, ramp_seconds=args.ramp_seconds,
+        ramp_steps=args.ramp_steps, poll_interval=args.poll_interval, job_timeout=args.job_timeout,
+        download=not args.no_download, seed=args.seed,
+        webhook=webhook, webhook_fallback=args.webhook_fallback,
+    )
+    load = f"{args.rate}/s{' poisson' if args.poisson else ''}{' open-loop' if args.open_loop else ''}" \
+        if args.rate else f"concurrency {args.concurrency}"
+    print(f"🎯 Load test on {generator.base}: {load}, ramp {args.ramp}, "
+          f"{args.jobs or '∞'} jobs / {args.duration or '∞'}s, {len(generator.mix)} prompt(s) in the mix")
+    try:
+        records = generator.run()
+    except KeyboardInterrupt:
+        print("\n⏹️  Load test interrupted, reporting finished jobs")
+        records = generator.records
+    finally:
+        if mock is not None:
+            mock.stop()
+        if webhook is not None:
+            webhook.stop()
+
+    summary = generator.summary()
+    print_load_report(summary)
+    write_load_results(records, summary, vars(args), args.csv_path, args.json_path)
+    return summary
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "load":
+        return run_load(sys.argv[2:])
+
     # Configuration
-    if len(sys.argv) != 3:
-        print("Usage: python test_client.py <RUNPOD_API_KEY> <ENDPOINT_ID>")
+    if len(sys.argv) < 3:
+        print("Usage: python test_client.py <RUNPOD_API_KEY> <ENDPOINT_ID> [--webhook --webhook-url URL]")
+        print("       python test_client.py load --endpoint <ENDPOINT_ID> [--rate R | --concurrency C] ...")
         print("\nExample:")
         print("python test_client.py your_api_key_here your_endpoint_id_here")
+        print("python test_client.py load --mock --concurrency 4 --jobs 20 --json load.json")
         sys.exit(1)
     
-    api_key = sys.argv[1]
-    endpoint_id = sys.argv[2]
+    if runpod is None:
+        print("❌ The runpod package is required: pip install runpod")
+        sys.exit(1)
+
+    parser = argparse.ArgumentParser(prog="test_client.py", description="Demo benchmark suite")
+    parser.add_argument("api_key")
+    parser.add_argument("endpoint_id")
+    add_webhook_arguments(parser)
+    args = parser.parse_args()
+    api_key = args.api_key
+    endpoint_id = args.endpoint_id
     
     # Validate inputs
     if not api_key or len(api_key) < 10:
@@ -242,7 +869,8 @@ def main():
         sys.exit(1)
     
     # Run demo
-    client = RunPodDemoClient(api_key, endpoint_id)
+    webhook = start_webhook_receiver(args)
+    client = RunPodDemoClient(api_key, endpoint_id, webhook, args.webhook_fallback)
     
     try:
         results = client.run_benchmark_suite()
@@ -257,6 +885,9 @@ def main():
         print(f"\n⏹️  Demo interrupted by user")
     except Exception as e:
         print(f"\n❌ Demo failed: {e}")
+    finally:
+        if webhook is not None:
+            webhook.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Regression test for the recycle baseline in comfy_supervisor.py: the
+model load of the first job on a process is not growth.
+
+Usage:
+    python -m pytest -q test_comfy_supervisor.py
+"""
+
+import comfy_supervisor
+from comfy_supervisor import ComfySupervisor, GB
+
+
+class FakeComfy:
+    pid = 4242
+
+    def poll(self):
+        return None
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, stats):
+        self._stats = stats
+
+    def json(self):
+        return self._stats
+
+
+class FakeClient:
+    def __init__(self):
+        self.vram = 0
+
+    def request(self, endpoint, method, path, **kwargs):
+        return FakeResponse({"devices": [{"vram_total": 48 * GB, "vram_free": 48 * GB - self.vram}]})
+
+
+def make_supervisor(monkeypatch, client, rss):
+    monkeypatch.setattr(comfy_supervisor, "get_client", lambda: client)
+    monkeypatch.setattr(comfy_supervisor, "process_rss", lambda pid: rss["value"])
+    supervisor = ComfySupervisor(spawn=None, recycle_growth=4 * GB)
+    supervisor.comfy = FakeComfy()
+    supervisor.state = "ready"
+    supervisor._last_answer = 0
+    return supervisor
+
+
+def test_first_job_model_load_is_not_growth(monkeypatch):
+    client, rss = FakeClient(), {"value": 3 * GB}
+    supervisor = make_supervisor(monkeypatch, client, rss)
+
+    # Boot sample: nothing loaded yet
+    client.vram = 1 * GB
+    assert supervisor._check() is None
+    assert supervisor.baseline is None
+
+    # First job loads the WAN models (+20 GB VRAM, +12 GB RSS)
+    with supervisor.job():
+        client.vram, rss["value"] = 21 * GB, 15 * GB
+        assert supervisor._check() is None
+        assert not supervisor._recycle_due()
+
+    # Post-job sample becomes the baseline: no recycle
+    assert supervisor._check() is None
+    assert supervisor.baseline == {"rss": 15 * GB, "vram": 21 * GB}
+    assert supervisor.growth() == 0
+    assert not supervisor._recycle_due()
+    assert supervisor.state == "ready"
+
+
+def test_growth_after_baseline_recycles(monkeypatch):
+    client, rss = FakeClient(), {"value": 15 * GB}
+    supervisor = make_supervisor(monkeypatch, client, rss)
+    client.vram = 21 * GB
+    with supervisor.job():
+        pass
+    supervisor._check()
+
+    # A leak of 5 GB RSS over the next jobs
+    with supervisor.job():
+        rss["value"] = 20 * GB
+    supervisor._check()
+    assert supervisor.growth() == 5 * GB
+    assert supervisor._recycle_due()
+    assert supervisor.state == "restarting"
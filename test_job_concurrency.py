@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Regression test for job_concurrency.make_async_stream: a consumer that
+stops early must close the blocking handler generator.
+
+Usage:
+    python -m pytest -q test_job_concurrency.py
+"""
+
+import time
+import asyncio
+from threading import Event
+
+from job_concurrency import make_async_stream
+
+
+def test_cancelled_stream_closes_the_handler_generator():
+    closed = Event()
+    running = []  # held here, so only the wrapper can close it (not GC)
+
+    def handler_stream(event):
+        gen = handler_gen(event)
+        running.append(gen)
+        return gen
+
+    def handler_gen(event):
+        try:
+            yield {"progress": 0}
+            while True:
+                time.sleep(0.05)
+                yield {"progress": 1}
+        finally:
+            closed.set()
+
+    async def consume():
+        stream = make_async_stream(handler_stream)({"id": "job-1"})
+        task = asyncio.ensure_future(stream.__anext__())
+        assert await task == {"progress": 0}
+        # Cancel while next() is running in its thread
+        task = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await stream.aclose()
+        assert closed.is_set()
+
+    asyncio.run(consume())
+
+
+def test_stream_relays_every_chunk():
+    def handler_stream(event):
+        yield from ({"n": i} for i in range(3))
+
+    async def consume():
+        return [chunk async for chunk in make_async_stream(handler_stream)({})]
+
+    assert asyncio.run(consume()) == [{"n": 0}, {"n": 1}, {"n": 2}]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Regression test for output_capture.py: a child flooding stdout/stderr
+must never block on a full pipe, and the ring buffer stays bounded.
+
+Usage:
+    python -m pytest -q test_output_capture.py
+"""
+
+import sys
+import subprocess
+
+from output_capture import OutputCapture, MAX_LINE_BYTES
+
+# ~16 MB per stream; a pipe holds 64 KB, so an undrained child would block
+FLOOD_LINES = 200_000
+FLOODER = f"""
+import sys
+line = "x" * 72
+for i in range({FLOOD_LINES}):
+    sys.stderr.write(f"err {{i:06d}} {{line}}\\n")
+sys.stderr.flush()
+for i in range({FLOOD_LINES}):
+    sys.stdout.write(f"out {{i:06d}} {{line}}\\n")
+sys.stdout.write("progress 10%\\rprogress 50%\\rprogress 100%\\n")
+sys.stdout.write("done\\n")
+"""
+
+
+def run_flooder(max_bytes):
+    capture = OutputCapture(max_bytes=max_bytes)
+    child = subprocess.Popen([sys.executable, "-c", FLOODER], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    capture.attach(child.stdout, "stdout")
+    capture.attach(child.stderr, "stderr")
+    try:
+        returncode = child.wait(timeout=60)
+    finally:
+        child.kill()
+    capture.join(timeout=10)
+    return capture, returncode
+
+
+def test_flooding_child_exits_and_buffer_stays_bounded():
+    max_bytes = 256 * 1024
+    capture, returncode = run_flooder(max_bytes)
+    assert returncode == 0
+
+    metrics = capture.metrics()
+    written = 2 * FLOOD_LINES * len("out 000000 " + "x" * 72 + "\n")
+    assert metrics["bytes"] > written
+    assert metrics["buffered_bytes"] <= max_bytes
+    assert metrics["dropped_lines"] > 0
+    assert metrics["lines"] == 2 * FLOOD_LINES + 4
+
+    # Each stream keeps its order; stdout ended last
+    tail = capture.tail(10).splitlines()
+    assert tail[-1] == "done"
+    assert tail[-2] == "progress 100%"
+    assert [line for line in tail if line.startswith("out ")][-1].startswith(f"out {FLOOD_LINES - 1:06d}")
+
+
+def test_overlong_line_is_cut():
+    capture = OutputCapture(max_bytes=1024 * 1024)
+    child = subprocess.Popen([sys.executable, "-c", "print('y' * 100000); print('end')"], stdout=subprocess.PIPE)
+    capture.attach(child.stdout, "stdout")
+    assert child.wait(timeout=30) == 0
+    capture.join(timeout=10)
+
+    lines = capture.tail(0).splitlines()
+    assert lines[-1] == "end"
+    assert all(len(line) <= MAX_LINE_BYTES for line in lines)
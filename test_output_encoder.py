@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Regression test for output_encoder.py: a raw read that returns short
+must not put base64 padding in the middle of the encoded output.
+
+Usage:
+    python -m pytest -q test_output_encoder.py
+"""
+
+import io
+import base64
+import hashlib
+
+import output_encoder
+from output_encoder import OutputEncoder, read_full
+
+
+class ShortReader(io.RawIOBase):
+    """Raw file that returns at most `step` bytes per readinto"""
+
+    def __init__(self, data, step):
+        self._data = data
+        self._pos = 0
+        self._step = step
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self._step, len(self._data) - self._pos)
+        b[:n] = self._data[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+
+def test_read_full_fills_the_buffer():
+    buf = bytearray(10)
+    f = ShortReader(b"0123456789abc", step=4)
+    assert read_full(f, memoryview(buf)) == 10
+    assert bytes(buf) == b"0123456789"
+    assert read_full(f, memoryview(buf)) == 3
+    assert read_full(f, memoryview(buf)) == 0
+
+
+def test_short_reads_encode_like_one_pass(tmp_path, monkeypatch):
+    data = bytes(range(256)) * 400 + b"tail"
+    path = tmp_path / "out.mp4"
+    path.write_bytes(data)
+
+    # Every read returns a length that is not a multiple of 3
+    monkeypatch.setattr(output_encoder, "open", lambda *a, **k: ShortReader(data, step=1000), raising=False)
+    encoder = OutputEncoder(workers=1, chunk_size=3 * 4096)
+    try:
+        encoded, sha = encoder.encode(str(path))
+    finally:
+        encoder.pool.shutdown()
+
+    assert "=" not in encoded.rstrip("=")
+    assert encoded == base64.b64encode(data).decode("ascii")
+    assert sha == hashlib.sha256(data).hexdigest()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for output_sink.py against an in-memory S3 (moto): object keys,
+multipart upload and the sha256 metadata.
+
+Usage:
+    python -m pytest -q test_output_sink.py
+"""
+
+import os
+
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from output_sink import S3Sink, file_sha256, MB
+
+BUCKET = "test-outputs"
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    for name in ("BUCKET_ENDPOINT_URL", "AWS_PROFILE"):
+        monkeypatch.delenv(name, raising=False)
+    with moto.mock_aws():
+        sink = S3Sink(bucket=BUCKET, access_key="test", secret_key="test", region="us-east-1",
+                      prefix="outputs", part_size_mb=5)
+        sink.client.create_bucket(Bucket=BUCKET)
+        yield sink
+        sink.pool.shutdown()
+
+
+def write_file(path, size):
+    path.write_bytes(os.urandom(size))
+    return str(path)
+
+
+def test_key_for_without_job_id_is_unique(sink):
+    first = sink.key_for(None, "out.mp4")
+    second = sink.key_for(None, "out.mp4")
+    assert first != second
+    assert first.startswith("outputs/") and first.endswith("/out.mp4")
+    assert sink.key_for("job-1", "out.mp4", "wan/") == "outputs/job-1/wan/out.mp4"
+
+
+def test_upload_is_multipart_with_sha256_metadata(sink, tmp_path):
+    path = write_file(tmp_path / "big.mp4", 12 * MB)
+    result = sink.upload(path, "outputs/job-1/big.mp4", "video/mp4")
+
+    head = sink.client.head_object(Bucket=BUCKET, Key="outputs/job-1/big.mp4")
+    assert head["ContentLength"] == 12 * MB
+    assert head["ContentType"] == "video/mp4"
+    assert head["Metadata"]["sha256"] == file_sha256(path) == result["sha256"]
+    # Multipart ETag: "<md5 of part md5s>-<parts>"
+    assert head["ETag"].strip('"').endswith("-3")
+    assert result["size_bytes"] == 12 * MB
+    assert "outputs/job-1/big.mp4" in result["url"]
+
+
+def test_upload_many_shares_one_folder_without_job_id(sink, tmp_path):
+    items = [
+        {"path": write_file(tmp_path / "a.mp4", 1 * MB), "filename": "a.mp4"},
+        {"path": write_file(tmp_path / "b.png", 6 * MB), "filename": "b.png", "subfolder": "frames"},
+    ]
+    results = {item["filename"]: (result, error) for item, result, error in sink.upload_many(items)}
+    assert all(error is None for _, error in results.values())
+
+    a, b = results["a.mp4"][0], results["b.png"][0]
+    folder = a["key"].rsplit("/", 1)[0]
+    assert b["key"] == f"{folder}/frames/b.png"
+    for item in items:
+        result = results[item["filename"]][0]
+        head = sink.client.head_object(Bucket=BUCKET, Key=result["key"])
+        assert head["Metadata"]["sha256"] == file_sha256(item["path"]) == result["sha256"]
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Speed/quality tiers for the WAN 2.2 graph
+=========================================
+A job parameter "tier" (draft / standard / final) rewrites the workflow
+from the declarative PRESETS table below:
+- latent size and length      (EmptyHunyuanLatentVideo)
+- step count + high/low split  (the two FSamplerAdvanced / KSamplerAdvanced stages)
+- FSampler skip / adaptive settings
+- RIFE interpolation multiplier (RIFE VFI)
+- encoder settings             (VHS_VideoCombine frame_rate, crf)
+
+Nodes are addressed by class_type, so the presets follow the graph even
+if node ids change. "standard" matches wan-2.2.json as shipped.
+Presets can be overridden/extended with a JSON file of the same shape
+(TIERS_FILE, default /runpod-volume/workflow/tiers.json).
+Combo values (e.g. FSampler skip_mode) are checked against ComfyUI's
+/object_info; a value the installed node does not accept is skipped with
+a warning instead of failing the job. When ComfyUI is not up yet (cold
+worker), the values are recorded in "unchecked" and check_tier() must
+validate them once it is ready, before the prompt is queued.
+"""
+
+import os
+import json
+import logging
+
+from comfy_client import get_client
+
+logger = logging.getLogger(__name__)
+
+TIERS_FILE = os.environ.get("TIERS_FILE", "/runpod-volume/workflow/tiers.json")
+
+SAMPLER_STAGE_CLASSES = ("FSamplerAdvanced", "KSamplerAdvanced")
+
+# Presets only the worker itself may apply, never a job's "tier" input
+INTERNAL_TIERS = ("warmup",)
+
+PRESETS = {
+    "draft": {
+        "EmptyHunyuanLatentVideo": {"width": 480, "height": 480, "length": 33},
+        "sampler_stages": {"steps": 4, "split": 2},
+        "FSamplerAdvanced": {"skip_mode": "h2/s2", "adaptive_mode": "learning",
+                             "protect_first_steps": 1, "protect_last_steps": 1},
+        "RIFE VFI": {"multiplier": 1},
+        "VHS_VideoCombine": {"frame_rate": 16, "crf": 28},
+    },
+    "standard": {
+        "EmptyHunyuanLatentVideo": {"width": 720, "height": 720, "length": 81},
+        "sampler_stages": {"steps": 10, "split": 5},
+        "FSamplerAdvanced": {"skip_mode": "none", "adaptive_mode": "learning",
+                             "protect_first_steps": 5, "protect_last_steps": 5},
+        "RIFE VFI": {"multiplier": 2},
+        "VHS_VideoCombine": {"frame_rate": 32, "crf": 19},
+    },
+    "final": {
+        "EmptyHunyuanLatentVideo": {"width": 720, "height": 720, "length": 81},
+        "sampler_stages": {"steps": 16, "split": 8},
+        "FSamplerAdvanced": {"skip_mode": "none", "adaptive_mode": "learning",
+                             "protect_first_steps": 8, "protect_last_steps": 8},
+        "RIFE VFI": {"multiplier": 2},
+        "VHS_VideoCombine": {"frame_rate": 32, "crf": 16},
+    },
+    # Boot warmup (warmup.py): every loader runs, almost nothing is sampled.
+    # 5 frames = 2 latent frames, the least that gives RIFE a frame pair;
+    # one step per sampler stage so both UNETs load.
+    "warmup": {
+        "EmptyHunyuanLatentVideo": {"width": 64, "height": 64, "length": 5},
+        "sampler_stages": {"steps": 2, "split": 1},
+        "FSamplerAdvanced": {"skip_mode": "none", "protect_first_steps": 1, "protect_last_steps": 1},
+        "RIFE VFI": {"multiplier": 2},
+        "VHS_VideoCombine": {"save_output": False},
+    },
+}
+
+_presets = None
+_presets_mtime = None
+_combo_choices = {}
+
+
+def get_presets():
+    """Built-in presets merged with TIERS_FILE (reloaded when it changes)"""
+    global _presets, _presets_mtime
+    try:
+        mtime = os.stat(TIERS_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    if _presets is None or mtime != _presets_mtime:
+        presets = {name: {k: dict(v) for k, v in preset.items()} for name, preset in PRESETS.items()}
+        if mtime is not None:
+            try:
+                with open(TIERS_FILE, "r") as f:
+                    for name, preset in json.load(f).items():
+                        merged = presets.setdefault(name, {})
+                        for section, values in preset.items():
+                            merged.setdefault(section, {}).update(values)
+                logger.info(f"🎚️ Loaded tier overrides from {TIERS_FILE}")
+            except Exception as e:
+                logger.warning(f"⚠️ Ignoring invalid {TIERS_FILE}: {e}")
+        _presets, _presets_mtime = presets, mtime
+
+    return _presets
+
+
+def combo_choices(class_type):
+    """field -> allowed values for a node's combo inputs (cached, None if ComfyUI is unreachable)"""
+    if class_type not in _combo_choices:
+        try:
+            response = get_client().request("object_info", "GET", f"/object_info/{class_type}", retries=0)
+            response.raise_for_status()
+            info = response.json().get(class_type, {})
+        except Exception as e:
+            logger.debug(f"object_info unavailable for {class_type}: {e}")
+            return None
+        choices = {}
+        for group in ("required", "optional"):
+            for field, spec in info.get("input", {}).get(group, {}).items():
+                if isinstance(spec, list) and spec and isinstance(spec[0], list):
+                    choices[field] = spec[0]
+        _combo_choices[class_type] = choices
+    return _combo_choices[class_type]
+
+
+def _sampler_stages(workflow):
+    """Two-stage sampler nodes ordered high-noise -> low-noise"""
+    stages = []
+    for class_type in SAMPLER_STAGE_CLASSES:
+        stages += workflow.class_index.get(class_type, [])
+    return sorted(stages, key=lambda node_id: workflow[node_id]["inputs"].get("start_at_step", 0))
+
+
+def apply_tier(workflow, tier, validate=True, internal=False):
+    """
+    Rewrite a WorkflowInstance in place for a tier.
+    Returns {"name", "changes": {"node_id.field": value}}, plus "unchecked"
+    when ComfyUI could not validate combo values yet (see check_tier);
+    raises ValueError for unknown tiers, and for INTERNAL_TIERS unless
+    internal=True. Fields missing from a node are left alone.
+    """
+    presets = get_presets()
+    if tier not in presets or (tier in INTERNAL_TIERS and not internal):
+        available = sorted(name for name in presets if name not in INTERNAL_TIERS)
+        raise ValueError(f"Unknown tier '{tier}' (available: {available})")
+
+    changes = {}
+    unchecked = []
+
+    def set_input(node_id, field, value):
+        inputs = workflow[node_id].get("inputs", {})
+        if field not in inputs or isinstance(inputs[field], list):
+            return
+        if validate and isinstance(value, str):
+            allowed = combo_choices(workflow[node_id].get("class_type"))
+            if allowed is None:
+                unchecked.append((node_id, field, inputs[field]))
+            elif field in allowed and value not in allowed[field]:
+                logger.warning(f"⚠️ Tier '{tier}': {node_id}.{field}={value!r} not accepted by this ComfyUI, skipped")
+                return
+        workflow.set(node_id, field, value)
+        changes[f"{node_id}.{field}"] = value
+
+    for section, values in presets[tier].items():
+        if section == "sampler_stages":
+            stages = _sampler_stages(workflow)
+            steps, split = values.get("steps"), values.get("split")
+            for i, node_id in enumerate(stages):
+                if steps is not None:
+                    set_input(node_id, "steps", steps)
+                if split is not None and len(stages) == 2:
+                    set_input(node_id, "end_at_step" if i == 0 else "start_at_step", split)
+            continue
+
+        for node_id in workflow.class_index.get(section, []):
+            for field, value in values.items():
+                set_input(node_id, field, value)
+
+    logger.info(f"🎚️ Tier '{tier}' applied ({len(changes)} inputs)")
+    result = {"name": tier, "changes": changes}
+    if unchecked:
+        logger.info(f"🎚️ Tier '{tier}': {len(unchecked)} combo value(s) to check once ComfyUI is up")
+        result["unchecked"] = unchecked
+    return result
+
+
+def check_tier(workflow, tier):
+    """
+    Validate the combo values apply_tier could not check; call once ComfyUI
+    is ready. A value the node does not accept is put back to the template's
+    and listed in tier["skipped"] (returned). Raises RuntimeError if
+    /object_info is still unreachable, so a job never runs unvalidated.
+    """
+    unchecked = tier.pop("unchecked", None) if tier else None
+    if not unchecked:
+        return []
+
+    skipped = []
+    for node_id, field, original in unchecked:
+        class_type = workflow[node_id].get("class_type")
+        allowed = combo_choices(class_type)
+        if allowed is None:
+            raise RuntimeError(f"Tier '{tier['name']}': cannot validate {node_id}.{field}, "
+                               f"ComfyUI /object_info/{class_type} unavailable")
+        value = workflow[node_id]["inputs"][field]
+        if field in allowed and value not in allowed[field]:
+            logger.warning(f"⚠️ Tier '{tier['name']}': {node_id}.{field}={value!r} not accepted by this ComfyUI, skipped")
+            workflow.set(node_id, field, original)
+            tier["changes"].pop(f"{node_id}.{field}", None)
+            skipped.append(f"{node_id}.{field}")
+    if skipped:
+        tier["skipped"] = skipped
+    return skipped
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Boot Warmup - load every model before the first job
+====================================================
+With WARMUP=1 the worker runs a minimal version of the default workflow
+right after ComfyUI answers (the "warmup" tier: 64x64, 5 frames, one step
+per sampler stage). UNETs, CLIP, VAE, LoRAs and RIFE are loaded and stay
+cached in ComfyUI, so the first real job no longer pays for model load.
+
+- The worker only reports ready once the warmup run has finished
+- Runs again after every ComfyUI restart or recycle: a new process
+  starts with an empty model cache
+- Outputs are discarded (prefix warmup/, save_output off, files deleted)
+- A failed warmup is logged and reported, never fatal: jobs still run
+- Duration reported separately from ComfyUI boot ("warmup" in metrics)
+
+Environment:
+    WARMUP (default: 0), WARMUP_WORKFLOW (default: wan-2.2),
+    WARMUP_TIMEOUT (default: 900)
+"""
+
+import os
+import time
+import logging
+from threading import Lock
+
+from comfy_client import get_client
+from comfy_events import get_event_stream
+from workflow_registry import get_registry
+from tiers import apply_tier
+
+logger = logging.getLogger(__name__)
+
+WARMUP = os.environ.get("WARMUP", "0") == "1"
+WARMUP_WORKFLOW = os.environ.get("WARMUP_WORKFLOW", "wan-2.2")
+WARMUP_TIMEOUT = int(os.environ.get("WARMUP_TIMEOUT", "900"))
+
+OUTPUT_KEYS = ("images", "gifs", "videos")
+
+
+class Warmup:
+    """One boot-time warmup run and its report"""
+
+    def __init__(self, workflow_name=WARMUP_WORKFLOW, timeout=WARMUP_TIMEOUT):
+        self.workflow_name = workflow_name
+        self.timeout = timeout
+        self.status = "disabled"
+        self.seconds = None
+        self.error = None
+        self.runs = 0
+        self._lock = Lock()
+
+    def reset(self):
+        """Mark the warmup due again (a new ComfyUI process has no models loaded)"""
+        with self._lock:
+            if self.status != "disabled":
+                self.status = "pending"
+
+    def build(self, search_paths):
+        """Warmup instance of the workflow, or None if it cannot be found"""
+        compiled = get_registry().get(self.workflow_name, search_paths)
+        if compiled is None:
+            return None
+        workflow = compiled.instantiate()
+        apply_tier(workflow, "warmup", internal=True)
+        for node_id, node in workflow.items():
+            prefix = node.get("inputs", {}).get("filename_prefix")
+            if isinstance(prefix, str):
+                workflow.set(node_id, "filename_prefix", f"warmup/{os.path.basename(prefix) or 'warmup'}")
+        return workflow
+
+    def run(self, search_paths, comfy_dir):
+        """Run the warmup workflow once (no-op if already done); returns the report"""
+        with self._lock:
+            if self.status in ("done", "failed"):
+                return self.report()
+            self.status = "running"
+            self.error = None
+            self.runs += 1
+            started = time.time()
+            logger.info(f"🔥 Warmup: running minimal '{self.workflow_name}'...")
+
+            try:
+                self._run(search_paths, comfy_dir)
+                self.status = "done"
+                logger.info(f"🔥 Warmup done in {time.time() - started:.1f}s")
+            except Exception as e:
+                self.status = "failed"
+                self.error = str(e)
+                logger.warning(f"⚠️ Warmup failed after {time.time() - started:.1f}s: {e}")
+            self.seconds = time.time() - started
+            return self.report()
+
+    def _run(self, search_paths, comfy_dir):
+        workflow = self.build(search_paths)
+        if workflow is None:
+            raise FileNotFoundError(f"Workflow {self.workflow_name}.json not found in {search_paths}")
+
+        client = get_client()
+        stream = get_event_stream()
+        response = client.submit(workflow, client_id=stream.client_id)
+        if response.status_code != 200:
+            raise RuntimeError(f"ComfyUI rejected warmup workflow ({response.status_code}): {response.text[:500]}")
+        prompt_id = response.json()["prompt_id"]
+
+        try:
+            result = stream.watch(prompt_id).wait(self.timeout, poll=client.history, poll_interval=3)
+        except TimeoutError:
+            raise TimeoutError(f"Warmup did not finish within {self.timeout}s")
+        client.delete_history([prompt_id])
+        discard_outputs(result.get("outputs", {}), comfy_dir)
+        if not result.get("success"):
+            raise RuntimeError(result.get("error", "Warmup execution error"))
+
+    def report(self):
+        return {
+            "status": self.status,
+            "workflow": self.workflow_name,
+            "seconds": round(self.seconds, 2) if self.seconds is not None else None,
+            "error": self.error,
+            "runs": self.runs,
+        }
+
+
+def discard_outputs(outputs, comfy_dir):
+    """Delete the files a warmup run wrote (output/ or temp/)"""
+    for node_outputs in outputs.values():
+        for key in OUTPUT_KEYS:
+            for item in node_outputs.get(key, []):
+                folder = "temp" if item.get("type") == "temp" else "output"
+                path = os.path.join(comfy_dir, folder, item.get("subfolder", ""), item.get("filename", ""))
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+_warmup = Warmup()
+if WARMUP:
+    _warmup.status = "pending"
+
+
+def get_warmup():
+    """Per-worker Warmup state"""
+    return _warmup
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Workflow Registry - compiled workflow cache
+===========================================
+- Workflow JSON parsed once per worker, kept in memory
+- Revalidated by stat (mtime/size) at most every REVALIDATE_SECONDS;
+  a changed mtime with identical content (sha256) keeps the compiled entry
+- Injection slots (prompt text, seeds) precomputed at compile time,
+  so a job never scans the whole graph
+- Several seed slots keep their offsets from the template (two-stage
+  sampler 45/46 -> seed/seed+1), so the stages never share a noise seed
+- Each job gets a copy-on-write instance: only the nodes it changes are
+  copied, the template is never mutated
+- Directory listings (for "workflow not found" errors) cached by dir mtime
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+REVALIDATE_SECONDS = float(os.environ.get("WORKFLOW_REVALIDATE_SECONDS", "1.0"))
+
+# Injectable parameter -> (class_type, input field) candidates
+SLOT_FIELDS = {
+    "prompt": (("CLIPTextEncode", "text"),),
+    "seed": (
+        ("KSampler", "seed"),
+        ("KSamplerAdvanced", "noise_seed"),
+        ("FSamplerAdvanced", "seed"),
+    ),
+}
+
+
+def index_by_class(template):
+    """class_type -> [node_id] for the whole graph"""
+    index = {}
+    for node_id, node in template.items():
+        index.setdefault(node.get("class_type"), []).append(node_id)
+    return index
+
+
+def compute_slots(template):
+    """Map each injectable parameter to its [(node_id, field)] slots"""
+    slots = {name: [] for name in SLOT_FIELDS}
+
+    for node_id, node in template.items():
+        class_type = node.get("class_type")
+        inputs = node.get("inputs", {})
+        for name, candidates in SLOT_FIELDS.items():
+            for candidate_class, field in candidates:
+                if class_type == candidate_class and field in inputs and not isinstance(inputs[field], list):
+                    slots[name].append((node_id, field))
+
+    # Only the positive prompt when the graph labels it (never the negative)
+    positive = [
+        (node_id, field) for node_id, field in slots["prompt"]
+        if "positive" in template[node_id].get("_meta", {}).get("title", "").lower()
+    ]
+    if positive:
+        slots["prompt"] = positive
+
+    return slots
+
+
+def slot_offsets(template, slots):
+    """(node_id, field) -> offset from the lowest template value, seed slots only"""
+    values = {slot: template[slot[0]]["inputs"][slot[1]] for slot in slots.get("seed", ())}
+    numbers = [value for value in values.values() if isinstance(value, int)]
+    if len(numbers) < 2:
+        return {}
+    base = min(numbers)
+    return {slot: value - base for slot, value in values.items() if isinstance(value, int)}
+
+
+class WorkflowInstance(dict):
+    """
+    Per-job workflow sharing unmodified nodes with its template.
+    Always change inputs through set(); it copies a node before its first write.
+    """
+
+    def __init__(self, template, slots=None, class_index=None, offsets=None):
+        super().__init__(template)
+        self.slots = slots if slots is not None else compute_slots(template)
+        self.class_index = class_index if class_index is not None else index_by_class(template)
+        self.offsets = offsets if offsets is not None else slot_offsets(template, self.slots)
+        self._owned = set()
+
+    def set(self, node_id, field, value):
+        if node_id not in self._owned:
+            node = dict(self[node_id])
+            node["inputs"] = dict(node.get("inputs", {}))
+            self[node_id] = node
+            self._owned.add(node_id)
+        self[node_id]["inputs"][field] = value
+
+    def inject(self, name, value):
+        """Write value into every precomputed slot of a parameter (seeds + their offset)"""
+        for node_id, field in self.slots.get(name, ()):
+            offset = self.offsets.get((node_id, field), 0) if name == "seed" else 0
+            self.set(node_id, field, value + offset if offset else value)
+        return self.slots.get(name, [])
+
+
+class CompiledWorkflow:
+    """One parsed workflow file + its injection slots"""
+
+    def __init__(self, name, path, template, stat_key, digest):
+        self.name = name
+        self.path = path
+        self.template = template
+        self.stat_key = stat_key
+        self.digest = digest
+        self.slots = compute_slots(template)
+        self.class_index = index_by_class(template)
+        self.offsets = slot_offsets(template, self.slots)
+        self.checked_at = time.monotonic()
+
+    def instantiate(self, **params):
+        """Copy-on-write instance with params (prompt=..., seed=...) injected"""
+        instance = WorkflowInstance(self.template, self.slots, self.class_index, self.offsets)
+        for name, value in params.items():
+            if value is not None:
+                instance.inject(name, value)
+        return instance
+
+
+def _stat_key(st):
+    return (st.st_mtime_ns, st.st_size)
+
+
+class WorkflowRegistry:
+    """Thread-safe cache of compiled workflows, keyed by file path"""
+
+    def __init__(self, revalidate_seconds=REVALIDATE_SECONDS):
+        self.revalidate_seconds = revalidate_seconds
+        self._compiled = {}
+        self._listings = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, name, search_paths):
+        """CompiledWorkflow for name.json in the first search path that has it, else None"""
+        for base in search_paths:
+            compiled = self._get_path(name, os.path.join(base, f"{name}.json"))
+            if compiled is not None:
+                return compiled
+        return None
+
+    def _get_path(self, name, path):
+        now = time.monotonic()
+        with self._lock:
+            compiled = self._compiled.get(path)
+            if compiled is not None and now - compiled.checked_at < self.revalidate_seconds:
+                self.hits += 1
+                return compiled
+
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._compiled.pop(path, None)
+            return None
+
+        if compiled is not None and compiled.stat_key == _stat_key(st):
+            compiled.checked_at = now
+            with self._lock:
+                self.hits += 1
+            return compiled
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+
+        if compiled is not None and compiled.digest == digest:
+            compiled.stat_key = _stat_key(st)
+            compiled.checked_at = now
+            return compiled
+
+        compiled = CompiledWorkflow(name, path, json.loads(raw), _stat_key(st), digest)
+        with self._lock:
+            self._compiled[path] = compiled
+            self.loads += 1
+        logger.info(f"📄 Compiled workflow {path} ({len(compiled.template)} nodes, slots: "
+                    f"{ {k: len(v) for k, v in compiled.slots.items()} })")
+        return compiled
+
+    def available(self, base):
+        """Workflow names in a directory (cached until the directory changes)"""
+        try:
+            mtime = os.stat(base).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            cached = self._listings.get(base)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        names = sorted(f[:-len(".json")] for f in os.listdir(base) if f.endswith(".json"))
+        with self._lock:
+            self._listings[base] = (mtime, names)
+        return names
+
+
+_registry = WorkflowRegistry()
+
+
+def get_registry():
+    """Per-worker shared WorkflowRegistry"""
+    return _registry